@@ -1,6 +1,6 @@
-from pydantic import BaseModel, validator, Field
+from pydantic import BaseModel, validator, Field, PrivateAttr
 from typing import ClassVar, Any
-from SceneInterface import scene
+from SceneInterface import scene as default_scene
 import numpy as np
 from ._AutoNumpyUpdate import _AutoNumpyUpdate
 
@@ -11,29 +11,48 @@ class BaseObject(BaseModel):
     Keywords:
         name:
             the name of the object. Note that all objects must have a unique name, and that the camera must
-            have the name "_camera", and the light must have the name "_light"
+            have the name "_camera", and the names of lights must start with "_light"
         coordinates:
             the positioning of the object. Must be a np array of shape (3,)
         description:
             An optional descriptor string. Has no functionality, but is provided for convenience
+        scene:
+            the scene (SceneInterface instance) to register the object to. The default SceneInterface.scene if
+            not given
     """
     name: str = Field(..., allow_mutation=False)  # unique name
     coordinates: np.ndarray
     description: str = None
+    _scene: Any = PrivateAttr(default=None)  # the scene the object is bound to (set when registered)
 
-    def __init__(self, **kwargs):
+    def __init__(self, scene=None, **kwargs):
         for forbidden in {'screen_array', 'rays', 'object_class_type'}:
             if forbidden in kwargs:
                 del kwargs[forbidden]
         super().__init__(**kwargs)
-        scene.register_object(self)
-        self.Config.validate_assignment = False
+        (default_scene if scene is None else scene).register_object(self)
+        self._link_arrays()
+
+    @classmethod
+    def _construct_trusted(cls, scene, **kwargs) -> 'BaseObject':
+        """
+        Creates the object bound to scene without validating the values nor registering it. Only used by scene for
+        objects it already holds the (trusted) values of, see scene.load
+        """
+        object_item = cls.construct(**kwargs)
+        object_item._scene = scene
+        object_item._link_arrays()
+        return object_item
+
+    def _link_arrays(self):
+        """
+        Replaces the numpy arrays of the object with _AutoNumpyUpdate arrays, so that scene is notified of in-place
+        modifications. The values are written to __dict__ directly (they are already validated), rather than toggling
+        the class wide validate_assignment, so objects can be created from several threads
+        """
         for name, value in self.dict().items():
             if isinstance(value, np.ndarray):
-                super().__setattr__(
-                    name,
-                    _AutoNumpyUpdate(value.copy(), _linked_dataclass=self)
-                )
+                self.__dict__[name] = _AutoNumpyUpdate(value.copy(), _linked_dataclass=self)
             if isinstance(value, (1,).__class__):
                 if any(isinstance(i, np.ndarray) for i in value):
                     new_tuple_list = []
@@ -42,25 +61,23 @@ class BaseObject(BaseModel):
                             new_tuple_list.append(_AutoNumpyUpdate(i.copy(), _linked_dataclass=self))
                         else:
                             new_tuple_list.append(i)
-                    super().__setattr__(name, tuple(new_tuple_list))
-        self.Config.validate_assignment = True
+                    self.__dict__[name] = tuple(new_tuple_list)
 
     def __setattr__(self, key: str, value: Any):
         """
-        Automatically sets scene attributes such as scene._camera_updated to True
+        Automatically sets scene attributes such as scene._camera_updated to True. Inside scene.batch, the value is
+        only validated (and the scene notified) when the batch ends
         """
+        field = self.__fields__.get(key)
+        if field is not None and field.field_info.allow_mutation and self._scene is not None and \
+                self._scene._touch(self, key):
+            self.__dict__[key] = value
+            self.__fields_set__.add(key)
+            return
         super().__setattr__(key, value)
-        if key.startswith('_'):
+        if key.startswith('_') or self._scene is None:
             return
-        scene._assign_updated(self)
-
-    @validator('name')
-    def _validate_name(cls, name: str):
-        """
-        Ensures that the name is valid according to _SceneInterface._check_name
-        """
-        scene._check_name(name, cls)
-        return name
+        self._scene._assign_updated(self)
 
     @validator(
         'coordinates',
@@ -104,7 +121,7 @@ class BaseObject(BaseModel):
         Delete the object
         Ensure object is de-registered from scene first
         """
-        scene.de_register_object(self.name)
+        self._scene.de_register_object(self.name)
         del self
 
     class Config:
@@ -3,6 +3,9 @@ from pydantic import validator, Field
 import numpy as np
 from typing import Tuple
 
+# Angular margin (radians) the spheres are grown by when projected, absorbing the float32 rounding of the rays
+_PROJECTION_MARGIN = 1e-4
+
 
 class Camera(BaseObject):
     """
@@ -64,38 +67,122 @@ class Camera(BaseObject):
 
         return cam_to_screen, screen_north
 
-    def _construct_rays(self) -> np.ndarray:
+    def _construct_rays(
+            self,
+            resolution: Tuple[int, int] = None,
+            window: Tuple[int, int, int, int] = None
+    ) -> np.ndarray:
         """
         Initialises the rays (unit vector of each ray direction (towards each pixel)
-        originating from the camera)
+        originating from the camera). If resolution is given, the rays of that resolution are returned instead
+        (the same screen, e.g. for the frames rendered at a lower resolution by scene.capture_frame(budget_ms=...)).
+        If window = (row_start, row_stop, column_start, column_stop) is given, only the rays of those pixels are
+        returned, shape (row_stop - row_start, column_stop - column_start, 3), so the rays of a tile of a frame too
+        large to hold in memory can be built on their own (see scene.render_tiled). They are the same (bit for bit)
+        as the rays of the tile in the whole frame
         """
-        resolution = self.resolution
-        cam_position = self.coordinates
-        screen_vectors = self.screen_vectors
-        cam_position = np.array(cam_position, dtype='float32')
-        cam_to_screen = np.array(screen_vectors[0], dtype='float32')
-        screen_north = np.array(screen_vectors[1], dtype='float32')
+        height, width = self.resolution if resolution is None else resolution
+        row_start, row_stop, column_start, column_stop = (0, height, 0, width) if window is None else window
+        cam_position, cam_to_screen, screen_north, screen_east = self._screen_basis()
         screen_centre = cam_position + cam_to_screen
-        screen_east = np.cross(cam_to_screen, screen_north)
-        screen_locs = np.array(
-            [
-                np.linspace(
-                    (
-                            screen_centre +
-                            0.5 * screen_east * (1 / resolution[1] - 1) +
-                            0.5 * screen_north * ((resolution[0] - 1 - 2 * i) / resolution[1])
-                    ),
-                    (
-                            screen_centre +
-                            0.5 * screen_east * (-1 / resolution[1] + 1) +
-                            0.5 * screen_north * ((resolution[0] - 1 - 2 * i) / resolution[1])
-                    ),
-                    resolution[1],
-                    dtype='float32'
-                )
-                for i in range(resolution[0])
-            ],
+        # The screen spans one unit across (width), and each row of pixels goes from its west to its east end, with
+        # the arithmetic of np.linspace(west, east, width, dtype='float32')
+        north_offsets = np.array(
+            [(height - 1 - 2 * i) / width for i in range(row_start, row_stop)],
             dtype='float32'
-        )
+        )[:, np.newaxis]
+        west = screen_centre + 0.5 * screen_east * (1 / width - 1) + 0.5 * screen_north * north_offsets
+        east = screen_centre + 0.5 * screen_east * (-1 / width + 1) + 0.5 * screen_north * north_offsets
+        divisions = max(width - 1, 1)
+        deltas = east - west
+        steps = deltas / divisions
+        columns = np.arange(column_start, column_stop, dtype='float32').reshape((1, -1, 1))
+        screen_locs = columns * steps[:, np.newaxis, :] + west[:, np.newaxis, :]
+        # np.linspace scales the fractions of the delta instead of the step in rows with a zero step along an axis
+        zero_step_rows = (steps == 0).any(axis=1)
+        if zero_step_rows.any():
+            screen_locs[zero_step_rows] = (
+                (columns / divisions) * deltas[zero_step_rows][:, np.newaxis, :]
+                + west[zero_step_rows][:, np.newaxis, :]
+            )
+        if column_stop == width and width > 1:
+            screen_locs[:, -1] = east
         rays = screen_locs - cam_position
         return rays / np.linalg.norm(rays, axis=2).reshape((rays.shape[0], rays.shape[1], 1))
+
+    def _screen_basis(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the camera position, the vector from the camera to the screen centre, screen north and screen east
+        (float32, the vectors the rays are built from). The screen spans one unit of screen east across its width
+        """
+        cam_position = np.array(self.coordinates, dtype='float32')
+        cam_to_screen = np.array(self.screen_vectors[0], dtype='float32')
+        screen_north = np.array(self.screen_vectors[1], dtype='float32')
+        return cam_position, cam_to_screen, screen_north, np.cross(cam_to_screen, screen_north)
+
+    def _project_spheres(
+            self,
+            sphere_geometry: np.ndarray,
+            resolution: Tuple[int, int] = None,
+            window: Tuple[int, int, int, int] = None
+    ) -> np.ndarray:
+        """
+        Returns the pixels of the rays (see _construct_rays, same resolution and window) that may hit each sphere,
+        as [row_start, row_stop, column_start, column_stop] rows (int32, shape (n, 4), relative to the window, empty
+        rows being [0, 0, 0, 0]). The primary rays of the other pixels miss the sphere (see
+        engine.rasterize_depth).
+        A sphere seen from the camera is a cone of directions, grown by _PROJECTION_MARGIN. If the cone lies in front
+        of the camera (the half space the screen is in), it cuts the plane of the screen along an ellipse, whose
+        bounding box is found from its tangents (the lines l with l^T C^-1 l = 0 for the conic C of the ellipse).
+        Cones behind the camera are not seen, and the other cones (spheres around or beside the camera) are bounded
+        by the whole screen
+        Args:
+            sphere_geometry:
+                the [x, y, z, radius] of the spheres, shape (n, 4)
+        """
+        height, width = self.resolution if resolution is None else resolution
+        row_start, row_stop, column_start, column_stop = (0, height, 0, width) if window is None else window
+        cam_position, cam_to_screen, screen_north, screen_east = (
+            vector.astype('float64') for vector in self._screen_basis()
+        )
+        offsets = sphere_geometry[:, :3].astype('float64') - cam_position
+        radii = sphere_geometry[:, 3].astype('float64')
+        distances = np.linalg.norm(offsets, axis=-1)
+        axes = offsets / np.where(distances > 0, distances, 1)[:, np.newaxis]
+        half_angles = np.arcsin(np.clip(radii / np.where(distances > 0, distances, 1), 0, 1)) + _PROJECTION_MARGIN
+        half_angles[distances <= radii] = np.pi  # The camera is inside the sphere
+        screen_normal = np.cross(screen_east, screen_north)
+        screen_normal /= np.linalg.norm(screen_normal) * np.sign(screen_normal @ cam_to_screen)
+        elevations = axes @ screen_normal  # The cosine of the angle between the axis of the cone and the screen normal
+        in_front = (half_angles < np.pi / 2) & (elevations > np.sin(np.minimum(half_angles, np.pi / 2)))
+        behind = (half_angles < np.pi / 2) & (elevations < -np.sin(np.minimum(half_angles, np.pi / 2)))
+
+        # The screen points (a, b) of the directions cam_to_screen + a * screen_east + b * screen_north within the
+        # cones: (d . axis) ** 2 >= cos(half_angle) ** 2 * (d . d), i.e. x^T C x >= 0 for x = (a, b, 1)
+        basis = np.stack([screen_east, screen_north, cam_to_screen], axis=1)
+        cones = axes[:, :, np.newaxis] * axes[:, np.newaxis, :] - \
+            (np.cos(half_angles) ** 2)[:, np.newaxis, np.newaxis] * np.eye(3)
+        conics = basis.T @ cones[in_front] @ basis
+        duals = np.linalg.inv(conics) if len(conics) else conics
+        # The tangents a = k (l = (1, 0, -k)) and b = k (l = (0, 1, -k)):
+        # dual[i, i] - 2 k dual[i, 2] + k^2 dual[2, 2] = 0
+        extents = []
+        for i in range(2):
+            roots = np.sqrt(np.maximum(duals[:, i, 2] ** 2 - duals[:, i, i] * duals[:, 2, 2], 0))
+            extents.append(((duals[:, i, 2] - roots) / duals[:, 2, 2], (duals[:, i, 2] + roots) / duals[:, 2, 2]))
+        (a_1, a_2), (b_1, b_2) = extents
+        # The pixel (i, j) is at a = (j + 0.5) / width - 0.5, b = ((height - 1) / 2 - i) / width. One pixel of margin
+        columns = np.stack([(a_1 + 0.5) * width - 0.5, (a_2 + 0.5) * width - 0.5], axis=1)
+        rows = np.stack([(height - 1) / 2 - b_1 * width, (height - 1) / 2 - b_2 * width], axis=1)
+        bounds = np.empty(shape=(len(sphere_geometry), 4), dtype='float64')
+        bounds[:] = (0, height, 0, width)
+        bounds[in_front, 0] = np.floor(rows.min(axis=1)) - 1
+        bounds[in_front, 1] = np.ceil(rows.max(axis=1)) + 2
+        bounds[in_front, 2] = np.floor(columns.min(axis=1)) - 1
+        bounds[in_front, 3] = np.ceil(columns.max(axis=1)) + 2
+        bounds[~np.isfinite(bounds).all(axis=1)] = (0, height, 0, width)
+        bounds[:, :2] = np.clip(bounds[:, :2], row_start, row_stop) - row_start
+        bounds[:, 2:] = np.clip(bounds[:, 2:], column_start, column_stop) - column_start
+        empty = behind | (bounds[:, 0] >= bounds[:, 1]) | (bounds[:, 2] >= bounds[:, 3])
+        bounds[empty] = 0
+        return bounds.astype('int32')
@@ -1,16 +1,16 @@
 from ..BaseObject import BaseColouredObject
-from pydantic import Field
+from pydantic import Field, validator
 
 
 class Light(BaseColouredObject):
     """
-    Class for light. The current implementation only supports one instance of light
+    Class for lights. A scene may hold several lights (up to engine.MAX_LIGHTS), whose contributions add up
     Keywords:
         coordinates:
             the location of the centre of the sphere (np array shape (3,))
         name:
             the name of the sphere. Must be unique (i.e no two spheres may share the same name). For
-            any Light object, the name must be "_light"
+            any Light object, the name must start with "_light" (e.g. "_light", the default, or "_light2")
         ambient:
             the ambient of the sphere (following the Blinn-Phong model). Values must be between 0 and 1.
             Np array shape (3,)
@@ -23,7 +23,21 @@ class Light(BaseColouredObject):
         intensity:
             The intensity of light at a point is inversely proportional to the square of the distance
             I.e intensity_factor = min(k, square_of_distance)/square_of_distance. The square of this intensity
-            parameter represents k here.
+            parameter represents k here. Lights are culled at the points where this factor is below the
+            light cutoff of the scene (see scene.set_light_cutoff)
+        radius:
+            the radius of the light. 0 (the default) is a point light casting hard shadows, a positive radius makes
+            a spherical area light casting soft shadows (see scene.set_soft_shadow_samples)
     """
     name: str = Field('_light', allow_mutation=False)
     intensity: float = 1000
+    radius: float = 0.
+
+    @validator('radius')
+    def _validate_radius(cls, radius):
+        """
+        Checks the non-negativity of radius
+        """
+        if radius < 0:
+            raise ValueError(f'Radius must be a non-negative value')
+        return radius
@@ -54,6 +54,7 @@ class Sphere(BaseSolidObject):
             radius: int = 100000,
             shine: int = 45,
             reflect: float = 0.1,
+            scene=None,
     ) -> 'Sphere':
         """
         Define a plane by defining north and east, as well a point on the plane.
@@ -61,7 +62,8 @@ class Sphere(BaseSolidObject):
         look flat in the image (a bit like earth - it appears flat as the radius is large)
 
         The centre of the sphere is calculated by taking the cross between north and east, and going
-        <radius> units in that direction (from the reference point)
+        <radius> units in that direction (from the reference point).
+        The sphere is registered to scene (the default SceneInterface.scene if None)
         """
         centre_direction = np.cross(north, east)
         centre_direction = (centre_direction / np.linalg.norm(centre_direction)).astype('float32')
@@ -74,5 +76,6 @@ class Sphere(BaseSolidObject):
             diffuse=diffuse,
             specular=specular,
             shine=shine,
-            reflect=reflect
+            reflect=reflect,
+            scene=scene
         )
@@ -1,12 +1,11 @@
 import numpy as np
-from SceneInterface import scene
 
 
 class _AutoNumpyUpdate(np.ndarray):
     """
     This class replaces the numpy arrays defined in the dataclasses.
     This is to ensure the modification of any values results in _SceneInterface object scene being aware
-    of the changes
+    of the changes (the scene the linked dataclass is bound to)
     """
     def __new__(cls, *args, _linked_dataclass=None, **kwargs):
         obj = np.array(*args, **kwargs).view(cls)
@@ -24,5 +23,12 @@ class _AutoNumpyUpdate(np.ndarray):
             return
 
     def __setitem__(self, name, value):
+        linked_dataclass = self._linked_dataclass
+        scene = linked_dataclass._scene
+        if scene is not None and scene._touch(linked_dataclass):
+            # Inside scene.batch: the scene is notified once, when the batch ends
+            super().__setitem__(name, value)
+            return
         super().__setitem__(name, value)
-        scene._assign_updated(self._linked_dataclass)
+        if scene is not None:
+            scene._assign_updated(linked_dataclass)
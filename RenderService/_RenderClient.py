@@ -0,0 +1,78 @@
+import socket
+from typing import List, Optional
+import numpy as np
+from ._protocol import encode_message, receive_message
+
+
+class RenderServiceError(Exception):
+    """
+    Raised when the render server fails a request (e.g. an invalid delta)
+    """
+
+
+class RenderClient:
+    """
+    Blocking client of a RenderServer. Each call sends one request and waits for its response
+    Args:
+        host:
+            the address of the server
+        port:
+            the port of the server
+        timeout:
+            the socket timeout (seconds), None to wait indefinitely
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, timeout: Optional[float] = None):
+        self._connection = socket.create_connection((host, port), timeout=timeout)
+        self._connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._next_id = 0
+
+    def __enter__(self) -> 'RenderClient':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def apply(self, deltas: List[dict]) -> None:
+        """
+        Applies deltas to the scene of the server (see RenderService.apply_deltas for the format), returning once
+        they are applied
+        """
+        self._request({'deltas': deltas})
+
+    def render(
+            self,
+            deltas: Optional[List[dict]] = None,
+            priority: str = 'interactive',
+            reflect: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Applies the deltas (if any) and renders a frame
+        Args:
+            deltas:
+                deltas applied before rendering
+            priority:
+                "interactive" (served before any batch capture) or "batch"
+            reflect:
+                the max reflections of this frame (the scene setting if None)
+        Returns:
+            the frame, a uint8 array of shape (h, w, 3)
+        """
+        capture = {'priority': priority}
+        if reflect is not None:
+            capture['reflect'] = reflect
+        header, payload = self._request({'deltas': deltas, 'capture': capture})
+        return np.frombuffer(payload, dtype=header['dtype']).reshape(header['shape'])
+
+    def _request(self, header: dict):
+        request_id = self._next_id
+        self._next_id += 1
+        self._connection.sendall(encode_message(dict(header, id=request_id)))
+        response, payload = receive_message(self._connection)
+        if response.get('id') != request_id:
+            raise RenderServiceError(f'Unexpected response {response.get("id")} to request {request_id}')
+        if not response['ok']:
+            raise RenderServiceError(response['error'])
+        return response, payload
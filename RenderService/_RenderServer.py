@@ -0,0 +1,371 @@
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+import numpy as np
+from SceneInterface import Scene
+from Scenarios import load_scenario
+from ._deltas import apply_deltas
+from ._protocol import encode_message, read_message
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+# The priorities of captures, highest first
+_PRIORITIES: Tuple[str, ...] = (INTERACTIVE, BATCH)
+
+
+class _RenderJob:
+    """
+    One render, shared by every capture with the same options queued (or arriving while it renders) before the
+    scene changes
+    """
+    def __init__(self, options: tuple, priority: str):
+        self.options = options
+        self.priority = priority
+        self.futures: List[asyncio.Future] = []
+
+
+class RenderServer:
+    """
+    Long-running render service: holds a warm scene (kernels compiled, buffers allocated) and serves scene deltas and
+    capture requests over a local tcp socket (see RenderService._protocol for the framing and RenderClient for a
+    client). Frames are returned as uint8 buffers.
+    Requests are served by a single worker, in this order:
+        1. every delta received so far, applied as one batch (so the scene is uploaded once for all of them)
+        2. the oldest interactive capture, else the oldest batch capture
+    A capture renders the scene with (at least) every delta received before it. Identical captures (same options)
+    waiting for a render share it, as do captures arriving while an identical render is in progress if no delta was
+    received since it started
+    Args:
+        scene:
+            the scene to serve (a new Scene if None). Its output format is set to uint8
+        host:
+            the address to listen on (localhost by default)
+        port:
+            the port to listen on (any free port if 0, see the address property)
+        scenario:
+            the name of a scenario to load into the scene on start (see Scenarios.load_scenario)
+    """
+    def __init__(
+            self,
+            scene: Optional[Scene] = None,
+            host: str = '127.0.0.1',
+            port: int = 0,
+            scenario: Optional[str] = None
+    ):
+        self._scene: Scene = Scene() if scene is None else scene
+        self._host = host
+        self._port = port
+        self._scenario = scenario
+        # The scene is only used from this thread (deltas and renders)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='render-service')
+        self._deltas: List[Tuple[list, asyncio.Future]] = []
+        self._queues: Dict[str, Deque[_RenderJob]] = {priority: deque() for priority in _PRIORITIES}
+        self._queued: Dict[tuple, _RenderJob] = {}
+        self._in_flight: Optional[_RenderJob] = None
+        self._counts: Dict[str, int] = {'captures': 0, 'renders': 0, 'deltas': 0, 'delta_batches': 0}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: set = set()
+        self._worker: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def scene(self) -> Scene:
+        return self._scene
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """
+        The (host, port) the server listens on
+        """
+        if self._server is None:
+            raise RuntimeError(f'The render server is not started')
+        return self._server.sockets[0].getsockname()[:2]
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        """
+        The number of captures received, renders made (captures - renders were coalesced), deltas received and delta
+        batches applied
+        """
+        return dict(self._counts)
+
+    async def start(self) -> Tuple[str, int]:
+        """
+        Prepares the scene (loads the scenario, compiles the kernels) and starts listening. Returns the address
+        """
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        await loop.run_in_executor(self._executor, self._prepare_scene)
+        self._worker = asyncio.create_task(self._work())
+        self._server = await asyncio.start_server(self._handle_connection, self._host, self._port)
+        return self.address
+
+    async def close(self):
+        """
+        Stops listening and cancels the pending requests
+        """
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+        if self._worker is not None:
+            self._worker.cancel()
+        pending = [future for _, future in self._deltas]
+        pending += [future for jobs in self._queues.values() for job in jobs for future in job.futures]
+        for future in pending:
+            future.cancel()
+        self._deltas.clear()
+        self._queued.clear()
+        for jobs in self._queues.values():
+            jobs.clear()
+        self._executor.shutdown(wait=False)
+
+    async def serve_forever(self):
+        """
+        Serves until cancelled (starting the server first if needed), then closes it
+        """
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    def start_thread(self) -> Tuple[str, int]:
+        """
+        Starts the server on an event loop running in a (daemon) thread of its own, e.g. to serve from a script or a
+        test running clients on localhost. Returns the address (see stop_thread)
+        """
+        if self._thread is not None:
+            raise RuntimeError(f'The render server thread is already started')
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='render-service-loop', daemon=True)
+        self._thread.start()
+        try:
+            return asyncio.run_coroutine_threadsafe(self.start(), self._loop).result()
+        except BaseException:
+            self.stop_thread()
+            raise
+
+    def stop_thread(self):
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._thread = None
+        self._loop = None
+
+    def _prepare_scene(self):
+        if self._scenario is not None:
+            load_scenario(self._scenario, scene=self._scene)
+        self._scene.set_output_format('uint8')
+        self._scene.warmup()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Reads the requests of a connection. Each is queued as soon as it is read (so the deltas and captures of a
+        connection are queued in order) and answered when done, so the responses may be out of order (they carry
+        the id of their request)
+        """
+        lock = asyncio.Lock()
+        responses = set()
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    header, _ = await read_message(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                try:
+                    futures = self._submit(header)
+                except (TypeError, ValueError) as error:
+                    futures = (_failed(error), None)
+                response = asyncio.create_task(self._respond(header.get('id'), *futures, writer, lock))
+                responses.add(response)
+                response.add_done_callback(responses.discard)
+        except ValueError:
+            # Malformed message (invalid framing or json): the connection cannot be resynchronised
+            pass
+        finally:
+            for response in list(responses):
+                response.cancel()
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _respond(
+            self,
+            request_id,
+            delta_future: Optional[asyncio.Future],
+            capture_future: Optional[asyncio.Future],
+            writer: asyncio.StreamWriter,
+            lock: asyncio.Lock
+    ):
+        results = await asyncio.gather(
+            *[future for future in (delta_future, capture_future) if future is not None],
+            return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            message = encode_message({'id': request_id, 'ok': False, 'error': _describe(errors[0])})
+        elif capture_future is not None:
+            frame: np.ndarray = results[-1]
+            message = encode_message(
+                {'id': request_id, 'ok': True, 'shape': list(frame.shape), 'dtype': str(frame.dtype)},
+                frame.tobytes()
+            )
+        else:
+            message = encode_message({'id': request_id, 'ok': True})
+        async with lock:
+            writer.write(message)
+            await writer.drain()
+
+    def _submit(self, header: dict) -> Tuple[Optional[asyncio.Future], Optional[asyncio.Future]]:
+        """
+        Queues the deltas and/or the capture of a request. Returns their futures (None if not requested)
+        """
+        deltas = header.get('deltas')
+        capture = header.get('capture')
+        if deltas is not None and not isinstance(deltas, list):
+            raise TypeError(f'deltas must be a list')
+        options, priority = _capture_options(capture) if capture is not None else (None, None)
+        delta_future = self._submit_deltas(deltas) if deltas else None
+        capture_future = self._submit_capture(options, priority) if capture is not None else None
+        self._wakeup.set()
+        return delta_future, capture_future
+
+    def _submit_deltas(self, deltas: list) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._deltas.append((deltas, future))
+        self._counts['deltas'] += 1
+        return future
+
+    def _submit_capture(self, options: tuple, priority: str) -> asyncio.Future:
+        self._counts['captures'] += 1
+        in_flight = self._in_flight
+        if in_flight is not None and in_flight.options == options and not self._deltas:
+            job = in_flight
+        else:
+            job = self._queued.get(options)
+            if job is None:
+                job = self._queued[options] = _RenderJob(options, priority)
+                self._queues[priority].append(job)
+            elif _PRIORITIES.index(priority) < _PRIORITIES.index(job.priority):
+                self._queues[job.priority].remove(job)
+                job.priority = priority
+                self._queues[priority].append(job)
+        future = asyncio.get_running_loop().create_future()
+        job.futures.append(future)
+        return future
+
+    def _next_job(self) -> Optional[_RenderJob]:
+        for priority in _PRIORITIES:
+            if self._queues[priority]:
+                job = self._queues[priority].popleft()
+                del self._queued[job.options]
+                return job
+        return None
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # No await between applying the last deltas and starting the render, so the render includes every
+            # delta received before the captures it serves
+            while self._deltas:
+                await self._apply_deltas()
+            job = self._next_job()
+            if job is None:
+                continue
+            self._wakeup.set()
+            self._in_flight = job
+            self._counts['renders'] += 1
+            try:
+                frame = await loop.run_in_executor(self._executor, self._render, *job.options)
+            except Exception as error:
+                for future in job.futures:
+                    if not future.done():
+                        future.set_exception(error)
+            else:
+                for future in job.futures:
+                    if not future.done():
+                        future.set_result(frame)
+            finally:
+                self._in_flight = None
+
+    async def _apply_deltas(self):
+        batch, self._deltas = self._deltas, []
+        self._counts['delta_batches'] += 1
+        errors = await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._apply, [deltas for deltas, _ in batch]
+        )
+        for (_, future), error in zip(batch, errors):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+    def _apply(self, batch: List[list]) -> List[Optional[Exception]]:
+        """
+        Applies the deltas of several requests. Returns the error of each request (None if applied)
+        """
+        errors = []
+        for deltas in batch:
+            try:
+                apply_deltas(self._scene, deltas)
+            except Exception as error:
+                errors.append(error)
+            else:
+                errors.append(None)
+        # A scenario delta clears the scene, which restores the float32 output format
+        self._scene.set_output_format('uint8')
+        return errors
+
+    def _render(self, reflect: Optional[int]) -> np.ndarray:
+        scene = self._scene
+        if reflect is None:
+            return scene.capture_frame(record=False)
+        previous = scene.reflect
+        scene.set_reflect(reflect)
+        try:
+            return scene.capture_frame(record=False)
+        finally:
+            scene.set_reflect(previous)
+
+
+def _capture_options(capture: dict) -> Tuple[tuple, str]:
+    """
+    Validates the capture of a request: {"priority": "interactive" (default) or "batch", "reflect": the max
+    reflections of this frame only (the scene setting if omitted)}. Returns the options (the key captures are
+    coalesced by) and the priority
+    """
+    if not isinstance(capture, dict):
+        raise TypeError(f'capture must be a json object')
+    priority = capture.get('priority', INTERACTIVE)
+    if priority not in _PRIORITIES:
+        raise ValueError(f'priority must be one of {list(_PRIORITIES)} (received "{priority}")')
+    reflect = capture.get('reflect')
+    if reflect is not None and (not isinstance(reflect, int) or not 0 <= reflect <= 10):
+        raise ValueError(f'reflect must be an integer between 0 (incl.) and 10 (incl.)')
+    return (reflect,), priority
+
+
+def _failed(error: Exception) -> asyncio.Future:
+    future = asyncio.get_running_loop().create_future()
+    future.set_exception(error)
+    return future
+
+
+def _describe(error: BaseException) -> str:
+    if isinstance(error, asyncio.CancelledError):
+        return 'CancelledError: the render server is closing'
+    return f'{type(error).__name__}: {error}'
@@ -0,0 +1,3 @@
+from ._RenderServer import RenderServer, INTERACTIVE, BATCH
+from ._RenderClient import RenderClient, RenderServiceError
+from ._deltas import apply_deltas
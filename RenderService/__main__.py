@@ -0,0 +1,32 @@
+import argparse
+import asyncio
+import sys
+from Scenarios import scenarios
+from ._RenderServer import RenderServer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m RenderService',
+        description='Serves scene deltas and capture requests from a warm scene (see RenderService.RenderClient)'
+    )
+    parser.add_argument('--scenario', default=None, choices=scenarios(), help='the scenario to load on start')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    server = RenderServer(host=args.host, port=args.port, scenario=args.scenario)
+
+    async def serve():
+        await server.start()
+        print(f'Render service listening on {server.address[0]}:{server.address[1]}', file=sys.stderr)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
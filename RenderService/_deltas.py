@@ -0,0 +1,92 @@
+import numpy as np
+from typing import Any, Callable, Dict, List
+from SceneInterface import Scene
+from Objects.MetaObjects import Camera, Light
+from Objects.SolidObjects import Sphere
+from Scenarios import load_scenario
+
+# The object types a delta may add
+_OBJECT_TYPES: Dict[str, type] = {
+    'Sphere': Sphere,
+    'Light': Light,
+    'Camera': Camera,
+}
+
+
+def _to_value(value: Any) -> Any:
+    """
+    Converts a json value to the value of an object field: lists of numbers become float32 vectors, lists of lists
+    become tuples of float32 vectors (e.g. the screen_vectors of a camera)
+    """
+    if isinstance(value, list) and value and all(isinstance(item, list) for item in value):
+        return tuple(np.array(item, dtype='float32') for item in value)
+    if isinstance(value, list) and all(isinstance(item, (int, float)) for item in value):
+        return np.array(value, dtype='float32')
+    return value
+
+
+def _values(delta: dict) -> Dict[str, Any]:
+    values = delta.get('values', {})
+    if not isinstance(values, dict):
+        raise TypeError(f'The values of a delta must be a json object')
+    return {name: _to_value(value) for name, value in values.items()}
+
+
+def _add(scene: Scene, delta: dict) -> None:
+    object_type = delta.get('type')
+    if object_type not in _OBJECT_TYPES:
+        raise ValueError(f'Cannot add objects of type "{object_type}" (expecting one of {list(_OBJECT_TYPES)})')
+    values = _values(delta)
+    if object_type == 'Camera' and 'resolution' in values:
+        values['resolution'] = tuple(int(size) for size in values['resolution'])
+    _OBJECT_TYPES[object_type](scene=scene, **values)
+
+
+def _update(scene: Scene, delta: dict) -> None:
+    object_item = scene[delta['name']]
+    for name, value in _values(delta).items():
+        setattr(object_item, name, value)
+
+
+def _remove(scene: Scene, delta: dict) -> None:
+    scene.de_register_object(delta['name'])
+
+
+def _settings(scene: Scene, delta: dict) -> None:
+    values = delta.get('values', {})
+    if 'eps' in values:
+        scene.set_eps(float(values['eps']))
+    if 'reflect' in values:
+        scene.set_reflect(int(values['reflect']))
+
+
+def _scenario(scene: Scene, delta: dict) -> None:
+    load_scenario(delta['name'], scene=scene)
+
+
+_OPERATIONS: Dict[str, Callable[[Scene, dict], None]] = {
+    'add': _add,
+    'update': _update,
+    'remove': _remove,
+    'settings': _settings,
+    'scenario': _scenario,
+}
+
+
+def apply_deltas(scene: Scene, deltas: List[dict]) -> None:
+    """
+    Applies the deltas to the scene, in order. A delta is a json object with an "op" and:
+        "add": the "type" ("Sphere", "Light" or "Camera") and the keywords ("values") of a new object
+        "update": the "name" of an object and the fields to assign ("values")
+        "remove": the "name" of the object to de-register
+        "settings": the "values" of "eps" and/or "reflect"
+        "scenario": the "name" of the scenario to load (see Scenarios.load_scenario), replacing every object
+    Vectors are given as lists (e.g. "coordinates": [0, 1, 2]). Raises an error on the first invalid delta (the
+    deltas before it stay applied)
+    """
+    if not isinstance(deltas, list):
+        raise TypeError(f'deltas must be a list')
+    for delta in deltas:
+        if not isinstance(delta, dict) or delta.get('op') not in _OPERATIONS:
+            raise ValueError(f'Invalid delta {delta!r} (the op must be one of {list(_OPERATIONS)})')
+        _OPERATIONS[delta['op']](scene, delta)
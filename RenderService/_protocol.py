@@ -0,0 +1,62 @@
+import asyncio
+import json
+import socket
+import struct
+from typing import Tuple
+
+# Every message is framed as: header length, payload length (two big-endian uint32), the json header (utf-8) and the
+# binary payload (the frame of a render response, empty otherwise)
+_PREFIX = struct.Struct('>II')
+# Headers larger than this are rejected (deltas are small, frames travel in the payload)
+MAX_HEADER_BYTES = 16 * 2 ** 20
+
+
+def encode_message(header: dict, payload: bytes = b'') -> bytes:
+    encoded_header = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    return _PREFIX.pack(len(encoded_header), len(payload)) + encoded_header + payload
+
+
+def _decode_header(encoded_header: bytes) -> dict:
+    header = json.loads(encoded_header.decode('utf-8'))
+    if not isinstance(header, dict):
+        raise ValueError(f'The header of a message must be a json object')
+    return header
+
+
+def _check_prefix(prefix: bytes) -> Tuple[int, int]:
+    header_length, payload_length = _PREFIX.unpack(prefix)
+    if header_length > MAX_HEADER_BYTES:
+        raise ValueError(f'Message header of {header_length} bytes exceeds {MAX_HEADER_BYTES} bytes')
+    return header_length, payload_length
+
+
+async def read_message(reader: asyncio.StreamReader) -> Tuple[dict, bytes]:
+    """
+    Reads a message from an asyncio stream. Raises asyncio.IncompleteReadError if the stream is closed
+    """
+    header_length, payload_length = _check_prefix(await reader.readexactly(_PREFIX.size))
+    header = _decode_header(await reader.readexactly(header_length))
+    payload = await reader.readexactly(payload_length) if payload_length else b''
+    return header, payload
+
+
+def _receive_exactly(connection: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = connection.recv_into(view[received:])
+        if not count:
+            raise ConnectionError(f'Connection closed by the render server')
+        received += count
+    return bytes(buffer)
+
+
+def receive_message(connection: socket.socket) -> Tuple[dict, bytes]:
+    """
+    Reads a message from a (blocking) socket
+    """
+    header_length, payload_length = _check_prefix(_receive_exactly(connection, _PREFIX.size))
+    header = _decode_header(_receive_exactly(connection, header_length))
+    payload = _receive_exactly(connection, payload_length) if payload_length else b''
+    return header, payload
@@ -1 +1 @@
-from .render_scene_images import render_scene_images
+from .render_scene_images import build_scene, render_scene_images
@@ -22,6 +22,10 @@ light_settings = {
 }
 
 
-Camera(**camera_settings)
-Light(**light_settings)
+def build_meta_objects(scene=None):
+    """
+    Registers the camera and light of scenario 3 to scene (the default SceneInterface.scene if None)
+    """
+    Camera(**camera_settings, scene=scene)
+    Light(**light_settings, scene=scene)
 
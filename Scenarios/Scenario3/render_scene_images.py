@@ -1,18 +1,24 @@
-import Scenarios.Scenario3.solid_objects
-import Scenarios.Scenario3.meta_objects
-# Need to import above to population the scene with the necessary objects
-
 from SceneInterface import scene
-from Scenarios import show_image, save_image
+from .meta_objects import build_meta_objects
+from .solid_objects import build_solid_objects
+from Scenarios import show_image, save_image, default_writer
 import numpy as np
 import os
 
 _savedir = f'output_media{os.sep}Scenario3'
 
 
+def build_scene(scene=None):
+    """
+    Populates scene (the default SceneInterface.scene if None) with the objects of scenario 3
+    """
+    build_meta_objects(scene=scene)
+    build_solid_objects(scene=scene)
+
+
 def render_scene_images(save: bool = False, show: bool = True) -> np.ndarray:
     """
-    Function runs scenario 3 (3 frames)
+    Function loads (into a cleared scene) and runs scenario 3 (3 frames)
     Args:
         save:
             boolean. If true, function will save all outputs as a .png file to the directory output_media/scenario3
@@ -23,6 +29,9 @@ def render_scene_images(save: bool = False, show: bool = True) -> np.ndarray:
         a numpy array of size (3, 800, 1280, 3) corresponding to 3 frames with resolution 800 x 1280 with
         3 channels (rgb)
     """
+    scene.clear()
+    build_scene()
+
     # Each section is a separate frame. Only the light source and camera details are changed each time
     # r1 -> 1 reflection
     scene.set_reflect(reflect=1)
@@ -42,4 +51,7 @@ def render_scene_images(save: bool = False, show: bool = True) -> np.ndarray:
     show_image(image=frame, show=show)
     save_image(save_dir=_savedir, image=frame, image_name='r5', save=save)
 
+    if save:
+        # Wait for the images to be written (raises any write error)
+        default_writer().flush()
     return scene.frames
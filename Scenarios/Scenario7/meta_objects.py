@@ -22,5 +22,9 @@ light_settings = {
 }
 
 
-Camera(**camera_settings)
-Light(**light_settings)
+def build_meta_objects(scene=None):
+    """
+    Registers the camera and light of scenario 7 to scene (the default SceneInterface.scene if None)
+    """
+    Camera(**camera_settings, scene=scene)
+    Light(**light_settings, scene=scene)
@@ -1,18 +1,24 @@
-import Scenarios.Scenario7.solid_objects
-import Scenarios.Scenario7.meta_objects
-# Need to import above to population the scene with the necessary objects
-
 from SceneInterface import scene
-from Scenarios import show_image, save_image
+from .meta_objects import build_meta_objects
+from .solid_objects import build_solid_objects
+from Scenarios import show_image, save_image, default_writer
 import numpy as np
 import os
 
 _savedir = f'output_media{os.sep}Scenario7'
 
 
+def build_scene(scene=None):
+    """
+    Populates scene (the default SceneInterface.scene if None) with the objects of scenario 7
+    """
+    build_meta_objects(scene=scene)
+    build_solid_objects(scene=scene)
+
+
 def render_scene_images(save: bool = False, show: bool = True) -> np.ndarray:
     """
-    Function runs scenario 7 (8 frames)
+    Function loads (into a cleared scene) and runs scenario 7 (8 frames)
     Args:
         save:
             boolean. If true, function will save all outputs as a .png file to the directory output_media/scenario7
@@ -23,6 +29,9 @@ def render_scene_images(save: bool = False, show: bool = True) -> np.ndarray:
         a numpy array of size (8, 1080, 1920, 3) corresponding to 8 frames with resolution 1080 x 1920 with
         3 channels (rgb)
     """
+    scene.clear()
+    build_scene()
+
     # Each section is a separate frame. Only the light source and camera details are changed each time
     # 7a
     frame = scene.capture_frame()
@@ -100,4 +109,7 @@ def render_scene_images(save: bool = False, show: bool = True) -> np.ndarray:
     show_image(image=frame, show=show)
     save_image(save_dir=_savedir, image=frame, image_name='7h', save=save)
 
+    if save:
+        # Wait for the images to be written (raises any write error)
+        default_writer().flush()
     return scene.frames
@@ -175,11 +175,16 @@ plane_settings = [
     }
 ]
 
-ind1 = -1
-for ind1, setting in enumerate(sphere_settings):
-    new_setting = {**{'name': f'sphere{ind1}'}, **setting}
-    Sphere(**new_setting)
 
-for ind2, setting in enumerate(plane_settings):
-    new_setting = {**{'name': f'sphere{ind2 + ind1 + 1}'}, **setting}
-    Sphere.create_flat_surface(**setting)
+def build_solid_objects(scene=None):
+    """
+    Registers the spheres and planes of scenario 7 to scene (the default SceneInterface.scene if None)
+    """
+    ind1 = -1
+    for ind1, setting in enumerate(sphere_settings):
+        new_setting = {**{'name': f'sphere{ind1}'}, **setting}
+        Sphere(**new_setting, scene=scene)
+
+    for ind2, setting in enumerate(plane_settings):
+        new_setting = {**{'name': f'sphere{ind2 + ind1 + 1}'}, **setting}
+        Sphere.create_flat_surface(**setting, scene=scene)
@@ -1 +1 @@
-from .render_scene_image import render_scene_images
+from .render_scene_image import build_scene, render_scene_images
@@ -1,2 +1,7 @@
-from .save import save_image
+from .writer import ImageWriter
+from .save import save_image, default_writer
 from .show import show_image
+from .video import VideoSink
+from .publisher import FramePublisher, FrameSubscriber
+from .heatmap import diagnostics_to_images, save_diagnostics, false_colour
+from .registry import register_scenario, scenarios, load_scenario, unload_scenario, render_scenario
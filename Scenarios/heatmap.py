@@ -0,0 +1,95 @@
+import numpy as np
+from typing import Dict, Optional
+from .save import save_image
+from .writer import ImageWriter
+
+# The names of the diagnostics channels (see scene.diagnostics), in order
+DIAGNOSTICS_CHANNELS = ('bounces', 'intersection_tests', 'shadow_tests', 'first_hit')
+
+# Control points of the false-colour map, from cold (low values) to hot (high values)
+_COLOUR_MAP = np.array([
+    [0, 0, 0.5],
+    [0, 0.4, 1],
+    [0, 0.9, 0.6],
+    [0.9, 0.9, 0],
+    [1, 0.3, 0],
+    [1, 1, 1],
+], dtype='float32')
+
+
+def false_colour(values: np.ndarray, max_value: Optional[float] = None) -> np.ndarray:
+    """
+    Maps an array of shape (h, w) to a false-colour rgb image of shape (h, w, 3) (float values between 0 and 1)
+    Args:
+        values:
+            the (non-negative) values to map
+        max_value:
+            the value mapped to the hottest colour. If None, the maximum of values is used
+    """
+    values = values.astype('float32')
+    if max_value is None:
+        max_value = float(values.max())
+    scaled = np.clip(values / max(max_value, 1e-12), 0, 1) * (len(_COLOUR_MAP) - 1)
+    low = np.floor(scaled).astype('int32')
+    high = np.minimum(low + 1, len(_COLOUR_MAP) - 1)
+    fraction = (scaled - low)[..., None]
+    return _COLOUR_MAP[low] * (1 - fraction) + _COLOUR_MAP[high] * fraction
+
+
+def _index_colours(indices: np.ndarray) -> np.ndarray:
+    """
+    Maps an array of sphere indices of shape (h, w) to an rgb image, a distinct colour per index (black for -1)
+    """
+    # Golden ratio hue spacing keeps neighbouring indices far apart in colour
+    hue = (indices.astype('float32') * 0.618034) % 1
+    channels = np.clip(np.abs((hue[..., None] * 6 + np.array([0, 4, 2], dtype='float32')) % 6 - 3) - 1, 0, 1)
+    channels = 0.25 + 0.75 * channels
+    channels[indices < 0] = 0
+    return channels.astype('float32')
+
+
+def diagnostics_to_images(diagnostics: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Converts the per-pixel diagnostics of a frame (see scene.diagnostics) to false-colour rgb images
+    Args:
+        diagnostics:
+            the int32 array of shape (h, w, 4) returned by scene.diagnostics
+    Returns:
+        a dict mapping each name of DIAGNOSTICS_CHANNELS to its image (float values between 0 and 1). The
+        first_hit image gives every sphere its own colour (pixels not hitting any sphere are black)
+    """
+    if diagnostics.ndim != 3 or diagnostics.shape[2] != len(DIAGNOSTICS_CHANNELS):
+        raise ValueError(f'diagnostics must be of shape (h, w, {len(DIAGNOSTICS_CHANNELS)})')
+    images = {
+        name: false_colour(diagnostics[:, :, i])
+        for i, name in enumerate(DIAGNOSTICS_CHANNELS[:-1])
+    }
+    images['first_hit'] = _index_colours(diagnostics[:, :, 3])
+    return images
+
+
+def save_diagnostics(
+        save_dir: str,
+        diagnostics: np.ndarray,
+        image_name: str,
+        save: bool = False,
+        writer: Optional[ImageWriter] = None
+):
+    """
+    Saves the false-colour images of the diagnostics (see diagnostics_to_images) if save is true, one image
+    per channel named <image_name>_<channel>
+    Args:
+        save_dir:
+            the path to the repository to save the images to
+        diagnostics:
+            the int32 array of shape (h, w, 4) returned by scene.diagnostics
+        image_name:
+            the prefix of the image file names
+        save:
+            if False, function will not save
+        writer:
+            the ImageWriter to use (see save_image)
+    """
+    if save:
+        for name, image in diagnostics_to_images(diagnostics).items():
+            save_image(save_dir=save_dir, image=image, image_name=f'{image_name}_{name}', save=True, writer=writer)
@@ -0,0 +1,329 @@
+import time
+import secrets
+from multiprocessing import shared_memory, resource_tracker
+from typing import Optional, Tuple
+import numpy as np
+
+# The dtypes frames can be published as (see scene.set_output_format)
+_DTYPES: Tuple[str, ...] = ('float32', 'float16', 'uint8')
+# The policies of a publisher when the ring is full (see FramePublisher)
+_POLICIES: Tuple[str, ...] = ('drop', 'block')
+_MAGIC = 0x52415952494E47  # "RAYRING"
+# The fields of the header (an int64 array at the start of the shared memory block), followed by the sequence of
+# every slot and the cursor of every reader
+_MAGIC_FIELD, _SLOTS, _HEIGHT, _WIDTH, _CHANNELS, _DTYPE, _POLICY, _PUBLISHED, _CLOSED, _READERS = range(10)
+_HEADER_FIELDS = 10
+# The frames start on a 64 byte boundary (a cache line)
+_ALIGNMENT = 64
+# The interval (seconds) blocked readers/writers poll the header at
+_POLL_INTERVAL = 0.0005
+# The sequence of a slot being written
+_WRITING = -1
+# The cursor of a reader slot no reader is attached to
+_DETACHED = -1
+
+
+def _layout(slots: int, max_readers: int, frame_bytes: int) -> Tuple[int, int]:
+    """
+    Returns the offset of the first frame and the size (bytes) of the shared memory block of a ring
+    """
+    header_bytes = (_HEADER_FIELDS + slots + max_readers) * 8
+    offset = -(-header_bytes // _ALIGNMENT) * _ALIGNMENT
+    return offset, offset + slots * frame_bytes
+
+
+def _untrack(memory: shared_memory.SharedMemory) -> None:
+    """
+    Stops the resource tracker from unlinking a block when the process exits. Only the publisher unlinks its block
+    (when closed): the tracker would otherwise unlink it as soon as any reader process exits, and the spawned
+    processes share the tracker of their parent
+    """
+    resource_tracker.unregister(memory._name, 'shared_memory')
+
+
+def _wait(condition, timeout: Optional[float], what: str) -> None:
+    """
+    Polls condition until it is true. Raises a TimeoutError after timeout seconds (never if timeout is None)
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while not condition():
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(f'Timed out after {timeout}s waiting for {what}')
+        time.sleep(_POLL_INTERVAL)
+
+
+class _FrameRing:
+    """
+    The views of a ring of frame slots in a shared memory block: the header fields, the sequence of the frame each
+    slot holds, the cursor of each reader and the frames
+    """
+    def __init__(self, memory: shared_memory.SharedMemory):
+        self._memory = memory
+        fields = np.ndarray(shape=(_HEADER_FIELDS,), dtype='int64', buffer=memory.buf)
+        if fields[_MAGIC_FIELD] != _MAGIC:
+            raise ValueError(f'The shared memory block "{memory.name}" is not a frame ring')
+        slots, readers = int(fields[_SLOTS]), int(fields[_READERS])
+        self.shape = (int(fields[_HEIGHT]), int(fields[_WIDTH]), int(fields[_CHANNELS]))
+        self.dtype = np.dtype(_DTYPES[fields[_DTYPE]])
+        self.policy = _POLICIES[fields[_POLICY]]
+        header = np.ndarray(shape=(_HEADER_FIELDS + slots + readers,), dtype='int64', buffer=memory.buf)
+        self.fields = header[:_HEADER_FIELDS]
+        self.sequences = header[_HEADER_FIELDS:_HEADER_FIELDS + slots]
+        self.cursors = header[_HEADER_FIELDS + slots:]
+        offset, _ = _layout(slots, readers, int(np.prod(self.shape)) * self.dtype.itemsize)
+        self.frames = np.ndarray(shape=(slots,) + self.shape, dtype=self.dtype, buffer=memory.buf, offset=offset)
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    def release(self, unlink: bool = False) -> None:
+        """
+        Drops the views and closes the shared memory block (unlinking it first if unlink is True). If frames read
+        from it are still referenced, the block is only unmapped once they are garbage collected
+        """
+        self.fields = self.sequences = self.cursors = self.frames = None
+        if unlink:
+            # unlink unregisters the block from the resource tracker (see _untrack)
+            resource_tracker.register(self._memory._name, 'shared_memory')
+            self._memory.unlink()
+        try:
+            self._memory.close()
+        except BufferError:
+            pass
+
+
+class FramePublisher:
+    """
+    Publishes rendered frames to other processes through a ring of frame slots in a shared memory block
+    (multiprocessing.shared_memory), so frames are not pickled through pipes. Frame n is copied into slot
+    n % slots, and readers in other processes attach to the block by name (see FrameSubscriber) and read the frames
+    as zero-copy numpy views.
+    Attach it to a scene with scene.set_frame_publisher, so every captured frame is published:
+
+        with FramePublisher((1080, 1920), 'uint8', slots=4, policy='drop') as publisher:
+            scene.set_frame_publisher(publisher)
+            ...  # FrameSubscriber(publisher.name) in the consumer processes
+
+    The publisher owns the block: it is unlinked when the publisher is closed (use it as a context manager, a block
+    left by a process that did not close its publisher stays in /dev/shm).
+    Keywords:
+        shape:
+            the (height, width) of the frames (the frames are rgb)
+        dtype:
+            the dtype of the frames, one of "float32", "float16" or "uint8" (see scene.set_output_format)
+        slots:
+            the number of frames in the ring
+        policy:
+            what publish does when the slot of the next frame holds a frame an attached reader has not read yet:
+            "drop" overwrites it (the reader skips to the oldest frame still in the ring, so slow readers never slow
+            down rendering) and "block" waits until every attached reader has read it
+        max_readers:
+            the number of readers that may be attached at once (the readers blocking the publisher)
+        name:
+            the name of the shared memory block (a random name if None)
+    """
+    def __init__(
+            self,
+            shape: Tuple[int, int],
+            dtype: str = 'float32',
+            slots: int = 4,
+            policy: str = 'drop',
+            max_readers: int = 1,
+            name: Optional[str] = None
+    ):
+        if len(shape) != 2 or min(shape) < 1:
+            raise ValueError(f'shape must be a positive (height, width) (received {shape})')
+        if dtype not in _DTYPES:
+            raise ValueError(f'dtype must be one of {list(_DTYPES)} (received "{dtype}")')
+        if policy not in _POLICIES:
+            raise ValueError(f'policy must be one of {list(_POLICIES)} (received "{policy}")')
+        if slots < 2:
+            raise ValueError(f'slots must be at least 2')
+        if max_readers < 1:
+            raise ValueError(f'max_readers must be at least 1')
+        frame_bytes = shape[0] * shape[1] * 3 * np.dtype(dtype).itemsize
+        _, size = _layout(slots, max_readers, frame_bytes)
+        memory = shared_memory.SharedMemory(
+            name=name or f'raytracing_{secrets.token_hex(6)}',
+            create=True,
+            size=size
+        )
+        fields = np.ndarray(shape=(_HEADER_FIELDS + slots + max_readers,), dtype='int64', buffer=memory.buf)
+        fields[:] = 0
+        fields[_HEADER_FIELDS:_HEADER_FIELDS + slots] = _WRITING  # no frame yet
+        fields[_HEADER_FIELDS + slots:] = _DETACHED
+        fields[[_SLOTS, _HEIGHT, _WIDTH, _CHANNELS, _DTYPE, _POLICY, _READERS]] = [
+            slots, shape[0], shape[1], 3, _DTYPES.index(dtype), _POLICIES.index(policy), max_readers
+        ]
+        fields[_MAGIC_FIELD] = _MAGIC  # last, so the block is only recognised once initialised
+        del fields
+        _untrack(memory)
+        self._ring = _FrameRing(memory)
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def name(self) -> str:
+        """
+        The name readers attach to the shared memory block by
+        """
+        return self._ring.name
+
+    @property
+    def published(self) -> int:
+        """
+        The number of frames published so far (the sequence of the next frame)
+        """
+        return int(self._ring.fields[_PUBLISHED])
+
+    def publish(self, frame: np.ndarray, timeout: Optional[float] = None) -> int:
+        """
+        Copies a frame into the next slot of the ring and returns its sequence. With the "block" policy, waits until
+        every attached reader has read the frame the slot holds (raises a TimeoutError after timeout seconds, never
+        if timeout is None)
+        """
+        if self._closed:
+            raise RuntimeError(f'Cannot publish to a closed {self.__class__.__name__}')
+        ring = self._ring
+        if frame.shape != ring.shape:
+            raise ValueError(f'frame must be of shape {ring.shape} (received {frame.shape})')
+        if frame.dtype != ring.dtype:
+            raise TypeError(f'frame must be of dtype {ring.dtype} (received {frame.dtype})')
+        sequence = int(ring.fields[_PUBLISHED])
+        slots = len(ring.frames)
+        if ring.policy == 'block' and sequence >= slots:
+            # A reader holds the frames from its cursor onwards (see FrameSubscriber.read)
+            overwritten = sequence - slots
+            _wait(
+                lambda: all(cursor == _DETACHED or cursor > overwritten for cursor in ring.cursors),
+                timeout,
+                f'the readers of "{self.name}" to read frame {overwritten}'
+            )
+        slot = sequence % slots
+        # The sequence of the slot is invalidated while it is written, so readers can tell a torn frame
+        ring.sequences[slot] = _WRITING
+        ring.frames[slot] = frame
+        ring.sequences[slot] = sequence
+        ring.fields[_PUBLISHED] = sequence + 1
+        return sequence
+
+    def close(self) -> None:
+        """
+        Marks the ring closed (readers waiting for a frame raise an EOFError once they have read every frame) and
+        unlinks the shared memory block. Calling close more than once is safe
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._ring.fields[_CLOSED] = 1
+        self._ring.release(unlink=True)
+
+
+class FrameSubscriber:
+    """
+    Reads the frames of a FramePublisher from another process, attaching to its shared memory block by name. The
+    frames are returned as numpy views of the ring (no copy): with the "block" policy a frame stays valid until the
+    next read (the publisher waits for it), with the "drop" policy the publisher may overwrite it once it has
+    published slots more frames (see is_valid)
+    Keywords:
+        name:
+            the name of the shared memory block (see FramePublisher.name)
+        reader:
+            the index (below the max_readers of the publisher) of the cursor of this reader. Each reader attached at
+            once must use its own index
+        latest:
+            if True, the reader starts at the last frame published, else at the oldest frame still in the ring
+    """
+    def __init__(self, name: str, reader: int = 0, latest: bool = False):
+        memory = shared_memory.SharedMemory(name=name)
+        _untrack(memory)
+        self._ring = _FrameRing(memory)
+        if not 0 <= reader < len(self._ring.cursors):
+            self._ring.release()
+            raise ValueError(f'reader must be between 0 and {len(self._ring.cursors) - 1} (received {reader})')
+        if self._ring.cursors[reader] != _DETACHED:
+            self._ring.release()
+            raise ValueError(f'Reader {reader} of "{name}" is already attached')
+        published = int(self._ring.fields[_PUBLISHED])
+        self._next = max(published - (1 if latest else len(self._ring.frames)), 0)
+        self._reader = reader
+        self._dropped = 0
+        self._ring.cursors[reader] = self._next
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self._ring.shape
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._ring.dtype
+
+    @property
+    def dropped(self) -> int:
+        """
+        The number of frames the publisher overwrote before this reader read them ("drop" policy)
+        """
+        return self._dropped
+
+    def read(self, timeout: Optional[float] = None) -> Tuple[int, np.ndarray]:
+        """
+        Returns the sequence and a view of the next frame, waiting for it to be published (raises a TimeoutError
+        after timeout seconds, never if timeout is None). Frames overwritten before they are read are skipped.
+        Raises an EOFError once the publisher is closed and every frame is read
+        """
+        if self._closed:
+            raise RuntimeError(f'Cannot read from a closed {self.__class__.__name__}')
+        ring = self._ring
+        slots = len(ring.frames)
+        # The previous frame is released: with the "block" policy, the publisher may now overwrite it
+        ring.cursors[self._reader] = self._next
+
+        def published() -> bool:
+            return ring.fields[_PUBLISHED] > self._next or bool(ring.fields[_CLOSED])
+
+        _wait(published, timeout, f'frame {self._next} of "{ring.name}"')
+        while True:
+            latest = int(ring.fields[_PUBLISHED])
+            if latest <= self._next:
+                raise EOFError(f'The publisher of "{ring.name}" is closed')
+            if latest - self._next > slots:
+                # Overwritten before it was read ("drop" policy): skip to the oldest frame still in the ring
+                self._dropped += latest - slots - self._next
+                self._next = latest - slots
+            sequence = self._next
+            ring.cursors[self._reader] = sequence
+            if ring.sequences[sequence % slots] == sequence:
+                self._next = sequence + 1
+                return sequence, ring.frames[sequence % slots]
+            # The slot is being overwritten by a newer frame: move on once it is published
+            time.sleep(_POLL_INTERVAL)
+
+    def is_valid(self, sequence: int) -> bool:
+        """
+        Returns whether the view of a frame returned by read still holds that frame (it is not being overwritten)
+        """
+        return not self._closed and self._ring.sequences[sequence % len(self._ring.frames)] == sequence
+
+    def close(self) -> None:
+        """
+        Detaches from the ring (the publisher no longer waits for this reader). Every view returned by read becomes
+        invalid. Calling close more than once is safe
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._ring.cursors[self._reader] = _DETACHED
+        self._ring.release()
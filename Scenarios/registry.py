@@ -0,0 +1,85 @@
+import importlib
+import numpy as np
+from types import ModuleType
+from typing import Dict, List, Optional
+from SceneInterface import scene as default_scene, Scene
+
+# Maps the scenario names to the module declaring their build_scene and render_scene_images functions. A module
+# is only imported when its scenario is first loaded or rendered
+_SCENARIOS: Dict[str, str] = {
+    'scenario3': 'Scenarios.Scenario3',
+    'scenario7': 'Scenarios.Scenario7',
+    'scenario8': 'Scenarios.Scenario8',
+}
+
+
+def register_scenario(name: str, module: str):
+    """
+    Registers a scenario. The module must define build_scene(scene) (populating the scene with the scenario's
+    objects) and
+    render_scene_images(save, show) (loading and rendering the scenario, returning the frames)
+    Args:
+        name:
+            the name of the scenario (e.g. "scenario3")
+        module:
+            the import path of the module (e.g. "Scenarios.Scenario3"). It is not imported until needed
+    """
+    if name in _SCENARIOS:
+        raise ValueError(f'Scenario "{name}" already exists')
+    _SCENARIOS[name] = module
+
+
+def scenarios() -> List[str]:
+    """
+    Returns the names of the registered scenarios
+    """
+    return list(_SCENARIOS)
+
+
+def _scenario_module(name: str) -> ModuleType:
+    if name not in _SCENARIOS:
+        raise KeyError(f'Unknown scenario "{name}" (expecting one of {list(_SCENARIOS)})')
+    return importlib.import_module(_SCENARIOS[name])
+
+
+def load_scenario(name: str, scene: Optional[Scene] = None) -> Scene:
+    """
+    Clears the scene (see scene.clear) and populates it with the objects of the scenario
+    Args:
+        name:
+            the name of the scenario
+        scene:
+            the scene to load the scenario into (e.g. a new Scene()). The default SceneInterface.scene if None
+    Returns:
+        the scene
+    """
+    module = _scenario_module(name)
+    scene = default_scene if scene is None else scene
+    scene.clear()
+    module.build_scene(scene=scene)
+    return scene
+
+
+def unload_scenario(scene: Optional[Scene] = None):
+    """
+    Clears the scene (the default SceneInterface.scene if None), freeing the objects, frames and gpu buffers of the
+    loaded scenario
+    """
+    (default_scene if scene is None else scene).clear()
+
+
+def render_scenario(name: str, save: bool = False, show: bool = True) -> np.ndarray:
+    """
+    Loads and renders the frames of the scenario into the default scene (see the render_scene_images function of each
+    scenario)
+    Args:
+        name:
+            the name of the scenario
+        save:
+            if True, the frames are saved to output_media/<scenario>
+        show:
+            if True, the frames are displayed
+    Returns:
+        the rendered frames
+    """
+    return _scenario_module(name).render_scene_images(save=save, show=show)
@@ -1,28 +1,49 @@
 import numpy as np
-import os
+import atexit
 import threading
-import cv2
+from typing import Optional
+from .writer import ImageWriter
 
+_default_writer: Optional[ImageWriter] = None
+_default_writer_lock = threading.Lock()
 
-def save_image(save_dir: str, image: np.ndarray, image_name: str, save: bool = False):
+
+def default_writer() -> ImageWriter:
+    """
+    Returns the image writer shared by all save_image calls that do not specify one. The writer is created
+    on first use and closed (waiting for all pending writes) when the interpreter exits
+    """
+    global _default_writer
+    with _default_writer_lock:
+        if _default_writer is None:
+            _default_writer = ImageWriter()
+            atexit.register(_default_writer.close)
+        return _default_writer
+
+
+def save_image(
+        save_dir: str,
+        image: np.ndarray,
+        image_name: str,
+        save: bool = False,
+        writer: Optional[ImageWriter] = None
+):
     """
-    Function saves the image if save is true,
+    Function saves the image if save is true. The image is written in the background by a bounded pool of workers;
+    call writer.flush() to wait for (and raise any errors of) the pending writes
     Args:
         save_dir:
             the path to the repository to save image to
         image_name:
-            the name of the image file (without the extension, function will automatically save as a .png)
+            the name of the image file (without the extension, the writer adds its own, .png by default)
         image:
-            the numpy array of the image (in rgb)
+            the numpy array of the image (in rgb, float values between 0 and 1 or uint8 values)
         save:
             if False, function will not save
+        writer:
+            the ImageWriter to use. If None, the shared default_writer() is used
     """
     if save:
-        os.makedirs(save_dir, exist_ok=True)
-        threading.Thread(
-            target=lambda: cv2.imwrite(
-                f'{save_dir}{os.sep}{image_name}.png',
-                (image * 255).astype('uint8')[:, :, ::-1]
-            )
-        ).start()
-
+        if writer is None:
+            writer = default_writer()
+        writer.save(save_dir=save_dir, image=image, image_name=image_name)
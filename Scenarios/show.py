@@ -1,6 +1,9 @@
-from PIL import Image
 import numpy as np
-import threading
+from .writer import _BoundedPool, _to_uint8
+
+# A single background worker opens the image viewers. At most 4 images may wait to be shown (show_image
+# blocks beyond that)
+_viewer = _BoundedPool(workers=1, max_pending=4)
 
 
 def show_image(image: np.ndarray, show: bool = False):
@@ -8,9 +11,18 @@ def show_image(image: np.ndarray, show: bool = False):
     Function displays the given image if show is true
     Args:
         image:
-            the numpy array of the image (in rgb)
+            the numpy array of the image (in rgb, float values between 0 and 1 or uint8 values)
         show:
             if False, function will not show
     """
     if show:
-        threading.Thread(target=lambda: Image.fromarray((image * 255).astype('uint8')).show()).start()
+        image = _to_uint8(image)
+        _viewer._submit(_show, image)
+
+
+def _show(image: np.ndarray):
+    """
+    Opens the (uint8 rgb) image in the default image viewer. PIL is imported on first use
+    """
+    from PIL import Image
+    Image.fromarray(image).show()
@@ -0,0 +1,151 @@
+import multiprocessing
+import queue
+from typing import Iterable, Optional, Tuple
+import numpy as np
+from .writer import _to_bgr_uint8
+
+# Worker processes are spawned (not forked) so they never inherit the cuda context of the rendering process
+_context = multiprocessing.get_context('spawn')
+
+
+def _encode_frames(
+        path: str,
+        fourcc: str,
+        fps: float,
+        size: Tuple[int, int],
+        frames: multiprocessing.Queue,
+        errors: multiprocessing.Queue
+):
+    """
+    Runs in the encoder process. Feeds the (quantized bgr) frames of the frames queue to a cv2.VideoWriter until
+    None is received. Any exception is sent back through the errors queue
+    """
+    writer = None
+    try:
+        import cv2
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        if not writer.isOpened():
+            raise IOError(f'Failed to open a "{fourcc}" video writer for "{path}"')
+        while True:
+            frame = frames.get()
+            if frame is None:
+                break
+            writer.write(frame)
+    except BaseException as e:
+        errors.put(e)
+        # Keep draining so the rendering process is never blocked on a full queue
+        while frames.get() is not None:
+            pass
+    finally:
+        if writer is not None:
+            writer.release()
+
+
+class VideoSink:
+    """
+    Streams rendered frames straight into a video file. Frames are quantized to uint8 in this process and encoded
+    by a cv2.VideoWriter running in a dedicated process, so no intermediate images are written to disk.
+    Use it with scene.capture_frame(record=False) so the frames are not also kept in scene.frames:
+
+        with VideoSink('output_media/animation.mp4', fps=30) as sink:
+            for _ in range(n):
+                ...  # move objects
+                sink.write(scene.capture_frame(record=False))
+
+    Keywords:
+        path:
+            the path of the video file to write
+        fps:
+            the frame rate of the video
+        fourcc:
+            the four character code of the codec (must match the container of path)
+        max_pending:
+            the maximum number of frames waiting to be encoded. write blocks while the buffer is full
+    """
+    def __init__(self, path: str, fps: float = 30, fourcc: str = 'mp4v', max_pending: int = 8):
+        if len(fourcc) != 4:
+            raise ValueError(f'fourcc must be a 4 character code (received "{fourcc}")')
+        if fps <= 0:
+            raise ValueError(f'fps must be positive')
+        if max_pending < 1:
+            raise ValueError(f'max_pending must be at least 1')
+        self._path = path
+        self._fps = fps
+        self._fourcc = fourcc
+        self._frames: multiprocessing.Queue = _context.Queue(maxsize=max_pending)
+        self._errors: multiprocessing.Queue = _context.Queue()
+        self._process: Optional[multiprocessing.Process] = None
+        self._shape: Optional[Tuple[int, ...]] = None
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _start(self, shape: Tuple[int, ...]):
+        """
+        Starts the encoder process (the frame size of the video is taken from the first frame)
+        """
+        self._shape = shape
+        self._process = _context.Process(
+            target=_encode_frames,
+            args=(self._path, self._fourcc, self._fps, (shape[1], shape[0]), self._frames, self._errors),
+            daemon=True
+        )
+        self._process.start()
+
+    def _raise_errors(self):
+        """
+        Re-raises the exception raised in the encoder process (if any)
+        """
+        try:
+            error = self._errors.get_nowait()
+        except queue.Empty:
+            return
+        raise error
+
+    def write(self, frame: np.ndarray):
+        """
+        Queues a frame (rgb, float values between 0 and 1 or uint8 values) to be encoded. Blocks while max_pending
+        frames are waiting. All frames must have the same shape
+        """
+        if self._closed:
+            raise RuntimeError(f'Cannot write to a closed {self.__class__.__name__}')
+        if self._process is None:
+            self._start(frame.shape)
+        elif frame.shape != self._shape:
+            raise ValueError(f'All frames must have the same shape (received {frame.shape}, expecting {self._shape})')
+        self._raise_errors()
+        encoded = _to_bgr_uint8(frame)
+        while True:
+            try:
+                self._frames.put(encoded, timeout=0.5)
+                return
+            except queue.Full:
+                if not self._process.is_alive():
+                    self._raise_errors()
+                    raise RuntimeError(f'The video encoder process stopped unexpectedly')
+
+    def write_frames(self, frames: Iterable[np.ndarray]):
+        """
+        Writes every frame of an iterable (e.g. a generator of scene.capture_frame(record=False) calls)
+        """
+        for frame in frames:
+            self.write(frame)
+
+    def close(self):
+        """
+        Waits for all queued frames to be encoded and finalises the video file. Raises any exception raised while
+        encoding. Calling close more than once is safe
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._process is not None:
+            self._frames.put(None)
+            self._process.join()
+            self._raise_errors()
+            if self._process.exitcode:
+                raise RuntimeError(f'The video encoder process exited with code {self._process.exitcode}')
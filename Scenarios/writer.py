@@ -0,0 +1,210 @@
+import os
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+import numpy as np
+
+# Maps the supported image formats to the (extension, opencv parameter flag name, lowest level, highest level) of
+# the compression/quality setting for that format. Flags are looked up by name so cv2 is only imported when writing
+_FORMATS: dict = {
+    'png': ('png', 'IMWRITE_PNG_COMPRESSION', 0, 9),
+    'jpg': ('jpg', 'IMWRITE_JPEG_QUALITY', 0, 100),
+    'webp': ('webp', 'IMWRITE_WEBP_QUALITY', 1, 100),
+}
+
+
+def _to_uint8(image: np.ndarray, bgr: bool = False) -> np.ndarray:
+    """
+    Quantizes an rgb image to a new uint8 array. Float images (values between 0 and 1) are multiplied by 255,
+    uint8 images (e.g. captured with scene.set_output_format('uint8')) are only copied.
+    A new array is always returned, so the caller may reuse the given image straight away
+    Args:
+        image:
+            the numpy array of the image (in rgb, float values between 0 and 1 or uint8 values)
+        bgr:
+            if True, the channels are reversed (as expected by opencv)
+    """
+    if bgr:
+        image = image[:, :, ::-1]
+    if image.dtype == 'uint8':
+        return image.copy()
+    output = np.empty(shape=image.shape, dtype='uint8')
+    np.multiply(image, 255, out=output, casting='unsafe')
+    return output
+
+
+def _to_bgr_uint8(image: np.ndarray) -> np.ndarray:
+    """
+    Quantizes an rgb image to a new uint8 bgr array (as expected by opencv)
+    """
+    return _to_uint8(image, bgr=True)
+
+
+def _write_image(path: str, image: np.ndarray, params: Tuple[Any, ...]) -> str:
+    """
+    Writes the (already quantized) bgr image to path. Defined at module level so it can be sent to worker processes.
+    params is either empty or a (cv2 flag name, value) pair
+    """
+    import cv2
+    if params:
+        flag, value = params
+        params = (getattr(cv2, flag), value)
+    if not cv2.imwrite(path, image, list(params)):
+        raise IOError(f'Failed to write image to "{path}"')
+    return path
+
+
+class _BoundedPool:
+    """
+    A fixed size pool of workers (threads or processes) with a bounded number of pending jobs.
+    Submitting a job when the pool is full blocks until a slot is freed (back-pressure). Any exception raised by
+    a job is kept and re-raised by the next call to submit, flush or close
+    Keywords:
+        workers:
+            the number of worker threads/processes
+        max_pending:
+            the maximum number of submitted jobs that have not yet finished
+        use_processes:
+            if True, a process pool is used (jobs and their arguments must be picklable), else a thread pool
+    """
+    def __init__(self, workers: int = 2, max_pending: int = 8, use_processes: bool = False):
+        if workers < 1:
+            raise ValueError(f'workers must be at least 1')
+        if max_pending < 1:
+            raise ValueError(f'max_pending must be at least 1')
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self._executor: Executor = executor_class(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending: set = set()
+        self._errors: List[BaseException] = []
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _submit(self, target: Callable, *args: Any) -> Future:
+        """
+        Submits a job to the pool, blocking while max_pending jobs are still running
+        """
+        if self._closed:
+            raise RuntimeError(f'Cannot submit to a closed {self.__class__.__name__}')
+        self._raise_errors()
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(target, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future):
+        """
+        Frees the slot of the finished job and keeps its exception (if any)
+        """
+        with self._lock:
+            self._pending.discard(future)
+            if not future.cancelled() and future.exception() is not None:
+                self._errors.append(future.exception())
+        self._slots.release()
+
+    def _raise_errors(self):
+        """
+        Re-raises the first exception raised by a job since the last call (the others are discarded)
+        """
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def flush(self):
+        """
+        Waits for all submitted jobs to finish. Raises the first exception raised by any of the jobs
+        """
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            try:
+                future.result()
+            except BaseException:
+                pass  # Collected by _on_done
+        self._raise_errors()
+
+    def close(self):
+        """
+        Waits for all submitted jobs to finish and shuts the workers down. Raises the first exception raised by any
+        of the jobs. Calling close more than once is safe
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        self._raise_errors()
+
+
+class ImageWriter(_BoundedPool):
+    """
+    Writes images to disk using a fixed pool of workers and a bounded queue.
+    Images are quantized (and copied) to uint8 when submitted, so the given arrays may be reused straight away.
+    Keywords:
+        workers:
+            the number of worker threads/processes
+        max_pending:
+            the maximum number of images waiting to be written. Calls to save block while the queue is full
+        image_format:
+            one of "png", "jpg" or "webp"
+        compression:
+            the compression level (png: 0 to 9) or quality (jpg: 0 to 100, webp: 1 to 100). Uses the opencv
+            default if None
+        use_processes:
+            if True, images are encoded in worker processes (so compression does not hold the GIL of this process)
+    """
+    def __init__(
+            self,
+            workers: int = 2,
+            max_pending: int = 8,
+            image_format: str = 'png',
+            compression: Optional[int] = None,
+            use_processes: bool = False,
+    ):
+        if image_format not in _FORMATS:
+            raise ValueError(f'image_format must be one of {list(_FORMATS)} (received "{image_format}")')
+        extension, flag, lowest, highest = _FORMATS[image_format]
+        if compression is not None and not lowest <= compression <= highest:
+            raise ValueError(
+                f'compression for {image_format} must be between {lowest} (incl.) and {highest} (incl.)'
+            )
+        super().__init__(workers=workers, max_pending=max_pending, use_processes=use_processes)
+        self._extension: str = extension
+        self._params: Tuple[Any, ...] = () if compression is None else (flag, int(compression))
+
+    @property
+    def extension(self) -> str:
+        return self._extension
+
+    def save(self, save_dir: str, image: np.ndarray, image_name: str) -> Future:
+        """
+        Queues the image to be written as <save_dir>/<image_name>.<extension>
+        Args:
+            save_dir:
+                the path to the directory to save image to (created if it does not exist)
+            image:
+                the numpy array of the image (in rgb, float values between 0 and 1 or uint8 values)
+            image_name:
+                the name of the image file (without the extension)
+        Returns:
+            the future of the write job, resolving to the path written to
+        """
+        os.makedirs(save_dir, exist_ok=True)
+        return self._submit(
+            _write_image,
+            f'{save_dir}{os.sep}{image_name}.{self._extension}',
+            _to_bgr_uint8(image),
+            self._params
+        )
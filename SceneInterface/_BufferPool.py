@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Union
+import numpy as np
+from numba import cuda
+
+# The default memory cap of a pool (bytes)
+DEFAULT_MAX_BYTES = 2 ** 30
+
+
+class BufferPool:
+    """
+    The frame sized buffers of a scene (gpu arrays and page-locked host arrays), grouped by resolution.
+    Switching back to a resolution rendered before reuses its buffers instead of allocating new ones. Whenever the
+    pool holds more than max_bytes, the groups of the least recently used resolutions (never the one being rendered)
+    are dropped, freeing their buffers
+    """
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self._max_bytes: int = max_bytes
+        self._groups: 'OrderedDict[Tuple[int, int], Dict[tuple, object]]' = OrderedDict()
+        self._nbytes: int = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The total size of the pooled buffers
+        """
+        return self._nbytes
+
+    @property
+    def resolutions(self) -> List[Tuple[int, int]]:
+        """
+        The resolutions with pooled buffers, least recently used first
+        """
+        return list(self._groups)
+
+    def set_max_bytes(self, max_bytes: int):
+        if max_bytes < 0:
+            raise ValueError(f'max_bytes must be positive')
+        self._max_bytes = max_bytes
+        self._evict()
+
+    def get(
+            self,
+            resolution: Tuple[int, int],
+            name: str,
+            shape: Tuple[int, ...],
+            dtype: str,
+            host: bool = False
+    ) -> Union[np.ndarray, 'cuda.devicearray.DeviceNDArray']:
+        """
+        Returns the buffer of the given name, shape and dtype for the resolution, allocating it if not pooled yet.
+        The buffer is uninitialised when allocated
+        Args:
+            resolution:
+                the (height, width) the buffer belongs to
+            name:
+                the name of the buffer (e.g. "output_frame")
+            shape:
+                the shape of the buffer
+            dtype:
+                the dtype of the buffer
+            host:
+                if True, a page-locked host array is returned (faster to copy to/from the gpu), else a gpu array
+        """
+        group = self._groups.get(resolution)
+        if group is None:
+            group = self._groups[resolution] = {}
+        self._groups.move_to_end(resolution)
+        key = (name, tuple(shape), np.dtype(dtype).str, host)
+        buffer = group.get(key)
+        if buffer is None:
+            if host:
+                buffer = cuda.pinned_array(shape=shape, dtype=dtype)
+            else:
+                buffer = cuda.device_array(shape=shape, dtype=dtype)
+            group[key] = buffer
+            self._nbytes += buffer.nbytes
+            self._evict()
+        return buffer
+
+    def clear(self):
+        """
+        Drops every pooled buffer
+        """
+        self._groups.clear()
+        self._nbytes = 0
+
+    def _evict(self):
+        """
+        Drops the least recently used resolutions (but not the most recent one) while over max_bytes
+        """
+        while self._nbytes > self._max_bytes and len(self._groups) > 1:
+            _, group = self._groups.popitem(last=False)
+            self._nbytes -= sum(buffer.nbytes for buffer in group.values())
@@ -0,0 +1,165 @@
+import functools
+import math
+import numpy as np
+from typing import NamedTuple, Optional, Tuple
+
+# The smallest fraction of the camera resolution (per axis) a governed frame is rendered at
+MIN_SCALE = 0.25
+# The resolution scale moves in steps of this size, so timing noise does not rebuild the rays of every frame and the
+# buffer pool only holds a few resolutions
+_SCALE_STEP = 1 / 16
+# The frame times within [1 - _DEADBAND, 1] times the budget hold the settings
+_DEADBAND = 0.2
+# The fraction of the (logarithmic) error of the frame time corrected per frame
+_GAIN = 0.6
+# The number of effects tiers (see _tier_quality)
+_TIERS = 4
+
+
+class PreviewQuality(NamedTuple):
+    """
+    The settings a governed frame is rendered with (see FrameBudget): the fraction of the camera resolution rendered
+    along each axis, the max reflections, the contribution cutoff and the (initial, total) soft shadow samples
+    """
+    scale: float
+    reflect: int
+    contribution_cutoff: float
+    soft_shadow_samples: Tuple[int, int]
+
+
+def _tier_quality(
+        tier: int,
+        scale: float,
+        reflect: int,
+        contribution_cutoff: float,
+        soft_shadow_samples: Tuple[int, int]
+) -> PreviewQuality:
+    """
+    Returns the quality of an effects tier given the scene settings (tier 0). Each tier gives up some more of the
+    work that is least visible while the camera moves: tier 1 stops refining the penumbrae and the dimmest paths,
+    tier 2 also casts a single shadow ray per area light and traces at most 2 reflections, tier 3 only traces the
+    primary rays
+    """
+    initial, total = soft_shadow_samples
+    reflect = int(reflect)
+    if tier == 0:
+        return PreviewQuality(scale, reflect, contribution_cutoff, (initial, total))
+    if tier == 1:
+        return PreviewQuality(scale, reflect, max(contribution_cutoff, 2 / 255), (initial, initial))
+    if tier == 2:
+        return PreviewQuality(scale, min(reflect, 2), max(contribution_cutoff, 8 / 255), (1, 1))
+    return PreviewQuality(scale, min(reflect, 1), contribution_cutoff, (1, 1))
+
+
+class FrameBudget:
+    """
+    The governor of scene.capture_frame(budget_ms=...): a feedback controller picking the quality of each frame
+    from the measured times of the previous ones, so frames keep within the budget while the scene changes.
+    The resolution scale is the main control: since the time of a frame grows with its number of pixels, it is
+    corrected by a damped step of the (logarithmic) error, and held while the frame time is within the deadband
+    below the budget. Once the scale is at MIN_SCALE and frames are still over budget, the effects tiers (see
+    _tier_quality) are given up one by one, and they are restored first when frames at full resolution are well
+    under budget.
+    While the scene does not change, the frames are refined one step per frame (resolution first, then the effects)
+    until the full quality is reached, regardless of the budget. Moving again resumes from the settings the
+    controller had converged to
+    """
+    def __init__(self, budget_ms: float):
+        self._budget_ms: float = budget_ms
+        self._scale: float = 1.
+        self._tier: int = 0
+        self._refined: Optional[Tuple[float, int]] = None  # The (scale, tier) of the still frames, None while moving
+
+    @property
+    def budget_ms(self) -> float:
+        return self._budget_ms
+
+    @budget_ms.setter
+    def budget_ms(self, budget_ms: float):
+        self._budget_ms = budget_ms
+
+    def plan(
+            self,
+            still: bool,
+            reflect: int,
+            contribution_cutoff: float,
+            soft_shadow_samples: Tuple[int, int]
+    ) -> Optional[PreviewQuality]:
+        """
+        Returns the quality of the next frame given the scene settings (None if the frame is to be rendered at the
+        full quality). still is True if nothing changed since the last frame
+        """
+        if not still:
+            self._refined = None
+            scale, tier = self._scale, self._tier
+        elif self._refined is None:
+            # The last frame was rendered with the controller settings: refining starts from them
+            scale, tier = self._refined = self._refine(self._scale, self._tier)
+        else:
+            scale, tier = self._refined = self._refine(*self._refined)
+        if scale >= 1 and tier == 0:
+            return None
+        return _tier_quality(tier, scale, reflect, contribution_cutoff, soft_shadow_samples)
+
+    def observe(self, frame_ms: float) -> None:
+        """
+        Corrects the settings given the measured time of the frame planned last. The refined frames of a still scene
+        are ignored (they are not meant to keep within the budget)
+        """
+        if self._refined is not None or frame_ms <= 0:
+            return
+        if 1 - _DEADBAND <= frame_ms / self._budget_ms <= 1:
+            return
+        ratio = self._budget_ms / frame_ms
+        scale = self._scale * ratio ** (_GAIN / 2)  # The frame time grows with the square of the scale
+        if ratio < 1:
+            scale = min(math.floor(scale / _SCALE_STEP) * _SCALE_STEP, self._scale - _SCALE_STEP)
+            if scale < MIN_SCALE:
+                scale = MIN_SCALE
+                if self._scale == MIN_SCALE:
+                    self._tier = min(self._tier + 1, _TIERS - 1)
+        else:
+            scale = max(math.ceil(scale / _SCALE_STEP) * _SCALE_STEP, self._scale + _SCALE_STEP)
+            if scale > 1:
+                scale = 1.
+                if self._scale == 1:
+                    self._tier = max(self._tier - 1, 0)
+        self._scale = scale
+
+    @staticmethod
+    def _refine(scale: float, tier: int) -> Tuple[float, int]:
+        """
+        Returns the next step towards the full quality: the resolution scale doubles up to 1, then the effects
+        tiers are restored one by one
+        """
+        if scale < 1:
+            return min(scale * 2, 1.), tier
+        return scale, max(tier - 1, 0)
+
+
+def scaled_resolution(resolution: Tuple[int, int], scale: float) -> Tuple[int, int]:
+    """
+    Returns the resolution a frame is rendered at given the camera resolution and the resolution scale (the aspect
+    ratio is kept, at least one pixel per axis)
+    """
+    if scale >= 1:
+        return tuple(resolution)
+    return max(1, round(resolution[0] * scale)), max(1, round(resolution[1] * scale))
+
+
+@functools.lru_cache(maxsize=8)
+def _upscale_indices(source: Tuple[int, int], target: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    rows = (np.arange(target[0]) * source[0]) // target[0]
+    columns = (np.arange(target[1]) * source[1]) // target[1]
+    return rows, columns
+
+
+def upscale(frame: np.ndarray, resolution: Tuple[int, int]) -> np.ndarray:
+    """
+    Returns the frame upscaled to the resolution (nearest pixel, any dtype). The rows and columns are gathered one
+    axis at a time, which is several times faster than a single two-dimensional gather
+    """
+    if frame.shape[:2] == tuple(resolution):
+        return frame
+    rows, columns = _upscale_indices(frame.shape[:2], tuple(resolution))
+    return frame.take(rows, axis=0).take(columns, axis=1)
@@ -0,0 +1,92 @@
+import numpy as np
+from typing import Dict, List
+
+# The minimum number of rows of the encoded materials (see _SceneInterface._encoded_materials)
+_MIN_CAPACITY = 64
+
+
+class MaterialTable:
+    """
+    The deduplicated materials of the spheres: every distinct material gets one row of shape (4, 3) holding its
+    ambient, diffuse and specular vectors and [shine, reflect, 0], shared by every sphere made of it (see
+    SphereTable). The rows are reference counted, and the row of a material no sphere uses any more is reused by the
+    next new material, so the ids of the other materials never change
+    """
+    def __init__(self):
+        self._ids: Dict[bytes, int] = {}
+        self._counts: List[int] = []
+        self._free: List[int] = []
+        self._encoded: np.ndarray = np.zeros(shape=(_MIN_CAPACITY, 4, 3), dtype='float32')
+
+    def __len__(self) -> int:
+        """
+        The number of distinct materials in use
+        """
+        return len(self._ids)
+
+    @property
+    def encoded(self) -> np.ndarray:
+        """
+        The encoded materials, shape (capacity, 4, 3) (the rows of unused ids are zeros or stale). The capacity only
+        changes when the table grows, so the gpu buffer is rarely reallocated
+        """
+        return self._encoded
+
+    def acquire(self, material: np.ndarray) -> int:
+        """
+        Returns the id of a material (shape (4, 3)), adding it to the table if no sphere uses it yet
+        """
+        material = np.ascontiguousarray(material, dtype='float32')
+        key = material.tobytes()
+        material_id = self._ids.get(key)
+        if material_id is None:
+            if self._free:
+                material_id = self._free.pop()
+            else:
+                material_id = len(self._counts)
+                self._counts.append(0)
+                self._reserve(material_id + 1)
+            self._ids[key] = material_id
+            self._encoded[material_id] = material
+        self._counts[material_id] += 1
+        return material_id
+
+    def release(self, material_id: int) -> None:
+        """
+        Releases a reference to a material (its row is freed once no sphere uses it)
+        """
+        self._counts[material_id] -= 1
+        if self._counts[material_id] == 0:
+            del self._ids[self._encoded[material_id].tobytes()]
+            self._free.append(material_id)
+
+    def load(self, materials: np.ndarray) -> np.ndarray:
+        """
+        Replaces every row with the distinct materials of the given ones (shape (n, 4, 3), one per sphere) and
+        returns the id of each, shape (n,)
+        """
+        materials = np.ascontiguousarray(materials, dtype='float32')
+        if not len(materials):
+            self.__init__()
+            return np.zeros(shape=(0,), dtype='int32')
+        unique, material_ids = np.unique(materials.reshape(len(materials), -1), axis=0, return_inverse=True)
+        unique = unique.reshape(-1, 4, 3)
+        self._encoded = np.zeros(shape=(max(len(unique), _MIN_CAPACITY), 4, 3), dtype='float32')
+        self._encoded[:len(unique)] = unique
+        self._ids = {material.tobytes(): material_id for material_id, material in enumerate(unique)}
+        self._counts = np.bincount(material_ids.reshape(-1), minlength=len(unique)).tolist()
+        self._free = []
+        return material_ids.reshape(-1).astype('int32')
+
+    def _reserve(self, count: int) -> None:
+        """
+        Grows the buffer (doubling its capacity) so it holds at least count rows
+        """
+        capacity = len(self._encoded)
+        if count <= capacity:
+            return
+        while capacity < count:
+            capacity *= 2
+        encoded = np.zeros(shape=(capacity, 4, 3), dtype='float32')
+        encoded[:len(self._encoded)] = self._encoded
+        self._encoded = encoded
@@ -0,0 +1,138 @@
+import struct
+import zipfile
+import numpy as np
+from typing import Dict
+
+# Bumped whenever the layout of the scene file changes
+SCENE_FILE_VERSION = 1
+
+# The (dtype, shape) of every column of a scene file. n is the number of spheres and l the number of lights. The
+# camera and light columns are only present if the scene had a camera/lights when saved
+_COLUMNS: Dict[str, tuple] = {
+    'version': ('int32', ()),
+    'eps': ('float32', ()),
+    'reflect': ('float32', ()),
+    'camera_coordinates': ('float32', (3,)),
+    'camera_resolution': ('int32', (2,)),
+    'camera_background_colour': ('float32', (3,)),
+    'camera_screen_vectors': ('float32', (2, 3)),
+    'light_names': ('U', ('l',)),
+    'light_coordinates': ('float32', ('l', 3)),
+    'light_ambient': ('float32', ('l', 3)),
+    'light_diffuse': ('float32', ('l', 3)),
+    'light_specular': ('float32', ('l', 3)),
+    'light_intensity': ('float32', ('l',)),
+    'light_radius': ('float32', ('l',)),
+    'sphere_names': ('U', ('n',)),
+    'sphere_coordinates': ('float32', ('n', 3)),
+    'sphere_ambient': ('float32', ('n', 3)),
+    'sphere_diffuse': ('float32', ('n', 3)),
+    'sphere_specular': ('float32', ('n', 3)),
+    'sphere_shine': ('float32', ('n',)),
+    'sphere_reflect': ('float32', ('n',)),
+    'sphere_radius': ('float32', ('n',)),
+}
+_REQUIRED = ('version', 'eps', 'reflect', 'sphere_names')
+_CAMERA_COLUMNS = tuple(name for name in _COLUMNS if name.startswith('camera_'))
+_LIGHT_COLUMNS = tuple(name for name in _COLUMNS if name.startswith('light_'))
+
+# Size of the fixed part of a zip local file header (before the file name and extra field)
+_LOCAL_HEADER_SIZE = 30
+_ARRAY_HEADER_READERS = {
+    (1, 0): np.lib.format.read_array_header_1_0,
+    (2, 0): np.lib.format.read_array_header_2_0,
+}
+
+
+def write_scene_file(path: str, columns: Dict[str, np.ndarray]) -> None:
+    """
+    Writes the columns to path as an (uncompressed, so it can be memory-mapped) npz file
+    """
+    np.savez(path, version=np.array(SCENE_FILE_VERSION, dtype='int32'), **columns)
+
+
+def read_scene_file(path: str, mmap: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Reads the columns of a scene file. Raises a ValueError if the file is not a valid scene file (only the
+    layout is checked, not the values)
+    Args:
+        path:
+            the path to the npz file
+        mmap:
+            if True, the columns are memory-mapped (read-only) rather than read into memory
+    """
+    if mmap:
+        columns = _memmap_npz(path)
+    else:
+        with np.load(path, allow_pickle=False) as npz:
+            columns = {name: npz[name] for name in npz.files}
+    _check_columns(columns)
+    return columns
+
+
+def _check_columns(columns: Dict[str, np.ndarray]) -> None:
+    """
+    Raises a ValueError if a column is missing, unknown or of the wrong dtype/shape
+    """
+    missing = [name for name in _REQUIRED if name not in columns]
+    if missing:
+        raise ValueError(f'Invalid scene file: missing {missing}')
+    if int(columns['version']) != SCENE_FILE_VERSION:
+        raise ValueError(
+            f'Unsupported scene file version {int(columns["version"])} (expecting {SCENE_FILE_VERSION})'
+        )
+    unknown = [name for name in columns if name not in _COLUMNS]
+    if unknown:
+        raise ValueError(f'Invalid scene file: unknown columns {unknown}')
+    for group in (_CAMERA_COLUMNS, _LIGHT_COLUMNS):
+        present = [name for name in group if name in columns]
+        if present and len(present) != len(group):
+            raise ValueError(f'Invalid scene file: incomplete columns {present}')
+    counts = {
+        'n': len(columns['sphere_names']),
+        'l': len(columns['light_names']) if 'light_names' in columns else 0,
+    }
+    for name, array in columns.items():
+        dtype, shape = _COLUMNS[name]
+        shape = tuple(counts.get(size, size) for size in shape)
+        if array.dtype.kind != np.dtype(dtype).kind or (dtype != 'U' and array.dtype != dtype):
+            raise ValueError(f'Invalid scene file: {name} must be of dtype {dtype} (received {array.dtype})')
+        if array.shape != shape:
+            raise ValueError(f'Invalid scene file: {name} must be of shape {shape} (received {array.shape})')
+
+
+def _memmap_npz(path: str) -> Dict[str, np.ndarray]:
+    """
+    Memory-maps the arrays of an uncompressed npz file (np.load ignores mmap_mode for npz files). Empty and
+    0-dimensional arrays cannot be memory-mapped and are read instead
+    """
+    columns = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+        for info in archive.infolist():
+            if not info.filename.endswith('.npy'):
+                raise ValueError(f'Invalid scene file: unexpected member "{info.filename}"')
+            name = info.filename[:-len('.npy')]
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f'Cannot memory-map the compressed array "{name}"')
+            file.seek(info.header_offset)
+            header = file.read(_LOCAL_HEADER_SIZE)
+            name_length, extra_length = struct.unpack('<HH', header[26:30])
+            file.seek(info.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length)
+            version = np.lib.format.read_magic(file)
+            if version not in _ARRAY_HEADER_READERS:
+                raise ValueError(f'Unsupported npy format version {version} of "{name}"')
+            shape, fortran_order, dtype = _ARRAY_HEADER_READERS[version](file)
+            if dtype.hasobject:
+                raise ValueError(f'Cannot memory-map the object array "{name}"')
+            if not shape or 0 in shape:
+                columns[name] = np.lib.format.read_array(archive.open(info), allow_pickle=False)
+                continue
+            columns[name] = np.memmap(
+                path,
+                dtype=dtype,
+                mode='r',
+                shape=shape,
+                order='F' if fortran_order else 'C',
+                offset=file.tell()
+            )
+    return columns
@@ -1,42 +1,152 @@
+import functools
+import threading
+import time
+import contextlib
 import numpy as np
-from typing import Tuple, List, TYPE_CHECKING, ItemsView, KeysView, ValuesView, Any, Union
+from typing import Tuple, List, TYPE_CHECKING, ItemsView, KeysView, ValuesView, Any, Union, Optional, Callable
 from copy import deepcopy
 from numba import cuda
 from .Excs import SceneError
+from ._SceneStats import SceneStats
+from ._SphereTable import SphereTable
+from ._BufferPool import BufferPool
+from ._ShadowCasters import build_shadow_casters
+from ._ScreenTiles import ScreenTiles
+from ._SceneFile import read_scene_file, write_scene_file
+from ._FrameBudget import FrameBudget, PreviewQuality, scaled_resolution, upscale
 from ExcThreading import ExcThreading
-from engine import render_image
+from engine import render_image, quantize_frame_uint8, quantize_blocks, compile_kernels,\
+    invalidate_occluders, MAX_LIGHTS, MAX_SPHERES, MAX_SHADOW_SAMPLES, render_image_cpu, warmup_cpu, clear_raster, \
+    rasterize_depth, rasterize_first_hits, raster_blocks, raster_tests, rasterize_spheres_cpu, \
+    PARALLEL_LOCK
 
 
 if TYPE_CHECKING:
     from Objects import BaseObject, MetaObjects, SolidObjects
     from Objects._AutoNumpyUpdate import _AutoNumpyUpdate
+    import Scenarios
 
 _FORBIDDEN: dict = {
+    '_lock': None,
+    '_eps': 0.02,
+    '_max_reflections': 3.,
+    '_output_format': 'float32',
+    '_backend': 'cuda',
+    '_host_scene': {},
+    '_light_cutoff': 0.001,
+    '_contribution_cutoff': 0.5 / 255,
+    '_soft_shadow_samples': (4, 16),
+    '_primary_visibility': 'trace',
     '_object_directory': {},
+    '_sphere_table': SphereTable(),
     '_camera_updated': True,
     '_light_updated': True,
     '_spheres_updated': True,
-    '_eps_reflect_updated': True,
+    '_other_data_updated': True,
+    '_output_format_updated': True,
     '_frames': None,
+    '_last_frame': None,
     '_gpu_initialised': False,
     '_device_background_colour': None,
     '_device_camera': None,
     '_device_rays': None,
     '_device_spheres': None,
+    '_device_sphere_materials': None,
+    '_device_materials': None,
+    '_device_shadow_casters': None,
+    '_screen_tiles': None,
+    '_device_tile_masks': None,
+    '_device_occluders': None,
+    '_device_first_hits': None,
     '_device_light': None,
     '_device_other_data': None,
-    '_device_output_frame': None
+    '_device_output_frame': None,
+    '_device_quantized_frame': None,
+    '_host_frame': None,
+    '_device_counters': None,
+    '_diagnostics_enabled': False,
+    '_diagnostics': None,
+    '_device_diagnostics': None,
+    '_diagnostics_placeholder': None,
+    '_buffer_pool': BufferPool(),
+    '_frame_publisher': None,
+    '_batch': None,
+    '_batch_registered': None,
+    '_frame_budget': None,
+    '_preview': None,
+    '_render_window': None,
+    '_stats': SceneStats(),
 }
 
+# Maps the supported output formats to the kernel quantizing the rendered frame on the gpu (None if the
+# rendered float32 frame is downloaded as is). float16 frames are converted on the host once downloaded, numba
+# cannot cast to float16 in cuda kernels (before 0.57)
+_OUTPUT_FORMATS: dict = {
+    'float32': None,
+    'float16': None,
+    'uint8': quantize_frame_uint8,
+}
+# The devices frames can be rendered on (see set_backend)
+_BACKENDS: Tuple[str, ...] = ('cuda', 'cpu')
+# The ways the first hits of the primary rays can be found (see set_primary_visibility)
+_PRIMARY_VISIBILITY: Tuple[str, ...] = ('trace', 'raster')
+
+
+def _snapshot(value: Any) -> Any:
+    """
+    Returns a copy of the values of the arrays (also in tuples) of an object attribute, None for other values (see
+    scene.batch)
+    """
+    if isinstance(value, np.ndarray):
+        return np.array(value)
+    if isinstance(value, tuple):
+        return tuple(_snapshot(i) for i in value)
+    return None
+
+
+def _restore(value: Any, snapshot: Any) -> None:
+    """
+    Copies the values of a snapshot (see _snapshot) back into the arrays of an attribute, without notifying the scene
+    """
+    if isinstance(value, np.ndarray):
+        np.copyto(value, snapshot)
+    elif isinstance(value, tuple):
+        for i, i_snapshot in zip(value, snapshot):
+            _restore(i, i_snapshot)
+
+
+def _dirty_slots(dirty_ranges: Optional[List[Tuple[int, int]]], count: int) -> np.ndarray:
+    """
+    Returns a flag per sphere slot (shape (count,), uint8), set for the slots of the dirty ranges (see
+    SphereTable.take_dirty_ranges, every slot if None)
+    """
+    if dirty_ranges is None:
+        return np.ones(shape=(count,), dtype='uint8')
+    dirty_slots = np.zeros(shape=(count,), dtype='uint8')
+    for start, stop in dirty_ranges:
+        dirty_slots[start:stop] = 1
+    return dirty_slots
+
+
+def _synchronised(method):
+    """
+    Decorator holding the lock of the scene while the method runs, so that the scene can be used from several threads
+    """
+    @functools.wraps(method)
+    def synchronised_method(self, *args, **kwargs):
+        with object.__getattribute__(self, '_lock'):
+            return method(self, *args, **kwargs)
+    return synchronised_method
+
 
 class _SceneInterface:
     """
     Class handles all objects involved. Ensures there is only 1 viewer, 1 light source, etc.
+    Every instance is an independent scene, with its own objects, settings and gpu buffers. Objects are registered
+    to the default SceneInterface.scene unless created with scene=<another instance>. All public methods are
+    thread-safe (each scene holds a re-entrant lock), so different scenes can capture frames concurrently
     """
     __slots__ = tuple(_FORBIDDEN)
-    _EPS: float = 0.02
-    _MAX_REFLECTIONS: float = 3.
-    _RESOLUTION: Tuple[int, int] = None
     _SPECIAL_NAMES: set = {
         '_light',
         '_camera'
@@ -45,15 +155,16 @@ class _SceneInterface:
     def __init__(self):
         for name, value in _FORBIDDEN.items():
             super().__setattr__(name, deepcopy(value))
+        super().__setattr__('_lock', threading.RLock())
 
     def __repr__(self):
         """
         Summary of scene
         """
         directory: dict = super().__getattribute__('_object_directory')
-        number_of_spheres: int = len([i for i, j in directory.items() if i not in {'_light', '_camera'}])
+        number_of_spheres: int = len(super().__getattribute__('_sphere_table'))
         camera: bool = '_camera' in directory
-        light: bool = '_light' in directory
+        number_of_lights: int = len(self.light_names)
         camera_updated: bool = super().__getattribute__('_camera_updated')
         light_updated: bool = super().__getattribute__('_light_updated')
         spheres_updated: bool = super().__getattribute__('_spheres_updated')
@@ -62,7 +173,7 @@ class _SceneInterface:
             else "device copy required" if camera \
             else "no camera defined"
         light_state: str = "up to date" if not light_updated \
-            else "device copy required" if light \
+            else "device copy required" if number_of_lights \
             else "no light defined"
         sphere_state: str = "up to date" if not spheres_updated \
             else "device copy required" if number_of_spheres \
@@ -70,46 +181,489 @@ class _SceneInterface:
 
         output = f"""Scene Interface Object:
         \tCamera defined: {camera},
-        \tLight defined: {light},
+        \tNumber of lights: {number_of_lights},
         \tNumber of spheres: {number_of_spheres},
         \tGPU camera: {camera_state},
         \tGPU light: {light_state},
         \tGPU spheres: {sphere_state},
         \tGPU initialised: {gpu_initialised},
-        \tEpsilon value: {self._EPS},
-        \tMax reflections: {self._MAX_REFLECTIONS}
+        \tEpsilon value: {self.eps},
+        \tMax reflections: {self.reflect},
+        \tOutput format: {self.output_format},
+        \tBackend: {self.backend}
         """
         return output
 
+    @_synchronised
     def __getitem__(self, item) -> 'BaseObject':
         """
         Retrieves item from object_directory
         """
         directory = super().__getattribute__('_object_directory')
-        return directory[item]
+        object_item = directory[item]
+        if object_item is None:
+            object_item = self._materialise_sphere(item)
+        return object_item
+
+    def _materialise_sphere(self, name: str) -> 'SolidObjects.Sphere':
+        """
+        Creates the Sphere object of a sphere loaded from a trusted scene file (see load), from its encoded record
+        """
+        from Objects.SolidObjects import Sphere
+        record = super().__getattribute__('_sphere_table').record(name)
+        sphere = Sphere._construct_trusted(
+            scene=self,
+            name=name,
+            coordinates=record[0],
+            ambient=record[1],
+            diffuse=record[2],
+            specular=record[3],
+            shine=float(record[4][0]),
+            reflect=float(record[4][1]),
+            radius=float(record[4][2]),
+        )
+        super().__getattribute__('_object_directory')[name] = sphere
+        return sphere
 
+    def _materialise_spheres(self) -> None:
+        """
+        Creates the Sphere objects of every sphere loaded from a trusted scene file that has not been accessed yet
+        """
+        directory: dict = super().__getattribute__('_object_directory')
+        for name in [name for name, object_item in directory.items() if object_item is None]:
+            self._materialise_sphere(name)
+
+    @_synchronised
     def set_eps(self, eps: float):
         """
         Sets the epsilon value. This is to handle floating point precision errors
         """
         if not 0 < eps <= 0.1:
             raise ValueError(f'eps must be between 0 (excl.) and 0.1 (incl.)')
-        self.__class__._EPS = eps
-        super().__setattr__('_eps_reflect_updated', True)
+        super().__setattr__('_eps', eps)
+        super().__setattr__('_other_data_updated', True)
 
+    @_synchronised
     def set_reflect(self, reflect: int):
         """
         Sets the max reflections value
         """
         if not 0 <= reflect <= 10:
             raise ValueError(f'max reflections must be between 0 (incl.) and 10 (incl.)')
-        self.__class__._MAX_REFLECTIONS = reflect
-        super().__setattr__('_eps_reflect_updated', True)
+        super().__setattr__('_max_reflections', reflect)
+        super().__setattr__('_other_data_updated', True)
+
+    @_synchronised
+    def set_light_cutoff(self, cutoff: float):
+        """
+        Sets the intensity falloff below which a light is culled at a point (no shadow ray is cast and the light does
+        not contribute). The falloff of a light at distance d is min(d ** 2, intensity ** 2) / d ** 2, so lights are
+        culled beyond intensity / sqrt(cutoff). 0 disables culling
+        """
+        if not 0 <= cutoff < 1:
+            raise ValueError(f'The light cutoff must be between 0 (incl.) and 1 (excl.)')
+        super().__setattr__('_light_cutoff', cutoff)
+        super().__setattr__('_light_updated', True)
+
+    @_synchronised
+    def set_contribution_cutoff(self, cutoff: float):
+        """
+        Sets the weight below which a path is not traced any further. The contribution of a ray reflected off spheres
+        of reflect r1, ..., rk is weighted by w = r1 * ... * rk: the point it hits adds at most
+        w * (ambient + diffuse + specular) * l to a channel of the pixel, where ambient, diffuse and specular are the
+        products of the sphere and light colours (at most 1 each for colours in [0, 1]) and l is the number of lights.
+        Once w is at most the cutoff, the remaining reflections are skipped, and each of them (weighted by at most w)
+        could have changed the pixel by up to that bound. With the default of half an 8-bit step (0.5 / 255), a skipped
+        reflection changes a channel by at most half a step only if (ambient + diffuse + specular) * l is at most 1.
+        0 only stops the paths of weight 0 (reflected off a sphere of reflect 0), which never changes a frame
+        """
+        if not 0 <= cutoff < 1:
+            raise ValueError(f'The contribution cutoff must be between 0 (incl.) and 1 (excl.)')
+        super().__setattr__('_contribution_cutoff', cutoff)
+        super().__setattr__('_other_data_updated', True)
+
+    @_synchronised
+    def set_soft_shadow_samples(self, initial: int = 4, total: int = 16):
+        """
+        Sets the number of shadow rays cast towards an area light (a light of positive radius) from a point. The
+        initial samples are stratified over the light first, and the remaining samples (up to total) are only cast
+        if they disagree, i.e. if the point is in the penumbra: fully lit and fully shadowed points only cost the
+        initial samples. The light contributes in proportion to the samples that reach it
+        Args:
+            initial:
+                the number of samples every point casts (at least 1)
+            total:
+                the number of samples of the points in the penumbra. Must be a multiple of initial, at most
+                engine.MAX_SHADOW_SAMPLES
+        """
+        if initial < 1:
+            raise ValueError(f'The initial number of shadow samples must be at least 1')
+        if total % initial or total > MAX_SHADOW_SAMPLES:
+            raise ValueError(
+                f'The total number of shadow samples must be a multiple of the initial number, at most '
+                f'{MAX_SHADOW_SAMPLES}'
+            )
+        super().__setattr__('_soft_shadow_samples', (int(initial), int(total)))
+        super().__setattr__('_other_data_updated', True)
+
+    @_synchronised
+    def enable_stats(self, history: int = None):
+        """
+        Starts recording per-stage timings, transferred bytes and ray counters of every captured frame
+        (see the stats property). Only the last <history> frames are kept (unchanged if None, 100 by default).
+        Note the kernel is synchronised to time it, and the counters are copied back, so frames are slightly
+        slower while enabled
+        """
+        super().__getattribute__('_stats')._enable(history)
+        super().__setattr__('_other_data_updated', True)
+
+    @_synchronised
+    def disable_stats(self):
+        """
+        Stops recording stats (the frames already recorded are kept)
+        """
+        super().__getattribute__('_stats')._disable()
+        super().__setattr__('_other_data_updated', True)
 
+    @_synchronised
+    def set_diagnostics(self, enabled: bool):
+        """
+        Enables/disables the per-pixel diagnostics of subsequent frames (see the diagnostics property)
+        """
+        super().__setattr__('_diagnostics_enabled', bool(enabled))
+        super().__setattr__('_other_data_updated', True)
+        if not enabled:
+            super().__setattr__('_diagnostics', None)
+
+    @_synchronised
+    def set_output_format(self, output_format: str):
+        """
+        Sets the dtype of the captured frames. One of:
+            "float32": rgb values between 0 and 1 (default)
+            "float16": rgb values between 0 and 1 in half precision (2x smaller)
+            "uint8": 8-bit rgb values between 0 and 255 (4x smaller)
+        uint8 frames are quantized on the gpu, so only the smaller buffer is copied back to the host, float16 frames
+        are converted on the host (see _OUTPUT_FORMATS).
+        Frames of different formats cannot be mixed in the frames array
+        """
+        if output_format not in _OUTPUT_FORMATS:
+            raise ValueError(f'output format must be one of {list(_OUTPUT_FORMATS)} (received "{output_format}")')
+        frames: np.ndarray = super().__getattribute__('_frames')
+        if frames is not None and frames.dtype != output_format:
+            raise ValueError(f'Cannot change the output format once frames of dtype {frames.dtype} are captured')
+        if output_format != self.output_format:
+            super().__setattr__('_output_format', output_format)
+            super().__setattr__('_output_format_updated', True)
+
+    @_synchronised
+    def set_backend(self, backend: str):
+        """
+        Sets the device subsequent frames are rendered on. One of:
+            "cuda": the gpu (default)
+            "cpu": the cpu cores (see engine.render_image_cpu), no cuda device is needed
+        Both backends render the same frames, up to floating point rounding
+        """
+        if backend not in _BACKENDS:
+            raise ValueError(f'backend must be one of {list(_BACKENDS)} (received "{backend}")')
+        if backend == self.backend:
+            return
+        super().__setattr__('_backend', backend)
+        # The buffers of the new backend may be out of date: everything is encoded again on the next frame
+        super().__setattr__('_gpu_initialised', False)
+        super().__setattr__('_host_scene', {})
+        self._set_updated(True)
+
+    @_synchronised
+    def set_primary_visibility(self, primary_visibility: str):
+        """
+        Sets how the first hits of the primary rays of subsequent frames are found. One of:
+            "trace": each primary ray is tested against the spheres that may project onto its screen tile (default)
+            "raster": the primary rays all start at the camera, so every sphere is splatted onto the pixels of the
+                bounding box of its projection on the screen (see Camera._project_spheres), keeping the closest
+                sphere of each pixel in a depth and sphere id buffer (see engine.rasterize_depth). The kernel then
+                only tests the sphere hit, for the point hit, and the background pixels are not traced at all.
+                The buffer is only rasterized again when the camera or the spheres change
+        Both render the same frames. Rasterizing pays off on high resolution frames, where the primary rays are
+        most of the rays traced (few reflective surfaces), and on frames where only the lights change
+        """
+        if primary_visibility not in _PRIMARY_VISIBILITY:
+            raise ValueError(
+                f'primary visibility must be one of {list(_PRIMARY_VISIBILITY)} (received "{primary_visibility}")'
+            )
+        if primary_visibility == self.primary_visibility:
+            return
+        super().__setattr__('_primary_visibility', primary_visibility)
+        super().__setattr__('_device_first_hits', None)
+        super().__getattribute__('_host_scene').pop('first_hits', None)
+        super().__setattr__('_other_data_updated', True)
+
+    @_synchronised
+    def clear(self):
+        """
+        Resets scene to its initial state: de-registers every object, deletes the frames, frees the gpu buffers
+        (including the buffer pool), disables stats/diagnostics and restores the default epsilon, max reflections,
+        output format, light cutoff, contribution cutoff, soft shadow samples and primary visibility. The backend is
+        kept
+        """
+        for name, value in _FORBIDDEN.items():
+            if name not in ('_lock', '_backend'):
+                super().__setattr__(name, deepcopy(value))
+
+    @_synchronised
+    def set_buffer_pool_limit(self, max_bytes: int):
+        """
+        Sets the memory cap (bytes, 1 GiB by default) of the pool of frame sized buffers (see the buffer_pool
+        property). Buffers of the least recently rendered resolutions are freed whenever the pool exceeds it
+        """
+        super().__getattribute__('_buffer_pool').set_max_bytes(max_bytes)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Groups object updates into one transaction: inside the with block, attribute assignments are not validated
+        and element writes (e.g. sphere.coordinates[0] += 1) do not notify the scene. The scene only records the
+        objects touched; when the outermost block exits, it validates the assigned values once and re-encodes each
+        touched object once. Only the slots of the touched spheres are copied to the gpu with the next frame.
+        If the block raises, or an assigned value is invalid, every touched object is restored to its state before
+        the batch, the objects registered in the batch are de-registered (de-registering objects is not undone) and
+        the exception is re-raised.
+        The scene stays locked (to other threads) for the whole block, and frames cannot be captured inside it:
+
+            with scene.batch():
+                for sphere in spheres:
+                    sphere.coordinates[2] += 0.1
+        """
+        with super().__getattribute__('_lock'):
+            if super().__getattribute__('_batch') is not None:
+                yield  # nested: the outermost batch commits
+                return
+            super().__setattr__('_batch', {})
+            super().__setattr__('_batch_registered', [])
+            try:
+                yield
+            except BaseException:
+                self._rollback_batch()
+                raise
+            else:
+                self._commit_batch()
+            finally:
+                super().__setattr__('_batch', None)
+                super().__setattr__('_batch_registered', None)
+
+    @_synchronised
+    def _touch(self, object_item: 'BaseObject', key: Optional[str] = None) -> bool:
+        """
+        Records an object about to be written to (key is the attribute assigned, None for element writes) if a batch
+        is open, and returns whether it is (see batch). Its state is saved the first time it is touched
+        """
+        batch: Optional[dict] = super().__getattribute__('_batch')
+        if batch is None:
+            return False
+        entry = batch.get(id(object_item))
+        if entry is None:
+            state = dict(object_item.__dict__)
+            # The values of the arrays of a registered sphere are still in the sphere table (it is only encoded when
+            # the batch ends), so they are not copied
+            snapshots = None if self._holds_sphere(object_item) else {
+                name: _snapshot(value) for name, value in state.items()
+            }
+            entry = batch[id(object_item)] = (object_item, state, snapshots, set())
+        if key is not None:
+            entry[3].add(key)
+        return True
+
+    def _holds_sphere(self, object_item: 'BaseObject') -> bool:
+        """
+        Returns True if the object is a sphere registered to this scene (and encoded in the sphere table)
+        """
+        return object_item.name in super().__getattribute__('_sphere_table') and self._holds(object_item)
+
+    def _rollback_batch(self):
+        """
+        Restores every object touched in the batch to its state before the batch and de-registers the objects
+        registered in the batch (they are only encoded when the batch commits)
+        """
+        sphere_table: SphereTable = super().__getattribute__('_sphere_table')
+        for object_item, state, snapshots, _ in super().__getattribute__('_batch').values():
+            object_item.__dict__.clear()
+            object_item.__dict__.update(state)
+            if snapshots is None:
+                record = sphere_table.record(object_item.name)
+                for row, name in enumerate(('coordinates', 'ambient', 'diffuse', 'specular')):
+                    np.copyto(state[name], record[row])
+            else:
+                for name, value in state.items():
+                    _restore(value, snapshots[name])
+        directory: dict = super().__getattribute__('_object_directory')
+        for object_item, bound_scene in reversed(super().__getattribute__('_batch_registered')):
+            if self._holds(object_item):
+                del directory[object_item.name]
+                object_item._scene = bound_scene
+
+    def _commit_batch(self):
+        """
+        Validates the values assigned in the batch (rolling the batch back if one is invalid) and applies the updates
+        of the touched objects
+        """
+        from pydantic import ValidationError
+        from Objects.SolidObjects import Sphere
+        batch: dict = super().__getattribute__('_batch')
+        for object_item, _, _, assigned in batch.values():
+            fields = object_item.__fields__
+            errors = []
+            for key in assigned:
+                value, error = fields[key].validate(
+                    object_item.__dict__[key], object_item.__dict__, loc=key, cls=object_item.__class__
+                )
+                if error:
+                    errors.append(error)
+                else:
+                    object_item.__dict__[key] = value
+            if errors:
+                self._rollback_batch()
+                raise ValidationError(errors, object_item.__class__)
+        super().__setattr__('_batch', None)
+        # The registered spheres are encoded together, the other objects (including the spheres registered in the
+        # batch) one by one
+        spheres = []
+        for object_item, _, snapshots, _ in batch.values():
+            if snapshots is None and object_item.__class__ is Sphere and self._holds(object_item):
+                spheres.append(object_item)
+            else:
+                self._assign_updated(object_item)
+        if spheres:
+            super().__getattribute__('_sphere_table').set_many(
+                [sphere.name for sphere in spheres],
+                self._encode_sphere_records(spheres)
+            )
+            super().__setattr__('_spheres_updated', True)
+
+    @_synchronised
+    def set_frame_publisher(self, publisher: Optional['Scenarios.FramePublisher']):
+        """
+        Publishes every subsequently captured frame (recorded or not) to other processes through the shared memory
+        ring of publisher (see Scenarios.FramePublisher, its shape and dtype must match the camera resolution and
+        output format). None stops publishing. The publisher is not closed by the scene
+        """
+        super().__setattr__('_frame_publisher', publisher)
+
+    @_synchronised
+    def warmup(self):
+        """
+        Creates the cuda context and compiles the kernels (compiles the cpu renderer with the cpu backend), which
+        otherwise happens on the first capture_frame.
+        Call it before the scene has to render to a deadline (e.g. before a service takes requests)
+        """
+        if self.backend == 'cpu':
+            warmup_cpu()
+            return
+        cuda.current_context()
+        compile_kernels(
+            render_image,
+            invalidate_occluders,
+            clear_raster,
+            rasterize_depth,
+            rasterize_first_hits,
+            *[kernel for kernel in _OUTPUT_FORMATS.values() if kernel is not None]
+        )
+
+    @_synchronised
+    def save(self, path: str):
+        """
+        Saves the camera, lights, spheres, epsilon and max reflections to an (uncompressed) npz file of typed
+        columnar arrays (see load). The .npz extension is added if path does not have it
+        """
+        columns = super().__getattribute__('_sphere_table').columns()
+        columns.update({
+            'eps': np.array(self.eps, dtype='float32'),
+            'reflect': np.array(self.reflect, dtype='float32'),
+        })
+        if '_camera' in self:
+            camera: 'MetaObjects.Camera' = self['_camera']
+            columns.update({
+                'camera_coordinates': np.array(camera.coordinates, dtype='float32'),
+                'camera_resolution': np.array(camera.resolution, dtype='int32'),
+                'camera_background_colour': np.array(camera.background_colour, dtype='float32'),
+                'camera_screen_vectors': np.array(camera.screen_vectors, dtype='float32'),
+            })
+        lights: List['MetaObjects.Light'] = [self[name] for name in self.light_names]
+        if lights:
+            columns.update({
+                'light_names': np.array([light.name for light in lights], dtype='U'),
+                'light_coordinates': np.array([light.coordinates for light in lights], dtype='float32'),
+                'light_ambient': np.array([light.ambient for light in lights], dtype='float32'),
+                'light_diffuse': np.array([light.diffuse for light in lights], dtype='float32'),
+                'light_specular': np.array([light.specular for light in lights], dtype='float32'),
+                'light_intensity': np.array([light.intensity for light in lights], dtype='float32'),
+                'light_radius': np.array([light.radius for light in lights], dtype='float32'),
+            })
+        write_scene_file(path, columns)
+
+    @_synchronised
+    def load(self, path: str, mmap: bool = False, trusted: bool = False):
+        """
+        Replaces every registered object (and the epsilon and max reflections) with the contents of a scene file
+        written by save. Raises a ValueError if the file is not a valid scene file
+        Args:
+            path:
+                the path to the npz file
+            mmap:
+                if True, the file is memory-mapped rather than read into memory first
+            trusted:
+                if True, the spheres are written straight into the encoder buffer without being validated, and their
+                Sphere objects are only created when accessed (e.g. scene['name']). Only use it for files written
+                by save. If False, every sphere is created (and validated) like any other Sphere
+        """
+        from Objects.MetaObjects import Camera, Light
+        from Objects.SolidObjects import Sphere
+        columns = read_scene_file(path, mmap=mmap)
+        self._clear_objects()
+        self.set_eps(float(columns['eps']))
+        self.set_reflect(int(columns['reflect']))
+        if 'camera_coordinates' in columns:
+            Camera(
+                scene=self,
+                coordinates=np.array(columns['camera_coordinates']),
+                resolution=tuple(int(i) for i in columns['camera_resolution']),
+                background_colour=np.array(columns['camera_background_colour']),
+                screen_vectors=tuple(np.array(i) for i in columns['camera_screen_vectors']),
+            )
+        for i, name in enumerate(columns['light_names'].tolist() if 'light_names' in columns else []):
+            Light(
+                scene=self,
+                name=name,
+                coordinates=np.array(columns['light_coordinates'][i]),
+                ambient=np.array(columns['light_ambient'][i]),
+                diffuse=np.array(columns['light_diffuse'][i]),
+                specular=np.array(columns['light_specular'][i]),
+                intensity=float(columns['light_intensity'][i]),
+                radius=float(columns['light_radius'][i]),
+            )
+        names = columns['sphere_names'].tolist()
+        if trusted:
+            super().__getattribute__('_sphere_table').load(names, columns)
+            super().__getattribute__('_object_directory').update(dict.fromkeys(names))
+            super().__setattr__('_spheres_updated', True)
+            return
+        for i, name in enumerate(names):
+            Sphere(
+                scene=self,
+                name=name,
+                coordinates=np.array(columns['sphere_coordinates'][i]),
+                ambient=np.array(columns['sphere_ambient'][i]),
+                diffuse=np.array(columns['sphere_diffuse'][i]),
+                specular=np.array(columns['sphere_specular'][i]),
+                shine=float(columns['sphere_shine'][i]),
+                reflect=float(columns['sphere_reflect'][i]),
+                radius=float(columns['sphere_radius'][i]),
+            )
+
+    @_synchronised
     def items(self) -> ItemsView[str, 'BaseObject']:
         """
         Iterate over _object_directory.items()
         """
+        self._materialise_spheres()
         return super().__getattribute__('_object_directory').items()
 
     def keys(self) -> KeysView[str]:
@@ -118,10 +672,12 @@ class _SceneInterface:
         """
         return super().__getattribute__('_object_directory').keys()
 
+    @_synchronised
     def values(self) -> ValuesView['BaseObject']:
         """
         Iterate over _object_directory.keys()
         """
+        self._materialise_spheres()
         return super().__getattribute__('_object_directory').values()
 
     def __contains__(self, item: str) -> bool:
@@ -145,61 +701,172 @@ class _SceneInterface:
         Returns the camera location, pixels array and rays unit vector (in that order)
         """
         camera: 'MetaObjects.Camera' = self['_camera']
-        rays = camera._construct_rays()
-        return camera.coordinates.astype('float32'),\
-            camera.background_colour.astype('float32'),\
+        window: Optional[Tuple[int, int, int, int]] = super().__getattribute__('_render_window')
+        with super().__getattribute__('_stats')._stage('construct_rays'):
+            if window is None:
+                rays = camera._construct_rays(self._render_resolution())
+            else:
+                rays = camera._construct_rays(window=window)
+        return np.array(camera.coordinates, dtype='float32'),\
+            np.array(camera.background_colour, dtype='float32'),\
             rays.astype('float32')
 
-    def _encoded_light(self) -> np.ndarray:
+    def _encoded_lights(self) -> np.ndarray:
         """
-        Returns the encoded light data (to be transferred to cuda).
-        shape=(4, 3)
+        Returns the encoded lights data (to be transferred to cuda), in the order of light_names.
+        shape=(l, 5, 3)
         where:
-            array[0] is the coordinate vector of light
-            array[1] is the ambient vector
-            array[2] is the diffuse vector
-            array[3] is the specular vector
-        """
-        light: 'MetaObjects.Light' = self['_light']
-        encoded = np.vstack([
-            light.coordinates,
-            light.ambient,
-            light.diffuse,
-            light.specular,
-            np.full(shape=(3,), fill_value=light.intensity ** 2, dtype='float32')
-        ])
-        return encoded.astype('float32')
+            array[i][0] is the coordinate vector of the ith light
+            array[i][1] is the ambient vector
+            array[i][2] is the diffuse vector
+            array[i][3] is the specular vector
+            array[i][4] is [intensity ** 2, culling distance squared, radius]. A light is culled at the points further
+            than the culling distance (intensity ** 2 / cutoff, infinite if the light cutoff is 0)
+        """
+        cutoff: float = super().__getattribute__('_light_cutoff')
+        encoded = np.zeros(shape=(len(self.light_names), 5, 3), dtype='float32')
+        for i, name in enumerate(self.light_names):
+            light: 'MetaObjects.Light' = self[name]
+            intensity_sq = light.intensity ** 2
+            encoded[i, 0] = light.coordinates
+            encoded[i, 1] = light.ambient
+            encoded[i, 2] = light.diffuse
+            encoded[i, 3] = light.specular
+            encoded[i, 4, 0] = intensity_sq
+            encoded[i, 4, 1] = intensity_sq / cutoff if cutoff else np.inf
+            encoded[i, 4, 2] = light.radius
+        return encoded
 
     def _encode_spheres(self) -> np.ndarray:
         """
-        Returns an encoded sphere array
-        shape=(512,5,3)
+        Returns the encoded sphere geometries
+        shape=(512,4)
         where:
-            array[i] is the ith sphere (will fill the array with zeros if not enough spheres)
-            array[i][0] is the coordinate vector of the centre of the ith sphere
-            array[i][1] is the ambient vector of the ith sphere
-            array[i][2] is the diffuse vector of the ith sphere
-            array[i][3] is the specular vector of the ith sphere
-            array[i][4] is the vector representing [shine, reflect, radius] of the ith sphere
+            array[i] is the [x, y, z, radius] of the ith sphere (will fill the array with zeros if not enough spheres)
+        The materials of the spheres are encoded separately (see _encoded_materials). The spheres are encoded into
+        the sphere table as they are registered/updated, so this only returns its buffer.
         Note in the cuda kernel, you can identify if a sphere is a placeholder or an actual sphere by checking if
         radius == 0
         """
-        from Objects import SolidObjects
-        output = np.zeros(
-            shape=(512, 5, 3)
+        return super().__getattribute__('_sphere_table').geometry
+
+    def _encoded_materials(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the material id of every sphere, shape=(512,), and the deduplicated materials, shape=(m,4,3)
+        where:
+            array[j][0] is the ambient vector of the jth material
+            array[j][1] is the diffuse vector of the jth material
+            array[j][2] is the specular vector of the jth material
+            array[j][3] is the vector representing [shine, reflect, 0] of the jth material
+        Spheres of the same colours share one material (see _MaterialTable.MaterialTable)
+        """
+        sphere_table: SphereTable = super().__getattribute__('_sphere_table')
+        return sphere_table.material_ids, sphere_table.materials.encoded
+
+    @staticmethod
+    def _encode_sphere(sphere: 'SolidObjects.Sphere') -> np.ndarray:
+        """
+        Returns the encoded record of a sphere, shape=(5, 3): its centre, ambient, diffuse and specular vectors and
+        [shine, reflect, radius]. The sphere table splits it into the geometry and the material of the sphere
+        """
+        return np.stack([
+            sphere.coordinates,
+            sphere.ambient,
+            sphere.diffuse,
+            sphere.specular,
+            np.array([sphere.shine, sphere.reflect, sphere.radius], dtype='float32')
+        ]).astype('float32')
+
+    @staticmethod
+    def _encode_sphere_records(spheres: List['SolidObjects.Sphere']) -> np.ndarray:
+        """
+        Returns the encoded records of several spheres, shape=(n, 5, 3) (see _encode_sphere)
+        """
+        records = np.empty(shape=(len(spheres), 5, 3), dtype='float32')
+        for row, name in enumerate(('coordinates', 'ambient', 'diffuse', 'specular')):
+            records[:, row] = [getattr(sphere, name) for sphere in spheres]
+        records[:, 4] = [(sphere.shine, sphere.reflect, sphere.radius) for sphere in spheres]
+        return records
+
+    def _encoded_shadow_casters(self, lights_encoded: np.ndarray, sphere_geometry: np.ndarray) -> np.ndarray:
+        """
+        Returns the shadow caster masks of every light (see _ShadowCasters.build_shadow_casters). The spheres are
+        grown by epsilon, as shadow rays start an epsilon away from the surface hit
+        """
+        return build_shadow_casters(
+            lights_encoded,
+            sphere_geometry,
+            len(super().__getattribute__('_sphere_table')),
+            self.eps
         )
-        sphere_data = np.stack([
-            np.stack([
-                sphere.coordinates,
-                sphere.ambient,
-                sphere.diffuse,
-                sphere.specular,
-                np.array([sphere.shine, sphere.reflect, sphere.radius], dtype='float32')
-            ])
-            for sphere in self.values() if isinstance(sphere, SolidObjects.Sphere)
-        ])
-        output[:len(sphere_data), :, :] = sphere_data
-        return output.astype('float32')
+
+    def _encoded_tile_masks(self, camera_location: np.ndarray, sphere_geometry: np.ndarray) -> np.ndarray:
+        """
+        Returns the candidate spheres of the primary rays of every screen tile (see _ScreenTiles.ScreenTiles)
+        """
+        screen_tiles: ScreenTiles = super().__getattribute__('_screen_tiles')
+        return screen_tiles.candidates(
+            camera_location,
+            sphere_geometry,
+            len(super().__getattribute__('_sphere_table'))
+        )
+
+    def _encoded_sphere_bounds(self) -> np.ndarray:
+        """
+        Returns the pixels of the rendered frame (or tile) each sphere may be the first hit of, shape (n, 4) (see
+        Camera._project_spheres)
+        """
+        camera: 'MetaObjects.Camera' = self['_camera']
+        window: Optional[Tuple[int, int, int, int]] = super().__getattribute__('_render_window')
+        sphere_geometry = self._encode_spheres()[:len(super().__getattribute__('_sphere_table'))]
+        if window is None:
+            return camera._project_spheres(sphere_geometry, self._render_resolution())
+        return camera._project_spheres(sphere_geometry, window=window)
+
+    def _encoded_other_data(self) -> np.ndarray:
+        """
+        Returns the encoded epsilon, max reflections, counters flag (1 if stats are enabled, else 0),
+        diagnostics flag (1 if diagnostics are enabled, else 0), contribution cutoff, the initial and total
+        soft shadow samples and the rasterization flag (1 if the primary visibility is "raster", else 0). The max
+        reflections, contribution cutoff and soft shadow samples of a preview frame are those of its quality (see
+        capture_frame)
+        """
+        stats: SceneStats = super().__getattribute__('_stats')
+        preview: Optional[PreviewQuality] = super().__getattribute__('_preview')
+        if preview is None:
+            reflect, contribution_cutoff, soft_shadow_samples = \
+                self.reflect, self.contribution_cutoff, self.soft_shadow_samples
+        else:
+            reflect, contribution_cutoff, soft_shadow_samples = \
+                preview.reflect, preview.contribution_cutoff, preview.soft_shadow_samples
+        return np.array([
+            self.eps,
+            reflect,
+            stats.enabled,
+            super().__getattribute__('_diagnostics_enabled'),
+            contribution_cutoff,
+            *soft_shadow_samples,
+            self.primary_visibility == 'raster'
+        ], dtype='float32')
+
+    def _to_device(self, name: str, array: np.ndarray, ranges: Optional[List[Tuple[int, int]]] = None) -> None:
+        """
+        Copies the array to the gpu buffer of the given name (allocating the buffer if it does not exist yet or if
+        the shape changed, e.g. the number of lights). If ranges is given, only those (start, stop) ranges of rows
+        are copied into an existing buffer (see SphereTable.take_dirty_ranges)
+        """
+        device_array = super().__getattribute__(name)
+        if device_array is None or device_array.shape != array.shape:
+            super().__setattr__(name, cuda.to_device(array))
+            nbytes = array.nbytes
+        elif ranges is None:
+            device_array.copy_to_device(array)
+            nbytes = array.nbytes
+        else:
+            for start, stop in ranges:
+                device_array[start:stop].copy_to_device(array[start:stop])
+            nbytes = sum(array[start:stop].nbytes for start, stop in ranges)
+        super().__getattribute__('_stats')._add_bytes(name[len('_device_'):], nbytes)
 
     def _first_time_initialise(self) -> None:
         """
@@ -207,23 +874,37 @@ class _SceneInterface:
         Keeps a reference to the cuda DeviceNDArray object
         """
         super().__setattr__('_gpu_initialised', True)
-        self.__class__._RESOLUTION = self['_camera'].resolution
+        self._bind_frame_buffers()
+        stats: SceneStats = super().__getattribute__('_stats')
         camera_location, background_colour, rays = self._encoded_camera()
-        light_encoded = self._encoded_light()
-        spheres_encoded = self._encode_spheres()
+        with stats._stage('encode_light'):
+            lights_encoded = self._encoded_lights()
+        with stats._stage('encode_spheres'):
+            sphere_geometry = self._encode_spheres()
+            sphere_materials, materials = self._encoded_materials()
+            super().__getattribute__('_sphere_table').take_dirty_ranges()  # every slot is copied
+        with stats._stage('encode_shadow_casters'):
+            shadow_casters = self._encoded_shadow_casters(lights_encoded, sphere_geometry)
+        with stats._stage('encode_tiles'):
+            super().__setattr__('_screen_tiles', ScreenTiles(rays))
+            tile_masks = self._encoded_tile_masks(camera_location, sphere_geometry)
         threads = [
             ExcThreading(
-                target=lambda target, array: super(self.__class__, self).__setattr__(target, cuda.to_device(array)),
+                target=self._to_device,
                 args=(name, value)
             )
             for name, value in [
                 ('_device_background_colour', background_colour),
                 ('_device_camera', camera_location),
                 ('_device_rays', rays),
-                ('_device_light', light_encoded),
-                ('_device_spheres', spheres_encoded),
-                ('_device_other_data', np.array([self._EPS, self._MAX_REFLECTIONS], dtype='float32')),
-                ('_device_output_frame', np.zeros(shape=rays.shape, dtype='float32')),
+                ('_device_light', lights_encoded),
+                ('_device_spheres', sphere_geometry),
+                ('_device_sphere_materials', sphere_materials),
+                ('_device_materials', materials),
+                ('_device_shadow_casters', shadow_casters),
+                ('_device_tile_masks', tile_masks),
+                ('_device_other_data', self._encoded_other_data()),
+                ('_device_counters', np.zeros(shape=(3,), dtype='float64')),
             ]
         ]
         for thread in threads:
@@ -231,22 +912,55 @@ class _SceneInterface:
         for thread in threads:
             thread.join()
 
+    def _bind_frame_buffers(self) -> None:
+        """
+        Points the frame sized buffers (rays, output frame, quantized frame, diagnostics and the host frame) at the
+        pooled buffers of the render resolution (see _render_resolution), allocating them if that resolution is not
+        pooled (see BufferPool). The quantized frame is only needed if the output format is not float32. While
+        diagnostics are disabled, a (1, 1, 4) placeholder is bound instead (the kernel does not write to it)
+        """
+        pool: BufferPool = super().__getattribute__('_buffer_pool')
+        resolution = self._render_resolution()
+        frame_shape = resolution + (3,)
+        output_format = self.output_format
+        super().__setattr__('_device_rays', pool.get(resolution, 'rays', frame_shape, 'float32'))
+        super().__setattr__('_device_output_frame', pool.get(resolution, 'output_frame', frame_shape, 'float32'))
+        super().__setattr__('_device_quantized_frame', None if _OUTPUT_FORMATS[output_format] is None else pool.get(
+            resolution, 'quantized_frame', frame_shape, output_format
+        ))
+        host_format = 'float32' if _OUTPUT_FORMATS[output_format] is None else output_format
+        super().__setattr__('_host_frame', pool.get(resolution, 'frame', frame_shape, host_format, host=True))
+        if super().__getattribute__('_diagnostics_enabled'):
+            device_diagnostics = pool.get(resolution, 'diagnostics', resolution + (4,), 'int32')
+        else:
+            device_diagnostics = super().__getattribute__('_diagnostics_placeholder')
+            if device_diagnostics is None:
+                device_diagnostics = cuda.device_array(shape=(1, 1, 4), dtype='int32')
+                super().__setattr__('_diagnostics_placeholder', device_diagnostics)
+        super().__setattr__('_device_diagnostics', device_diagnostics)
+
     def _transfer_to_gpu(self):
         """
         Method transfers data to gpu to prepare for processing
         """
         gpu_initialised: bool = super().__getattribute__('_gpu_initialised')
+        stats: SceneStats = super().__getattribute__('_stats')
+        dirty_ranges: Optional[List[Tuple[int, int]]] = []
+        raster_stale: bool = not gpu_initialised or super().__getattribute__('_device_first_hits') is None or \
+            self._geometry_updated()
         if not gpu_initialised:
             self._first_time_initialise()
         else:
-            if super().__getattribute__('_camera_updated'):
+            camera_updated: bool = super().__getattribute__('_camera_updated')
+            if camera_updated:
+                # The camera may have been replaced by one of another resolution
+                self._bind_frame_buffers()
                 camera_location, background_colour, rays = self._encoded_camera()
+                with stats._stage('encode_tiles'):
+                    super().__setattr__('_screen_tiles', ScreenTiles(rays))
                 threads = [
                     ExcThreading(
-                        target=lambda target, array: super(
-                            self.__class__,
-                            self
-                        ).__getattribute__(target).copy_to_device(array),
+                        target=self._to_device,
                         args=(name, value)
                     )
                     for name, value in [
@@ -259,43 +973,208 @@ class _SceneInterface:
                     thread.start()
                 for thread in threads:
                     thread.join()
-            if super().__getattribute__('_light_updated'):
-                light_encoded = self._encoded_light()
-                super().__getattribute__('_device_light').copy_to_device(light_encoded)
-            if super().__getattribute__('_spheres_updated'):
-                spheres_encoded = self._encode_spheres()
-                super().__getattribute__('_device_spheres').copy_to_device(spheres_encoded)
-            if super().__getattribute__('_eps_reflect_updated'):
-                super().__getattribute__('_device_other_data').copy_to_device(
-                    np.array([self._EPS, self._MAX_REFLECTIONS], dtype='float32')
+            light_updated: bool = super().__getattribute__('_light_updated')
+            spheres_updated: bool = super().__getattribute__('_spheres_updated')
+            # The cones of the spheres seen from the lights (and the epsilon they are grown by) may have changed
+            casters_updated: bool = light_updated or spheres_updated or super().__getattribute__('_other_data_updated')
+            if casters_updated:
+                with stats._stage('encode_light'):
+                    lights_encoded = self._encoded_lights()
+                if light_updated:
+                    self._to_device('_device_light', lights_encoded)
+                with stats._stage('encode_spheres'):
+                    sphere_geometry = self._encode_spheres()
+                    sphere_materials, materials = self._encoded_materials()
+                if spheres_updated:
+                    # Only the slots written since the last frame are copied
+                    dirty_ranges = super().__getattribute__('_sphere_table').take_dirty_ranges()
+                    self._to_device('_device_spheres', sphere_geometry, dirty_ranges)
+                    self._to_device('_device_sphere_materials', sphere_materials, dirty_ranges)
+                    self._to_device('_device_materials', materials)
+                with stats._stage('encode_shadow_casters'):
+                    shadow_casters = self._encoded_shadow_casters(lights_encoded, sphere_geometry)
+                self._to_device('_device_shadow_casters', shadow_casters)
+            if camera_updated or spheres_updated:
+                # The spheres projecting onto each screen tile may have changed
+                with stats._stage('encode_tiles'):
+                    tile_masks = self._encoded_tile_masks(
+                        np.array(self['_camera'].coordinates, dtype='float32'),
+                        self._encode_spheres()
+                    )
+                self._to_device('_device_tile_masks', tile_masks)
+            if super().__getattribute__('_other_data_updated'):
+                self._to_device('_device_other_data', self._encoded_other_data())
+            if super().__getattribute__('_other_data_updated') or super().__getattribute__('_output_format_updated'):
+                self._bind_frame_buffers()
+        with stats._stage('invalidate_occluders'):
+            self._invalidate_occluders(dirty_ranges)
+        if self.primary_visibility == 'raster':
+            if raster_stale:
+                with stats._stage('rasterize'):
+                    self._rasterize_on_gpu()
+        elif super().__getattribute__('_device_first_hits') is None:
+            # A placeholder, the kernel does not read it
+            super().__setattr__('_device_first_hits', cuda.device_array(shape=(1, 1), dtype='int32'))
+        self._set_updated(False)
+
+    def _rasterize_on_gpu(self) -> None:
+        """
+        Rasterizes the first hits of the primary rays of the render resolution (see set_primary_visibility) into a
+        pooled buffer: the depth and first hit buffers are cleared, and each sphere is splatted onto the pixels of
+        its screen bounds in two passes (the closest distance, then the lowest sphere at that distance)
+        """
+        stats: SceneStats = super().__getattribute__('_stats')
+        pool: BufferPool = super().__getattribute__('_buffer_pool')
+        resolution = self._render_resolution()
+        depth = pool.get(resolution, 'raster_depth', resolution, 'float32')
+        first_hits = pool.get(resolution, 'first_hits', resolution, 'int32')
+        blocks_per_grid, threads_per_block = quantize_blocks(resolution)
+        clear_raster[blocks_per_grid, threads_per_block](depth, first_hits)
+        sphere_bounds = self._encoded_sphere_bounds()
+        if len(sphere_bounds):
+            device_sphere_bounds = cuda.to_device(sphere_bounds)
+            stats._add_bytes('sphere_bounds', sphere_bounds.nbytes)
+            blocks_per_grid, threads_per_block = raster_blocks(sphere_bounds)
+            for rasterize in (rasterize_depth, rasterize_first_hits):
+                rasterize[blocks_per_grid, threads_per_block](
+                    super().__getattribute__('_device_camera'),
+                    super().__getattribute__('_device_rays'),
+                    super().__getattribute__('_device_spheres'),
+                    device_sphere_bounds,
+                    super().__getattribute__('_device_other_data'),
+                    depth,
+                    first_hits
                 )
-        super().__setattr__('_camera_updated', False)
-        super().__setattr__('_light_updated', False)
-        super().__setattr__('_spheres_updated', False)
-        super().__setattr__('_eps_reflect_updated', False)
+        if stats.enabled:
+            cuda.synchronize()
+        stats._set_counters(0, 0, 2 * raster_tests(sphere_bounds))
+        super().__setattr__('_device_first_hits', first_hits)
+
+    def _invalidate_occluders(self, dirty_ranges: Optional[List[Tuple[int, int]]]) -> None:
+        """
+        Keeps the gpu last occluder cache (see engine.render_image) valid: it is reset if the render resolution or
+        the number of lights changed, and its entries holding a sphere slot written since the last frame (see
+        SphereTable.take_dirty_ranges, every slot if dirty_ranges is None) are cleared. A stale entry would still
+        render correctly (the occluder is always tested), only the test would be wasted
+        """
+        shape = self._render_resolution() + (len(self.light_names),)
+        device_occluders = super().__getattribute__('_device_occluders')
+        if device_occluders is None or device_occluders.shape != shape:
+            self._to_device('_device_occluders', np.full(shape=shape, fill_value=-1, dtype='int32'))
+            return
+        if dirty_ranges is not None and not dirty_ranges:
+            return
+        dirty_slots = _dirty_slots(dirty_ranges, len(super().__getattribute__('_sphere_table').geometry))
+        blocks_per_grid, threads_per_block = quantize_blocks(shape[:2])
+        invalidate_occluders[blocks_per_grid, threads_per_block](device_occluders, cuda.to_device(dirty_slots))
+        super().__getattribute__('_stats')._add_bytes('dirty_slots', dirty_slots.nbytes)
 
-    def _check_identical_frame(self) -> Union[np.ndarray, None]:
+    def _transfer_to_host(self) -> dict:
+        """
+        Encodes the scene for the cpu backend (the camera and lights only if they changed, the spheres and materials
+        are views of the sphere table). Returns the encoded arrays
+        """
+        stats: SceneStats = super().__getattribute__('_stats')
+        host_scene: dict = super().__getattribute__('_host_scene')
+        raster_stale: bool = 'first_hits' not in host_scene or self._geometry_updated()
+        if super().__getattribute__('_camera_updated') or 'rays' not in host_scene:
+            camera_location, background_colour, rays = self._encoded_camera()
+            host_scene['camera_location'] = camera_location
+            host_scene['background_colour'] = background_colour
+            # Structure of arrays: the rays of a packet are contiguous along each axis (see engine.render_image_cpu)
+            host_scene['rays'] = np.ascontiguousarray(rays.transpose(2, 0, 1))
+        if super().__getattribute__('_light_updated') or 'lights' not in host_scene:
+            with stats._stage('encode_light'):
+                host_scene['lights'] = self._encoded_lights()
+        with stats._stage('encode_spheres'):
+            host_scene['spheres'] = self._encode_spheres()
+            host_scene['sphere_materials'], host_scene['materials'] = self._encoded_materials()
+            # Views: nothing to copy, the dirty slots only invalidate the last occluder cache
+            dirty_ranges = super().__getattribute__('_sphere_table').take_dirty_ranges()
+        with stats._stage('invalidate_occluders'):
+            shape = self._render_resolution() + (len(self.light_names),)
+            occluders: Optional[np.ndarray] = host_scene.get('occluders')
+            if occluders is None or occluders.shape != shape:
+                host_scene['occluders'] = np.full(shape=shape, fill_value=-1, dtype='int32')
+            elif dirty_ranges is None or dirty_ranges:
+                stale = occluders >= 0
+                stale[stale] = _dirty_slots(dirty_ranges, len(host_scene['spheres']))[occluders[stale]] > 0
+                occluders[stale] = -1
+        host_scene['other_data'] = self._encoded_other_data()
+        if self.primary_visibility == 'raster':
+            if raster_stale:
+                with stats._stage('rasterize'):
+                    sphere_bounds = self._encoded_sphere_bounds()
+                    host_scene['first_hits'] = np.empty(shape=self._render_resolution(), dtype='int32')
+                    with PARALLEL_LOCK:
+                        rasterize_spheres_cpu(
+                            host_scene['camera_location'],
+                            host_scene['rays'],
+                            host_scene['spheres'],
+                            sphere_bounds,
+                            host_scene['other_data'],
+                            host_scene['first_hits']
+                        )
+                stats._set_counters(0, 0, raster_tests(sphere_bounds))
+        elif 'first_hits' not in host_scene:
+            host_scene['first_hits'] = np.full(shape=(1, 1), fill_value=-1, dtype='int32')  # Not read
+        self._set_updated(False)
+        return host_scene
+
+    def _geometry_updated(self) -> bool:
+        """
+        Returns whether the camera (or the render resolution/window), the spheres or the epsilon changed since the
+        last frame, i.e. whether the first hits of the primary rays may have changed
+        """
+        return super().__getattribute__('_camera_updated') or super().__getattribute__('_spheres_updated') or \
+            super().__getattribute__('_other_data_updated')
+
+    def _set_updated(self, updated: bool) -> None:
+        """
+        Sets every updated flag (camera, lights, spheres, other data and output format)
+        """
+        super().__setattr__('_camera_updated', updated)
+        super().__setattr__('_light_updated', updated)
+        super().__setattr__('_spheres_updated', updated)
+        super().__setattr__('_other_data_updated', updated)
+        super().__setattr__('_output_format_updated', updated)
+
+    def _check_identical_frame(self, record: bool = True) -> Union[np.ndarray, None]:
         """
         Checks if identical frame is being captured (in which case we just
         duplicate the last frame).
-        Appends the last frame onto frames and returns the frame if identical frame is
+        Appends the last frame onto frames (if record is True) and returns the frame if identical frame is
         captured, else returns None
         """
-        frames = super().__getattribute__('_frames')
-        if frames is None or frames.shape[0] == 0:
+        last_frame = super().__getattribute__('_last_frame')
+        if last_frame is None:
             return None
         conditions = [
             super().__getattribute__('_camera_updated'),
             super().__getattribute__('_light_updated'),
             super().__getattribute__('_spheres_updated'),
-            super().__getattribute__('_eps_reflect_updated'),
+            super().__getattribute__('_other_data_updated'),
+            super().__getattribute__('_output_format_updated'),
         ]
         if any(conditions):
             return None
-        frame = deepcopy(frames[-1])
-        self._add_frame_to_frames(frame)
+        frame = deepcopy(last_frame)
+        if record:
+            self._add_frame_to_frames(frame)
         return frame
 
+    def _check_frame_resolution(self):
+        """
+        Raises a SceneError if frames of another resolution have already been recorded (frames is a single array)
+        """
+        frames: np.ndarray = super().__getattribute__('_frames')
+        resolution = tuple(self['_camera'].resolution)
+        if frames is not None and frames.shape[1:3] != resolution:
+            raise SceneError(
+                f'Cannot record a frame of resolution {resolution} with the recorded frames of resolution '
+                f'{frames.shape[1:3]} (capture it with record=False)'
+            )
+
     def _add_frame_to_frames(self, frame: np.ndarray):
         """
         Method appends the given frame to the _frames attribute
@@ -308,31 +1187,299 @@ class _SceneInterface:
             new_frames = np.append(frames, frame.reshape((1,) + shape), axis=0)
         super().__setattr__('_frames', new_frames)
 
-    def capture_frame(self) -> np.ndarray:
+    @_synchronised
+    def capture_frame(self, record: bool = True, budget_ms: float = None) -> np.ndarray:
         """
-        Captures the frame and appends it to the frames array.
-        Also returns the newly created frame
+        Captures the frame and appends it to the frames array (if record is True).
+        Also returns the newly created frame.
+        Use record=False when streaming frames elsewhere (e.g. to a Scenarios.VideoSink or through a frame publisher,
+        see set_frame_publisher) so they are not kept in memory.
+        If budget_ms is given, the frame is a preview: a feedback controller picks its quality (the resolution it is
+        rendered at, the max reflections, contribution cutoff and soft shadow samples) from the measured times of
+        the previous frames so that frames take about budget_ms, and the frame is upscaled to the camera
+        resolution (see _FrameBudget.FrameBudget). Once the scene stops changing, the quality recovers over the
+        next frames up to the full quality. Frames captured without budget_ms are rendered at the full quality
         Raises a SceneError if there is something wrong with the arrangement of objects
         """
-        frame = self._check_identical_frame()
+        if super().__getattribute__('_batch') is not None:
+            raise SceneError('Cannot capture a frame inside scene.batch() (the updates are not applied yet)')
+        if budget_ms is not None and budget_ms <= 0:
+            raise ValueError(f'The frame budget must be positive')
+        start = time.perf_counter()
+        stats: SceneStats = super().__getattribute__('_stats')
+        stats._begin_frame()
+        if record and '_camera' in self:
+            self._check_frame_resolution()
+        self._plan_preview(budget_ms)
+        stats._set_preview(super().__getattribute__('_preview'))
+        with stats._stage('identical_frame'):
+            frame = self._check_identical_frame(record=record)
         if frame is not None:
+            self._publish_frame(frame)
+            stats._end_frame(identical=True)
             return frame
+        with stats._stage('check_scene'):
+            self._check_scene()
+        frame = self._render_on_cpu() if self.backend == 'cpu' else self._render_on_gpu()
+        if super().__getattribute__('_preview') is not None:
+            with stats._stage('upscale'):
+                frame = upscale(frame, tuple(self['_camera'].resolution))
+        super().__setattr__('_last_frame', frame)
+        if record:
+            with stats._stage('add_frame_to_frames'):
+                self._add_frame_to_frames(frame)
+        self._publish_frame(frame)
+        if budget_ms is not None:
+            super().__getattribute__('_frame_budget').observe((time.perf_counter() - start) * 1000)
+        stats._end_frame()
+        return frame
+
+    def _plan_preview(self, budget_ms: Optional[float]):
+        """
+        Sets the quality of the next frame: the full quality if budget_ms is None, else the quality planned by the
+        frame budget controller (created on the first preview frame). The controller is told the scene is still if
+        nothing changed since the last frame, a preview frame (the frames at the full quality need no refining)
+        """
+        if budget_ms is None:
+            self._set_preview(None)
+            return
+        frame_budget: FrameBudget = super().__getattribute__('_frame_budget')
+        if frame_budget is None:
+            frame_budget = FrameBudget(budget_ms)
+            super().__setattr__('_frame_budget', frame_budget)
+        frame_budget.budget_ms = budget_ms
+        still = super().__getattribute__('_last_frame') is not None and not any([
+            super().__getattribute__('_camera_updated'),
+            super().__getattribute__('_light_updated'),
+            super().__getattribute__('_spheres_updated'),
+            super().__getattribute__('_other_data_updated'),
+            super().__getattribute__('_output_format_updated'),
+        ])
+        if still and super().__getattribute__('_preview') is None:
+            return
+        self._set_preview(frame_budget.plan(
+            still,
+            self.reflect,
+            self.contribution_cutoff,
+            self.soft_shadow_samples
+        ))
+
+    def _set_preview(self, preview: Optional[PreviewQuality]):
+        """
+        Sets the quality of the next frame (None for the full quality), flagging the camera (the rays of another
+        resolution) and the other data for update if they change
+        """
+        current: Optional[PreviewQuality] = super().__getattribute__('_preview')
+        if preview == current:
+            return
+        other_data = self._encoded_other_data()
+        super().__setattr__('_preview', preview)
+        if (current.scale if current else 1.) != (preview.scale if preview else 1.):
+            super().__setattr__('_camera_updated', True)
+        if not np.array_equal(other_data, self._encoded_other_data()):
+            super().__setattr__('_other_data_updated', True)
+
+    def _render_resolution(self) -> Tuple[int, int]:
+        """
+        Returns the resolution frames are rendered at: the camera resolution, scaled down for preview frames (see
+        capture_frame), or the shape of the tile being rendered (see render_tiled)
+        """
+        window: Optional[Tuple[int, int, int, int]] = super().__getattribute__('_render_window')
+        if window is not None:
+            return window[1] - window[0], window[3] - window[2]
+        resolution = tuple(self['_camera'].resolution)
+        preview: Optional[PreviewQuality] = super().__getattribute__('_preview')
+        return resolution if preview is None else scaled_resolution(resolution, preview.scale)
+
+    def _set_render_window(self, window: Optional[Tuple[int, int, int, int]]):
+        """
+        Sets the (row_start, row_stop, column_start, column_stop) pixels of the frame rendered (None for the whole
+        frame), flagging the camera for update (the rays of the window are built and copied instead)
+        """
+        super().__setattr__('_render_window', window)
+        super().__setattr__('_camera_updated', True)
+        # The last occluders of another window's pixels are of no use
+        super().__setattr__('_device_occluders', None)
+        super().__getattribute__('_host_scene').pop('occluders', None)
+
+    @_synchronised
+    def render_tiled(
+            self,
+            output: Union[str, Callable[[np.ndarray, int, int], Any]],
+            tile_shape: Tuple[int, int] = (1024, 1024)
+    ) -> Optional[np.ndarray]:
+        """
+        Renders the frame of the camera one tile at a time, for resolutions whose frame does not fit in (gpu) memory:
+        only the rays, the output buffers and the host copy of one tile are held at once, so the peak memory is
+        bounded by the tile shape rather than the resolution. The rays of each tile are built on their own (see
+        Camera._construct_rays) and the tiles are the same as the matching pixels of capture_frame. The frame is
+        neither recorded (see frames) nor published, and the diagnostics hold those of the last tile
+        Raises a SceneError if there is something wrong with the arrangement of objects
+        Args:
+            output:
+                the path of the .npy file the frame is written to (created as a memory-mapped array, see
+                np.lib.format.open_memmap), or a function called with each tile and the row and column of its top
+                left pixel as soon as the tile is rendered (e.g. to stream it into an image writer). The tiles are
+                rendered row by row, left to right
+            tile_shape:
+                the (height, width) of the tiles (the last row and column of tiles may be smaller)
+        Returns:
+            the memory-mapped frame if output is a path, else None
+        """
+        if super().__getattribute__('_batch') is not None:
+            raise SceneError('Cannot render a frame inside scene.batch() (the updates are not applied yet)')
+        tile_height, tile_width = tile_shape
+        if tile_height <= 0 or tile_width <= 0:
+            raise ValueError(f'The tile shape must be positive integers')
         self._check_scene()
-        self._transfer_to_gpu()
-        blocks_per_grid = self['_camera'].resolution
-        threads_per_block = len([i for i in self.keys() if i not in self._SPECIAL_NAMES])
+        height, width = self['_camera'].resolution
+        frame: Optional[np.ndarray] = None
+        if isinstance(output, str):
+            frame = np.lib.format.open_memmap(
+                output,
+                mode='w+',
+                dtype=self.output_format,
+                shape=(height, width, 3)
+            )
+
+            def output(tile: np.ndarray, row: int, column: int):
+                frame[row:row + tile.shape[0], column:column + tile.shape[1]] = tile
+
+        stats: SceneStats = super().__getattribute__('_stats')
+        stats._begin_frame()
+        self._set_preview(None)
+        try:
+            for row in range(0, height, tile_height):
+                for column in range(0, width, tile_width):
+                    self._set_render_window(
+                        (row, min(row + tile_height, height), column, min(column + tile_width, width))
+                    )
+                    tile = self._render_on_cpu() if self.backend == 'cpu' else self._render_on_gpu()
+                    with stats._stage('write_tiles'):
+                        output(tile, row, column)
+        finally:
+            # The next frame is rendered whole again
+            self._set_render_window(None)
+        if frame is not None:
+            with stats._stage('write_tiles'):
+                frame.flush()
+        stats._end_frame()
+        return frame
+
+    def _publish_frame(self, frame: np.ndarray):
+        """
+        Copies the frame into the next slot of the frame publisher (if any, see set_frame_publisher)
+        """
+        publisher = super().__getattribute__('_frame_publisher')
+        if publisher is not None:
+            with super().__getattribute__('_stats')._stage('publish'):
+                publisher.publish(frame)
+
+    def _render_on_gpu(self) -> np.ndarray:
+        """
+        Renders a frame with the cuda kernel (see capture_frame) and returns it
+        """
+        stats: SceneStats = super().__getattribute__('_stats')
+        with stats._stage('transfer_to_gpu'):
+            self._transfer_to_gpu()
+        blocks_per_grid = self._render_resolution()
+        threads_per_block = len(super().__getattribute__('_sphere_table'))
         device_output_frame = super().__getattribute__('_device_output_frame')
-        render_image[blocks_per_grid, threads_per_block](
-            super().__getattribute__('_device_background_colour'),
-            super().__getattribute__('_device_camera'),
-            super().__getattribute__('_device_rays'),
-            super().__getattribute__('_device_light'),
-            super().__getattribute__('_device_spheres'),
-            super().__getattribute__('_device_other_data'),
-            device_output_frame
-        )
-        frame = device_output_frame.copy_to_host()
-        self._add_frame_to_frames(frame)
+        device_counters = super().__getattribute__('_device_counters')
+        if stats.enabled:
+            device_counters.copy_to_device(np.zeros(shape=(3,), dtype='float64'))
+        with stats._stage('kernel'):
+            render_image[blocks_per_grid, threads_per_block](
+                super().__getattribute__('_device_background_colour'),
+                super().__getattribute__('_device_camera'),
+                super().__getattribute__('_device_rays'),
+                super().__getattribute__('_device_light'),
+                super().__getattribute__('_device_spheres'),
+                super().__getattribute__('_device_sphere_materials'),
+                super().__getattribute__('_device_materials'),
+                super().__getattribute__('_device_shadow_casters'),
+                super().__getattribute__('_device_tile_masks'),
+                super().__getattribute__('_device_other_data'),
+                device_output_frame,
+                device_counters,
+                super().__getattribute__('_device_diagnostics'),
+                super().__getattribute__('_device_occluders'),
+                super().__getattribute__('_device_first_hits')
+            )
+            if stats.enabled:
+                cuda.synchronize()
+        quantize_frame = _OUTPUT_FORMATS[self.output_format]
+        if quantize_frame is not None:
+            device_quantized_frame = super().__getattribute__('_device_quantized_frame')
+            blocks_per_grid, threads_per_block = quantize_blocks(blocks_per_grid)
+            with stats._stage('quantize'):
+                quantize_frame[blocks_per_grid, threads_per_block](device_output_frame, device_quantized_frame)
+                if stats.enabled:
+                    cuda.synchronize()
+            device_output_frame = device_quantized_frame
+        host_frame = super().__getattribute__('_host_frame')
+        with stats._stage('copy_to_host'):
+            # Copied through the page-locked host frame (faster to copy from the gpu) into a new array
+            device_output_frame.copy_to_host(host_frame)
+            if host_frame.dtype == self.output_format:
+                frame = np.array(host_frame)
+        if host_frame.dtype != self.output_format:
+            with stats._stage('quantize'):
+                # float16 frames are converted on the host (see _OUTPUT_FORMATS)
+                frame = host_frame.astype(self.output_format)
+        stats._add_bytes('output_frame', host_frame.nbytes, to_device=False)
+        if stats.enabled:
+            stats._set_counters(*device_counters.copy_to_host())
+            stats._add_bytes('counters', device_counters.nbytes, to_device=False)
+        if super().__getattribute__('_diagnostics_enabled'):
+            with stats._stage('copy_diagnostics_to_host'):
+                diagnostics = super().__getattribute__('_device_diagnostics').copy_to_host()
+            super().__setattr__('_diagnostics', diagnostics)
+            stats._add_bytes('diagnostics', diagnostics.nbytes, to_device=False)
+        return frame
+
+    def _render_on_cpu(self) -> np.ndarray:
+        """
+        Renders a frame with the cpu backend (see set_backend) and returns it. The frame is quantized the same way
+        as on the gpu
+        """
+        stats: SceneStats = super().__getattribute__('_stats')
+        with stats._stage('encode_host'):
+            host_scene = self._transfer_to_host()
+        resolution = self._render_resolution()
+        diagnostics_enabled: bool = super().__getattribute__('_diagnostics_enabled')
+        output_frame = np.empty(shape=resolution + (3,), dtype='float32')
+        counters = np.zeros(shape=(3,), dtype='float64')
+        diagnostics = np.empty(shape=(resolution if diagnostics_enabled else (1, 1)) + (4,), dtype='int32')
+        with stats._stage('kernel'):
+            with PARALLEL_LOCK:
+                render_image_cpu(
+                    host_scene['background_colour'],
+                    host_scene['camera_location'],
+                    host_scene['rays'],
+                    host_scene['lights'],
+                    host_scene['spheres'],
+                    host_scene['sphere_materials'],
+                    host_scene['materials'],
+                    len(super().__getattribute__('_sphere_table')),
+                    host_scene['other_data'],
+                    output_frame,
+                    counters,
+                    diagnostics,
+                    host_scene['occluders'],
+                    host_scene['first_hits']
+                )
+        frame = output_frame
+        if self.output_format != 'float32':
+            with stats._stage('quantize'):
+                # float32 values * 255 truncated to uint8, as quantize_frame_uint8 does
+                frame = (output_frame * 255 if self.output_format == 'uint8' else output_frame).astype(
+                    self.output_format
+                )
+        if stats.enabled:
+            stats._set_counters(*counters)
+        if diagnostics_enabled:
+            super().__setattr__('_diagnostics', diagnostics)
         return frame
 
     def _check_scene(self):
@@ -342,21 +1489,27 @@ class _SceneInterface:
         """
         errors = []
         camera: bool = '_camera' in self
-        light: bool = '_light' in self
-        number_of_spheres: int = len([i for i, j in self.items() if i not in self._SPECIAL_NAMES])
+        number_of_lights: int = len(self.light_names)
+        number_of_spheres: int = len(super().__getattribute__('_sphere_table'))
 
         if not camera:
             errors.append(f'Camera is not defined')
-        if not light:
+        if not number_of_lights:
             errors.append(f'Light is not defined')
+        elif number_of_lights > MAX_LIGHTS:
+            errors.append(f'The maximum number of lights is {MAX_LIGHTS} (current = {number_of_lights})')
         if not number_of_spheres:
             errors.append(f'No objects to render')
-        elif number_of_spheres > 512:
-            errors.append(f'The maximum number of spheres is 512 (current = {number_of_spheres})')
+        elif self.backend == 'cuda' and number_of_spheres > MAX_SPHERES:
+            # The cpu backend has no limit (see engine.render_image_cpu)
+            errors.append(
+                f'The maximum number of spheres of the cuda backend is {MAX_SPHERES} (current = {number_of_spheres})'
+            )
 
         if errors:
             raise SceneError('\n'.join(errors))
 
+    @_synchronised
     def de_register_object(self, object_name: str):
         """
         De-registers an object given its name
@@ -364,9 +1517,25 @@ class _SceneInterface:
         directory: dict = super().__getattribute__('_object_directory')
         if object_name not in directory:
             raise KeyError(f'Given name "{object_name}" is not registered')
-        self._assign_updated(directory[object_name])
+        sphere_table: SphereTable = super().__getattribute__('_sphere_table')
+        if object_name in sphere_table:
+            sphere_table.remove(object_name)
+            super().__setattr__('_spheres_updated', True)
+        else:
+            self._assign_updated(directory[object_name])
         del directory[object_name]
 
+    def _clear_objects(self):
+        """
+        De-registers every object (without creating the Sphere objects of trusted spheres, see load)
+        """
+        super().__getattribute__('_object_directory').clear()
+        super().__getattribute__('_sphere_table').clear()
+        super().__setattr__('_camera_updated', True)
+        super().__setattr__('_light_updated', True)
+        super().__setattr__('_spheres_updated', True)
+
+    @_synchronised
     def de_register_objects(self, object_names: List[str]):
         """
         De-registers multiple objects to the global_directory
@@ -386,6 +1555,7 @@ class _SceneInterface:
                 self.register_object(object_item)
             raise
 
+    @_synchronised
     def register_objects(self, object_items: List['BaseObject']):
         """
         Registers multiple objects to the global_directory
@@ -400,32 +1570,37 @@ class _SceneInterface:
                 self.de_register_object(name)
             raise
 
+    @_synchronised
     def register_object(self, object_item: 'BaseObject'):
         """
-        Registers an object to the global directory
+        Registers an object to the global directory, binding it to this scene. Raises a ValueError if the object is
+        still registered to another scene
         """
-        from Objects import BaseObject, MetaObjects
+        from Objects import BaseObject
         if not isinstance(object_item, BaseObject):
             raise TypeError(f'Objects being registered must be an instance of a child of Objects.BaseObject')
-        if object_item.__class__ is MetaObjects.Camera:
-            self._check_resolution(object_item.resolution)
+        bound_scene: '_SceneInterface' = object_item._scene
+        if bound_scene is not None and bound_scene is not self and bound_scene._holds(object_item):
+            raise ValueError(f'Object "{object_item.name}" is registered to another scene (de-register it first)')
         self._check_name(object_item.name, object_class=object_item.__class__)
         directory: dict = super().__getattribute__('_object_directory')
         directory[object_item.name] = object_item
+        batch_registered: Optional[list] = super().__getattribute__('_batch_registered')
+        if batch_registered is not None:
+            batch_registered.append((object_item, bound_scene))  # De-registered if the batch is rolled back
+        object_item._scene = self
         self._assign_updated(object_item)
 
-    def _check_resolution(self, resolution):
+    def _holds(self, object_item: 'BaseObject') -> bool:
         """
-        Checks that the resolution of the given camera is correct
+        Returns True if the object itself (not just an object of the same name) is registered to this scene
         """
-        res = self.__class__._RESOLUTION
-        if res is not None:
-            if res != resolution:
-                raise ValueError(f'The camera resolution is invalid (received {resolution}, expecting {res})')
+        return super().__getattribute__('_object_directory').get(object_item.name) is object_item
 
     def _check_name(self, name, object_class):
         """
-        Checks that the name is unique. Special names "_camera" and "_light" for the camera and light objects
+        Checks that the name is unique. Special names "_camera" for the camera and "_light..." (e.g. "_light",
+        "_light2") for the light objects
         """
         from Objects.MetaObjects import Light, Camera
         directory: dict = super().__getattribute__('_object_directory')
@@ -433,13 +1608,18 @@ class _SceneInterface:
             raise ValueError(f'Given name "{name}" already exists')
         if object_class is Camera and name != '_camera':
             raise ValueError(f'Camera name must be "_camera"')
-        elif object_class is Light and name != '_light':
-            raise ValueError(f'Light name must be "_light"')
+        elif object_class is Light and not name.startswith('_light'):
+            raise ValueError(f'Light name must start with "_light"')
+        elif object_class is not Light and name.startswith('_light'):
+            raise ValueError(f'Names starting with "_light" are reserved for lights')
 
+    @_synchronised
     def _assign_updated(self, object_item: Union['BaseObject', '_AutoNumpyUpdate']):
         """
-        Assign updated when required
+        Assign updated when required (deferred to the end of the batch inside scene.batch)
         """
+        if self._touch(object_item):
+            return
         from Objects.MetaObjects import Light, Camera
         from Objects.SolidObjects import Sphere
         if object_item.name in self:
@@ -448,6 +1628,9 @@ class _SceneInterface:
             elif object_item.__class__ is Light:
                 super().__setattr__('_light_updated', True)
             elif object_item.__class__ is Sphere:
+                # Only the registered object is encoded (not a de-registered sphere of the same name)
+                if super().__getattribute__('_object_directory')[object_item.name] is object_item:
+                    super().__getattribute__('_sphere_table').set(object_item.name, self._encode_sphere(object_item))
                 super().__setattr__('_spheres_updated', True)
 
     @property
@@ -457,11 +1640,92 @@ class _SceneInterface:
 
     @property
     def eps(self) -> float:
-        return self._EPS
+        return super().__getattribute__('_eps')
 
     @property
     def reflect(self) -> float:
-        return self._MAX_REFLECTIONS
+        return super().__getattribute__('_max_reflections')
+
+    @property
+    def output_format(self) -> str:
+        return super().__getattribute__('_output_format')
+
+    @property
+    def diagnostics(self) -> Union[np.ndarray, None]:
+        """
+        The per-pixel diagnostics of the last rendered frame (None unless enabled with set_diagnostics).
+        An int32 array of shape (h, w, 4) (the resolution rendered, lower for preview frames) holding, for each pixel:
+            [..., 0] the number of bounces (rays traced)
+            [..., 1] the number of sphere intersection tests
+            [..., 2] the number of shadow intersection tests
+            [..., 3] the index (in sphere_names) of the first sphere hit, -1 if none
+        """
+        return super().__getattribute__('_diagnostics')
+
+    @property
+    def sphere_names(self) -> List[str]:
+        """
+        The names of the registered spheres, in the order they are encoded (and indexed by the kernel)
+        """
+        return super().__getattribute__('_sphere_table').names
+
+    @property
+    def light_names(self) -> List[str]:
+        """
+        The names of the registered lights, in the order they are encoded (and indexed by the kernel)
+        """
+        return [name for name in super().__getattribute__('_object_directory') if name.startswith('_light')]
+
+    @property
+    def backend(self) -> str:
+        return super().__getattribute__('_backend')
+
+    @property
+    def primary_visibility(self) -> str:
+        """
+        How the first hits of the primary rays are found, "trace" or "raster" (see set_primary_visibility)
+        """
+        return super().__getattribute__('_primary_visibility')
+
+    @property
+    def light_cutoff(self) -> float:
+        return super().__getattribute__('_light_cutoff')
+
+    @property
+    def contribution_cutoff(self) -> float:
+        return super().__getattribute__('_contribution_cutoff')
+
+    @property
+    def preview_quality(self) -> Optional[PreviewQuality]:
+        """
+        The quality the last frame was rendered at by capture_frame(budget_ms=...): its resolution scale, max
+        reflections, contribution cutoff and soft shadow samples (None at the full quality)
+        """
+        return super().__getattribute__('_preview')
+
+    @property
+    def soft_shadow_samples(self) -> Tuple[int, int]:
+        """
+        The initial and total number of shadow samples of area lights (see set_soft_shadow_samples)
+        """
+        return super().__getattribute__('_soft_shadow_samples')
+
+    @property
+    def buffer_pool(self) -> BufferPool:
+        """
+        The pool of the frame sized gpu and host buffers, grouped by resolution (see set_buffer_pool_limit)
+        """
+        return super().__getattribute__('_buffer_pool')
+
+    @property
+    def stats(self) -> SceneStats:
+        """
+        The instrumentation of the last captured frames (see enable_stats)
+        """
+        return super().__getattribute__('_stats')
+
 
+# The public name of the class, to create scenes other than the default one
+Scene = _SceneInterface
 
 scene = _SceneInterface()
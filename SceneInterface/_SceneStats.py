@@ -0,0 +1,182 @@
+import json
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+# Returned by SceneStats._stage when disabled, so instrumented code only pays for a method call
+_NULL_STAGE = nullcontext()
+
+
+class SceneStats:
+    """
+    Keeps per-frame instrumentation of scene.capture_frame for the last <history> frames. Disabled by default
+    (see scene.enable_stats), in which case recording is close to free.
+    Each frame record is a dict with the keys:
+        frame:
+            the number of the frame (counting from when stats were enabled)
+        timestamp:
+            the time (seconds since epoch) the frame was captured at
+        identical:
+            True if the frame was a duplicate of the last frame (nothing was rendered)
+        stages_ms:
+            the wall time (milliseconds) of each stage. Stages may nest: "transfer_to_gpu" includes
+            "construct_rays", "encode_light", "encode_spheres", "encode_shadow_casters" and "encode_tiles" (with
+            the cpu backend, "encode_host" includes "construct_rays", "encode_light" and "encode_spheres").
+            "publish" is the copy of the frame into the ring of the frame publisher (see scene.set_frame_publisher)
+        bytes_to_device / bytes_to_host:
+            the number of bytes copied, per buffer
+        counters:
+            "rays" (camera and reflected rays traced), "shadow_rays" and "intersection_tests" (ray-sphere tests)
+        preview:
+            the quality of a preview frame (see scene.capture_frame(budget_ms=...)) as a dict of its "scale",
+            "reflect", "contribution_cutoff" and "soft_shadow_samples", None at the full quality. "upscale" is
+            the stage upscaling a preview frame to the camera resolution
+    """
+    def __init__(self, history: int = 100):
+        self._enabled: bool = False
+        self._frames: Deque[dict] = deque(maxlen=history)
+        self._current: Optional[dict] = None
+        self._frame_number: int = 0
+        self._callbacks: List[Callable[[dict], None]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    @property
+    def frames(self) -> List[dict]:
+        """
+        The records of the last frames (oldest first)
+        """
+        return list(self._frames)
+
+    @property
+    def last(self) -> Optional[dict]:
+        """
+        The record of the last frame (None if no frame has been recorded)
+        """
+        return self._frames[-1] if self._frames else None
+
+    def _enable(self, history: Optional[int] = None):
+        if history is not None:
+            if history < 1:
+                raise ValueError(f'history must be at least 1')
+            self._frames = deque(self._frames, maxlen=history)
+        self._enabled = True
+
+    def _disable(self):
+        self._enabled = False
+        self._current = None
+
+    def clear(self):
+        """
+        Deletes the recorded frames
+        """
+        self._frames.clear()
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Returns the mean wall time (milliseconds) of each stage over the recorded frames
+        """
+        totals: Dict[str, List[float]] = {}
+        for record in self._frames:
+            for stage, duration in record['stages_ms'].items():
+                totals.setdefault(stage, []).append(duration)
+        return {stage: sum(durations) / len(durations) for stage, durations in totals.items()}
+
+    def register_callback(self, callback: Callable[[dict], None]):
+        """
+        Registers a function called with the record of every frame once it is captured
+        """
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[dict], None]):
+        """
+        Removes a function registered with register_callback
+        """
+        self._callbacks.remove(callback)
+
+    def export(self, path: str):
+        """
+        Writes the recorded frames to path as json (a list of frame records, oldest first)
+        """
+        with open(path, 'w') as file:
+            json.dump(self.frames, file, indent=2)
+
+    @staticmethod
+    def json_lines_callback(path: str) -> Callable[[dict], None]:
+        """
+        Returns a callback (see register_callback) appending every frame record to path as a line of json
+        """
+        def write(record: dict):
+            with open(path, 'a') as file:
+                file.write(json.dumps(record) + '\n')
+        return write
+
+    def _begin_frame(self):
+        if not self._enabled:
+            return
+        self._current = {
+            'frame': self._frame_number,
+            'timestamp': time.time(),
+            'identical': False,
+            'stages_ms': {},
+            'bytes_to_device': {},
+            'bytes_to_host': {},
+            'counters': {},
+            'preview': None,
+        }
+
+    def _end_frame(self, identical: bool = False):
+        record = self._current
+        if record is None:
+            return
+        self._current = None
+        record['identical'] = identical
+        self._frame_number += 1
+        self._frames.append(record)
+        for callback in self._callbacks:
+            callback(record)
+
+    def _stage(self, name: str):
+        """
+        Returns a context manager timing the enclosed code as the given stage of the current frame
+        """
+        if self._current is None:
+            return _NULL_STAGE
+        return self._timed_stage(name)
+
+    @contextmanager
+    def _timed_stage(self, name: str) -> Iterator[None]:
+        record = self._current
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stages = record['stages_ms']
+            stages[name] = stages.get(name, 0.) + (time.perf_counter() - start) * 1000
+
+    def _add_bytes(self, buffer: str, nbytes: int, to_device: bool = True):
+        if self._current is None:
+            return
+        transfers = self._current['bytes_to_device' if to_device else 'bytes_to_host']
+        transfers[buffer] = transfers.get(buffer, 0) + int(nbytes)
+
+    def _set_preview(self, preview: Optional[tuple]):
+        if self._current is None:
+            return
+        self._current['preview'] = None if preview is None else {
+            'scale': preview.scale,
+            'reflect': int(preview.reflect),
+            'contribution_cutoff': preview.contribution_cutoff,
+            'soft_shadow_samples': list(preview.soft_shadow_samples),
+        }
+
+    def _set_counters(self, rays: int, shadow_rays: int, intersection_tests: int):
+        if self._current is None:
+            return
+        # Added up over the tiles of a tiled frame (see scene.render_tiled)
+        counters = self._current['counters']
+        for name, count in (('rays', rays), ('shadow_rays', shadow_rays), ('intersection_tests', intersection_tests)):
+            counters[name] = counters.get(name, 0) + int(count)
@@ -0,0 +1,78 @@
+import numpy as np
+from engine import TILE_SIZE
+
+# The number of spheres a tile mask holds (one bit per sphere, see engine.render_image)
+_MASK_WORDS = 512 // 32
+# Angular margin (radians) absorbing the float32 rounding of the rays and spheres
+_MARGIN = 1e-4
+
+
+class ScreenTiles:
+    """
+    The screen of a camera cut into tiles of TILE_SIZE by TILE_SIZE pixels, each bounded by the cone (seen from the
+    camera) containing the primary rays of its pixels. A sphere whose cone does not overlap the cone of a tile cannot
+    be the first hit of any of its pixels, so the kernel only tests the candidate spheres of a tile (see candidates)
+    for primary rays, and fills the tiles without candidates with the background colour straight away.
+    The tile cones only depend on the camera, so they are computed when the camera changes, and the candidates are
+    recomputed when the spheres change
+    Args:
+        rays:
+            the unit primary rays of the camera, shape (h, w, 3) (see Camera._construct_rays)
+    """
+    def __init__(self, rays: np.ndarray):
+        height, width = rays.shape[:2]
+        self._shape = (-(-height // TILE_SIZE), -(-width // TILE_SIZE))
+        # The rays of the pixels beyond the edges of the screen (in the last row/column of tiles) are nan
+        padded = np.full(shape=(self._shape[0] * TILE_SIZE, self._shape[1] * TILE_SIZE, 3), fill_value=np.nan)
+        padded[:height, :width] = rays
+        tiles = padded.reshape(self._shape[0], TILE_SIZE, self._shape[1], TILE_SIZE, 3).swapaxes(1, 2)
+        tiles = tiles.reshape(self._shape + (TILE_SIZE * TILE_SIZE, 3))
+        axes = np.nanmean(tiles, axis=2)
+        axes /= np.linalg.norm(axes, axis=-1, keepdims=True)
+        cosines = np.nanmin(np.einsum('xyrc,xyc->xyr', tiles, axes), axis=2)
+        radii = np.arccos(np.clip(cosines, -1, 1)) + _MARGIN
+        self._axes = axes.reshape(-1, 3)
+        self._radii = radii.reshape(-1)
+
+    @property
+    def shape(self):
+        """
+        The number of tiles along the height and width of the screen
+        """
+        return self._shape
+
+    def candidates(
+            self,
+            camera_location: np.ndarray,
+            sphere_geometry: np.ndarray,
+            number_of_spheres: int
+    ) -> np.ndarray:
+        """
+        Returns the candidate spheres of every tile, as a uint32 array of shape (th, tw, 16): bit s % 32 of word
+        s // 32 of a tile is set if sphere s may be the first hit of a primary ray of the tile. Spheres containing
+        the camera are candidates of every tile
+        Args:
+            camera_location:
+                the location of the camera, shape (3,)
+            sphere_geometry:
+                the [x, y, z, radius] of the spheres, shape (>= number_of_spheres, 4) (see SphereTable.geometry)
+            number_of_spheres:
+                the number of spheres in use (the other rows are padding)
+        """
+        offsets = sphere_geometry[:number_of_spheres, :3].astype('float64') - camera_location.astype('float64')
+        radii = sphere_geometry[:number_of_spheres, 3].astype('float64')
+        distances = np.linalg.norm(offsets, axis=-1)
+        inside = distances <= radii
+        axes = offsets / np.where(distances > 0, distances, 1)[:, np.newaxis]
+        half_angles = np.arcsin(np.clip(radii / np.where(inside, 1, distances), 0, 1))
+        # angle(sphere, tile) <= half_angle + radius, i.e. cos(angle) >= cos(half_angle + radius) (always true
+        # beyond pi), without evaluating an arccos per sphere and tile
+        bounds = half_angles[:, np.newaxis] + self._radii[np.newaxis, :]
+        cos_bounds = np.outer(np.cos(half_angles), np.cos(self._radii)) - \
+            np.outer(np.sin(half_angles), np.sin(self._radii))
+        masks = np.zeros(shape=(len(self._radii), _MASK_WORDS * 32), dtype=bool)
+        masks[:, :number_of_spheres] = (
+            (axes @ self._axes.T >= cos_bounds) | (bounds >= np.pi) | inside[:, np.newaxis]
+        ).T
+        packed = np.packbits(masks, axis=-1, bitorder='little').view('<u4').astype('uint32')
+        return packed.reshape(self._shape + (_MASK_WORDS,))
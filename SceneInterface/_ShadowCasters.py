@@ -0,0 +1,94 @@
+import numpy as np
+
+# The number of cells along each side of a cube-map face
+CUBE_MAP_RESOLUTION = 8
+# The number of spheres a cell mask holds (one bit per sphere, see engine.render_image)
+_MASK_WORDS = 512 // 32
+# Angular margin (radians) absorbing the float32 rounding of the directions computed by the kernel
+_MARGIN = 1e-4
+
+
+def _cube_map_cells(resolution: int):
+    """
+    Returns the unit direction of the centre of every cube-map cell and the angle from it to the furthest corner of
+    the cell, both of shape (6, resolution, resolution, ...). Face 2 * a + (0 if positive else 1) is the face of the
+    directions whose largest component (in absolute value) is along axis a, and cell (i, j) holds the directions d
+    with d[(a + 1) % 3] / |d[a]| in the i-th and d[(a + 2) % 3] / |d[a]| in the j-th of the resolution slices of
+    [-1, 1] (the same mapping as engine.device_functions.cube_map.cube_map_cell)
+    """
+    edges = np.linspace(-1, 1, resolution + 1)
+    middles = (edges[:-1] + edges[1:]) / 2
+    centres = np.zeros(shape=(6, resolution, resolution, 3))
+    radii = np.zeros(shape=(6, resolution, resolution))
+    for face in range(6):
+        axis, sign = face // 2, -1 if face % 2 else 1
+        u, v = np.meshgrid(middles, middles, indexing='ij')
+        centre = np.zeros(shape=(resolution, resolution, 3))
+        centre[..., axis] = sign
+        centre[..., (axis + 1) % 3] = u
+        centre[..., (axis + 2) % 3] = v
+        centre /= np.linalg.norm(centre, axis=-1, keepdims=True)
+        for du in (0, 1):
+            for dv in (0, 1):
+                corner = np.zeros(shape=(resolution, resolution, 3))
+                corner[..., axis] = sign
+                corner[..., (axis + 1) % 3] = edges[du:resolution + du][:, np.newaxis]
+                corner[..., (axis + 2) % 3] = edges[dv:resolution + dv][np.newaxis, :]
+                corner /= np.linalg.norm(corner, axis=-1, keepdims=True)
+                angle = np.arccos(np.clip(np.sum(centre * corner, axis=-1), -1, 1))
+                radii[face] = np.maximum(radii[face], angle)
+        centres[face] = centre
+    return centres, radii
+
+
+_CELL_CENTRES, _CELL_RADII = _cube_map_cells(CUBE_MAP_RESOLUTION)
+
+
+def build_shadow_casters(
+        lights_encoded: np.ndarray,
+        sphere_geometry: np.ndarray,
+        number_of_spheres: int,
+        eps: float = 0.
+) -> np.ndarray:
+    """
+    Builds the light-space shadow caster masks: for every light, a cube-map of its surrounding directions where each
+    cell holds the set of spheres whose cone (seen from the light) overlaps the cell. A sphere can only block a
+    shadow ray towards the light if the direction from the light to the ray origin lies in its cone, so the kernel
+    only tests the spheres of the cell of that direction.
+    Cones are bounded conservatively (cell centre to corner angle plus a margin), so culling never changes a frame
+    Args:
+        lights_encoded:
+            the encoded lights, shape (l, 5, 3) (see _SceneInterface._encoded_lights)
+        sphere_geometry:
+            the [x, y, z, radius] of the spheres, shape (>= number_of_spheres, 4) (see SphereTable.geometry)
+        number_of_spheres:
+            the number of spheres in use (the other rows are padding)
+        eps:
+            the distance the spheres are grown by. A shadow ray starts eps away from the surface hit (along the
+            normal), so the spheres it meets are within eps of the segment from the point hit to the light.
+            The spheres are also grown by the radius of each area light: a shadow ray towards a point of the light
+            stays within that radius of the segment to its centre, whose direction picks the cell
+    Returns:
+        a uint32 array of shape (l, 6, r, r, 16) where r is CUBE_MAP_RESOLUTION. Bit s % 32 of word s // 32 of
+        a cell is set if sphere s may block the shadow rays of the directions of the cell
+    """
+    number_of_lights = len(lights_encoded)
+    centres = sphere_geometry[:number_of_spheres, :3].astype('float64')
+    sphere_radii = sphere_geometry[:number_of_spheres, 3].astype('float64') + eps
+    cell_centres = _CELL_CENTRES.reshape(-1, 3)
+    cell_radii = _CELL_RADII.reshape(-1)
+    masks = np.zeros(shape=(number_of_lights, cell_centres.shape[0], _MASK_WORDS * 32), dtype=bool)
+    for light in range(number_of_lights):
+        radii = sphere_radii + float(lights_encoded[light, 4, 2])
+        offsets = centres - lights_encoded[light, 0].astype('float64')
+        distances = np.linalg.norm(offsets, axis=-1)
+        inside = distances <= radii  # the light is inside the sphere: every direction is blocked
+        axes = offsets / np.where(distances > 0, distances, 1)[:, np.newaxis]
+        half_angles = np.where(inside, np.pi, np.arcsin(np.clip(radii / np.where(inside, 1, distances), 0, 1)))
+        angles = np.arccos(np.clip(axes @ cell_centres.T, -1, 1))
+        masks[light, :, :number_of_spheres] = (
+            angles <= half_angles[:, np.newaxis] + cell_radii[np.newaxis, :] + _MARGIN
+        ).T
+    resolution = CUBE_MAP_RESOLUTION
+    packed = np.packbits(masks, axis=-1, bitorder='little').view('<u4').astype('uint32')
+    return packed.reshape(number_of_lights, 6, resolution, resolution, _MASK_WORDS)
@@ -0,0 +1,232 @@
+import numpy as np
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+from ._MaterialTable import MaterialTable
+
+# The number of rows of the encoded arrays passed to the kernel (see _SceneInterface._encode_spheres)
+_MIN_CAPACITY = 512
+
+
+class SphereTable:
+    """
+    The host encoder buffer of the spheres: one slot per registered sphere, in registration order (the order the
+    kernel indexes them by). A slot holds the geometry of the sphere ([x, y, z, radius], the only data the
+    intersection tests read) and the id of its material in the deduplicated material table (see MaterialTable), so
+    spheres of the same colours share one material row.
+    Spheres are encoded into their slot as they are registered/updated, so encoding a frame costs nothing, and
+    trusted scene files (see scene.load) are written straight into the buffers without creating Sphere objects.
+    The slots written since the buffers were last copied to the gpu are tracked (see take_dirty_ranges), so only
+    those are copied
+    """
+    def __init__(self):
+        self._names: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._geometry: np.ndarray = np.zeros(shape=(_MIN_CAPACITY, 4), dtype='float32')
+        self._material_ids: np.ndarray = np.zeros(shape=(_MIN_CAPACITY,), dtype='int32')
+        self._materials: MaterialTable = MaterialTable()
+        self._dirty: Optional[Set[int]] = None  # None: every slot is dirty
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._slots
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    @property
+    def geometry(self) -> np.ndarray:
+        """
+        The [x, y, z, radius] of the spheres, padded with zeros (radius 0) to at least 512 rows
+        """
+        return self._geometry[:max(len(self._names), _MIN_CAPACITY)]
+
+    @property
+    def material_ids(self) -> np.ndarray:
+        """
+        The material id of each sphere (a row of materials), padded with zeros to at least 512 rows
+        """
+        return self._material_ids[:max(len(self._names), _MIN_CAPACITY)]
+
+    @property
+    def materials(self) -> MaterialTable:
+        return self._materials
+
+    def record(self, name: str) -> np.ndarray:
+        """
+        Returns the encoded record of a sphere, shape (5, 3) (see _SceneInterface._encode_sphere)
+        """
+        slot = self._slots[name]
+        return _record(self._geometry[slot], self._materials.encoded[self._material_ids[slot]])
+
+    def set(self, name: str, record: np.ndarray) -> int:
+        """
+        Writes the encoded record (shape (5, 3)) of a sphere to its slot (a new slot is appended for unknown names).
+        Returns the slot
+        """
+        material_id = self._materials.acquire(_material(record))
+        slot = self._slots.get(name)
+        if slot is None:
+            slot = len(self._names)
+            self._reserve(slot + 1)
+            self._names.append(name)
+            self._slots[name] = slot
+        else:
+            # Released after the new material is acquired, so an unchanged material keeps its row
+            self._materials.release(int(self._material_ids[slot]))
+        self._geometry[slot] = _geometry(record)
+        self._material_ids[slot] = material_id
+        self._mark_dirty(slot, slot + 1)
+        return slot
+
+    def set_many(self, names: List[str], records: np.ndarray) -> None:
+        """
+        Writes the encoded records (shape (n, 5, 3)) of several spheres to their slots at once (see set). Only the
+        spheres whose material changed go through the material table
+        """
+        known = np.array([name in self._slots for name in names], dtype=bool)
+        for i in np.flatnonzero(~known):
+            self.set(names[i], records[i])
+        if not known.any():
+            return
+        records = records[known]
+        slots = np.array([self._slots[name] for name, is_known in zip(names, known) if is_known])
+        self._geometry[slots, :3] = records[:, 0]
+        self._geometry[slots, 3] = records[:, 4, 2]
+        materials = np.zeros(shape=(len(slots), 4, 3), dtype='float32')
+        materials[:, :3] = records[:, 1:4]
+        materials[:, 3, :2] = records[:, 4, :2]
+        current = self._materials.encoded[self._material_ids[slots]]
+        for i in np.flatnonzero((materials != current).reshape(len(slots), -1).any(axis=1)):
+            material_id = self._materials.acquire(materials[i])
+            self._materials.release(int(self._material_ids[slots[i]]))
+            self._material_ids[slots[i]] = material_id
+        if self._dirty is not None:
+            self._dirty.update(slots.tolist())
+
+    def remove(self, name: str) -> None:
+        """
+        Removes the slot of a sphere. The following slots are moved down one row, so the registration order is kept
+        """
+        slot = self._slots.pop(name)
+        count = len(self._names)
+        self._materials.release(int(self._material_ids[slot]))
+        for buffer in (self._geometry, self._material_ids):
+            buffer[slot:count - 1] = buffer[slot + 1:count]
+            buffer[count - 1] = 0
+        del self._names[slot]
+        for moved in self._names[slot:]:
+            self._slots[moved] -= 1
+        self._mark_dirty(slot, count)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def load(self, names: List[str], columns: Mapping[str, np.ndarray]) -> None:
+        """
+        Replaces every slot with the given spheres. columns holds the sphere columns of a scene file (see
+        SceneInterface._SceneFile) and may be memory-mapped: each column is copied straight into the buffers, and
+        the materials are deduplicated at once
+        """
+        count = len(names)
+        self._names = list(names)
+        self._slots = dict(zip(self._names, range(count)))
+        capacity = max(count, _MIN_CAPACITY)
+        self._geometry = np.zeros(shape=(capacity, 4), dtype='float32')
+        self._geometry[:count, :3] = columns['sphere_coordinates']
+        self._geometry[:count, 3] = columns['sphere_radius']
+        materials = np.zeros(shape=(count, 4, 3), dtype='float32')
+        for row, column in enumerate(('ambient', 'diffuse', 'specular')):
+            materials[:, row] = columns[f'sphere_{column}']
+        for axis, column in enumerate(('shine', 'reflect')):
+            materials[:, 3, axis] = columns[f'sphere_{column}']
+        self._material_ids = np.zeros(shape=(capacity,), dtype='int32')
+        self._material_ids[:count] = self._materials.load(materials)
+        self._dirty = None
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """
+        Returns the sphere columns of a scene file (the inverse of load)
+        """
+        count = len(self._names)
+        materials = self._materials.encoded[self._material_ids[:count]]
+        columns = {
+            'sphere_coordinates': self._geometry[:count, :3],
+            'sphere_radius': self._geometry[:count, 3],
+        }
+        columns.update({
+            f'sphere_{column}': materials[:, row]
+            for row, column in enumerate(('ambient', 'diffuse', 'specular'))
+        })
+        columns.update({
+            f'sphere_{column}': materials[:, 3, axis]
+            for axis, column in enumerate(('shine', 'reflect'))
+        })
+        columns['sphere_names'] = np.array(self._names, dtype='U')
+        return columns
+
+    def take_dirty_ranges(self) -> Optional[List[Tuple[int, int]]]:
+        """
+        Returns the (start, stop) ranges of the slots written since the last call, merged and sorted (None if every
+        slot must be copied, e.g. after load or when the buffers grew), and marks every slot clean
+        """
+        dirty, self._dirty = self._dirty, set()
+        if dirty is None:
+            return None
+        ranges = []
+        for slot in sorted(dirty):
+            if ranges and ranges[-1][1] == slot:
+                ranges[-1][1] = slot + 1
+            else:
+                ranges.append([slot, slot + 1])
+        return [(start, stop) for start, stop in ranges]
+
+    def _mark_dirty(self, start: int, stop: int) -> None:
+        if self._dirty is not None:
+            self._dirty.update(range(start, stop))
+
+    def _reserve(self, count: int) -> None:
+        """
+        Grows the buffers (doubling their capacity) so they hold at least count slots
+        """
+        capacity = len(self._geometry)
+        if count <= capacity:
+            return
+        while capacity < count:
+            capacity *= 2
+        geometry = np.zeros(shape=(capacity, 4), dtype='float32')
+        geometry[:len(self._names)] = self._geometry[:len(self._names)]
+        material_ids = np.zeros(shape=(capacity,), dtype='int32')
+        material_ids[:len(self._names)] = self._material_ids[:len(self._names)]
+        self._geometry = geometry
+        self._material_ids = material_ids
+        self._dirty = None
+
+
+def _geometry(record: np.ndarray) -> np.ndarray:
+    """
+    Returns the [x, y, z, radius] of an encoded sphere record
+    """
+    return np.append(record[0], record[4][2])
+
+
+def _material(record: np.ndarray) -> np.ndarray:
+    """
+    Returns the material (ambient, diffuse, specular and [shine, reflect, 0]) of an encoded sphere record
+    """
+    material = np.zeros(shape=(4, 3), dtype='float32')
+    material[:3] = record[1:4]
+    material[3, :2] = record[4][:2]
+    return material
+
+
+def _record(geometry: np.ndarray, material: np.ndarray) -> np.ndarray:
+    """
+    Returns the encoded sphere record of a geometry and a material (the inverse of _geometry and _material)
+    """
+    record = np.zeros(shape=(5, 3), dtype='float32')
+    record[0] = geometry[:3]
+    record[1:4] = material[:3]
+    record[4] = [material[3][0], material[3][1], geometry[3]]
+    return record
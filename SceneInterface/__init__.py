@@ -1 +1 @@
-from ._SceneInterface import scene
+from ._SceneInterface import scene, Scene
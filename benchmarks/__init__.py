@@ -0,0 +1 @@
+from .runner import run_benchmarks, BACKENDS, SCENARIOS
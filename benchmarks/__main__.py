@@ -0,0 +1,63 @@
+import argparse
+import json
+import sys
+from .runner import run_benchmarks, BACKENDS, SCENARIOS
+
+
+def _resolution(value: str):
+    height, width = value.lower().split('x')
+    return int(height), int(width)
+
+
+def _still(value: str):
+    scenario, reflect = value.split(':')
+    return scenario, int(reflect)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Runs the synthetic and scenario benchmarks and reports the results as json'
+    )
+    parser.add_argument('--spheres', type=int, nargs='*', default=[10, 100, 500],
+                        help='the sphere counts of the synthetic workloads')
+    parser.add_argument('--resolution', type=_resolution, default=(540, 960),
+                        help='the resolution of the synthetic workloads, as HEIGHTxWIDTH')
+    parser.add_argument('--reflect', type=int, default=3, help='the max reflections of the synthetic workloads')
+    parser.add_argument('--planes', type=int, default=1, help='the number of flat surfaces (0 to 6)')
+    parser.add_argument('--frames', type=int, default=20, help='the number of timed frames per synthetic workload')
+    parser.add_argument('--scenarios', nargs='*', default=list(SCENARIOS), choices=list(SCENARIOS),
+                        help='the scenarios to run headless')
+    parser.add_argument('--stills', type=_still, nargs='*', default=[('8', 7)],
+                        help='the scenes rendered still, as SCENARIO:REFLECT (e.g. 8:7)')
+    parser.add_argument('--contribution-cutoffs', type=float, nargs='*', default=[0., 0.5 / 255],
+                        help='the contribution cutoffs the stills are rendered at')
+    parser.add_argument('--backends', nargs='*', default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=None, help='the maximum number of seconds per workload')
+    parser.add_argument('--output', default=None, help='the json file to write to (stdout if not given)')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(
+        sphere_counts=args.spheres,
+        resolution=args.resolution,
+        reflect=args.reflect,
+        planes=args.planes,
+        frames=args.frames,
+        scenarios=args.scenarios,
+        stills=args.stills,
+        contribution_cutoffs=args.contribution_cutoffs,
+        backends=args.backends,
+        seed=args.seed,
+        timeout=args.timeout,
+        log=lambda line: print(line, file=sys.stderr),
+    )
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
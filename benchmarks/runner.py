@@ -0,0 +1,299 @@
+import importlib
+import multiprocessing
+import platform
+import queue
+import resource
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Every workload runs in its own (spawned) process, so that each gets a fresh scene (and resolution) and its own
+# peak memory figures
+_context = multiprocessing.get_context('spawn')
+
+BACKENDS: Tuple[str, ...] = ('cuda', 'cpu')
+SCENARIOS: Dict[str, str] = {
+    '3': 'Scenarios.Scenario3',
+    '7': 'Scenarios.Scenario7',
+    '8': 'Scenarios.Scenario8',
+}
+_PERCENTILES = (50, 90, 99)
+# The interval (seconds) at which a workload process is checked for having died without a result
+_POLL_INTERVAL = 1.
+
+
+class _MemoryTracker:
+    """
+    Tracks the peak resident memory of this process and the peak device memory used since it was created
+    """
+    def __init__(self, backend: str):
+        self._backend = backend
+        self._device_baseline = self._device_used()
+        self._device_peak = self._device_baseline
+
+    def _device_used(self) -> Optional[int]:
+        if self._backend != 'cuda':
+            return None
+        from numba import cuda
+        free, total = cuda.current_context().get_memory_info()
+        return total - free
+
+    def sample(self):
+        used = self._device_used()
+        if used is not None:
+            self._device_peak = max(self._device_peak, used)
+
+    def summary(self) -> dict:
+        # ru_maxrss is in kilobytes on linux
+        device_mb = None
+        if self._device_peak is not None and np.isfinite(self._device_peak):
+            device_mb = (self._device_peak - self._device_baseline) / 2 ** 20
+        return {
+            'peak_host_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'peak_device_mb': device_mb,
+        }
+
+
+@contextmanager
+def _timed_captures(memory: _MemoryTracker) -> Iterator[List[float]]:
+    """
+    Times every scene.capture_frame call made inside the context. Yields the list the latencies (in seconds)
+    are appended to
+    """
+    from SceneInterface._SceneInterface import _SceneInterface
+    capture_frame = _SceneInterface.capture_frame
+    latencies: List[float] = []
+
+    def timed_capture_frame(self, *args, **kwargs):
+        start = time.perf_counter()
+        frame = capture_frame(self, *args, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        memory.sample()
+        return frame
+
+    _SceneInterface.capture_frame = timed_capture_frame
+    try:
+        yield latencies
+    finally:
+        _SceneInterface.capture_frame = capture_frame
+
+
+def _summarise(latencies: Sequence[float], pixels: Sequence[int]) -> dict:
+    """
+    Returns the throughput and latency statistics of the timed frames. rays_per_sec counts primary (camera)
+    rays, i.e. pixels rendered per second
+    """
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'frames': len(latencies),
+        'rays_per_sec': float(np.sum(pixels) / np.sum(latencies)),
+        'latency_ms': {
+            'mean': float(latencies_ms.mean()),
+            'min': float(latencies_ms.min()),
+            'max': float(latencies_ms.max()),
+            **{f'p{p}': float(np.percentile(latencies_ms, p)) for p in _PERCENTILES}
+        },
+    }
+
+
+def _run_synthetic(backend: str, params: dict) -> dict:
+    """
+    Renders params['frames'] frames of a synthetic scene (orbiting the camera so every frame is rendered).
+    The first frame is rendered beforehand and is not timed, as it includes the device initialisation
+    """
+    from SceneInterface import scene
+    from .synthetic import build_synthetic_scene, orbit_camera
+    scene.set_backend(backend)
+    build_synthetic_scene(
+        spheres=params['spheres'],
+        resolution=params['resolution'],
+        reflect=params['reflect'],
+        planes=params['planes'],
+        seed=params['seed'],
+    )
+    memory = _MemoryTracker(backend)
+    scene.capture_frame(record=False)
+    frames = params['frames']
+    with _timed_captures(memory) as latencies:
+        for i in range(frames):
+            orbit_camera(2 * np.pi * (i + 1) / (frames + 1))
+            scene.capture_frame(record=False)
+    height, width = params['resolution']
+    return {**_summarise(latencies, [height * width] * len(latencies)), **memory.summary()}
+
+
+def _run_scenario(backend: str, params: dict) -> dict:
+    """
+    Runs the render_scene_images function of a scenario headless (no images shown or saved), timing every frame
+    """
+    from SceneInterface import scene
+    scene.set_backend(backend)  # Kept when the scenario clears the scene
+    module = importlib.import_module(SCENARIOS[params['scenario']])
+    memory = _MemoryTracker(backend)
+    with _timed_captures(memory) as latencies:
+        frames = module.render_scene_images(save=False, show=False)
+    pixels = frames.shape[1] * frames.shape[2]
+    return {**_summarise(latencies, [pixels] * len(latencies)), **memory.summary()}
+
+
+def _run_still(backend: str, params: dict) -> dict:
+    """
+    Renders params['frames'] frames of the scene of a scenario (as loaded, nothing moves) at the given max reflections
+    and contribution cutoff. The first frame is rendered beforehand and is not timed, as it includes the device
+    initialisation
+    """
+    from SceneInterface import scene
+    from Scenarios import load_scenario
+    scene.set_backend(backend)
+    load_scenario(f"scenario{params['scenario']}", scene=scene)
+    scene.set_reflect(params['reflect'])
+    scene.set_contribution_cutoff(params['contribution_cutoff'])
+    memory = _MemoryTracker(backend)
+    frame = scene.capture_frame(record=False)
+    with _timed_captures(memory) as latencies:
+        for _ in range(params['frames']):
+            scene.set_reflect(params['reflect'])  # Nothing changed: forces the frame to be rendered again
+            scene.capture_frame(record=False)
+    pixels = frame.shape[0] * frame.shape[1]
+    return {**_summarise(latencies, [pixels] * len(latencies)), **memory.summary()}
+
+
+def _child(target: Callable, backend: str, params: dict, results: multiprocessing.Queue):
+    """
+    Entry point of the workload processes. Sends back the result, or the error if the workload failed
+    """
+    try:
+        results.put(target(backend, params))
+    except BaseException as e:
+        results.put({'error': f'{e.__class__.__name__}: {e}', 'traceback': traceback.format_exc()})
+
+
+def _run_isolated(target: Callable, backend: str, params: dict, timeout: Optional[float]) -> dict:
+    """
+    Runs a workload in a new process and returns its result. A process dying without a result (e.g. a segfault, a
+    cuda abort or an out of memory kill) is reported with its exit code
+    """
+    results = _context.Queue()
+    process = _context.Process(target=_child, args=(target, backend, params, results))
+    process.start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    result = None
+    while result is None:
+        try:
+            result = results.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            if not process.is_alive():
+                try:
+                    result = results.get(timeout=_POLL_INTERVAL)  # Put right before the process exited
+                except queue.Empty:
+                    result = {'error': f'The workload process exited with code {process.exitcode}'}
+            elif deadline is not None and time.monotonic() > deadline:
+                process.kill()
+                result = {'error': f'Timed out after {timeout} seconds'}
+    process.join()
+    return result
+
+
+def run_benchmarks(
+        sphere_counts: Sequence[int] = (10, 100, 500),
+        resolution: Tuple[int, int] = (540, 960),
+        reflect: int = 3,
+        planes: int = 1,
+        frames: int = 20,
+        scenarios: Sequence[str] = tuple(SCENARIOS),
+        stills: Sequence[Tuple[str, int]] = (('8', 7),),
+        contribution_cutoffs: Sequence[float] = (0., 0.5 / 255),
+        backends: Sequence[str] = BACKENDS,
+        seed: int = 0,
+        timeout: Optional[float] = None,
+        log: Optional[Callable[[str], None]] = None,
+) -> dict:
+    """
+    Runs the synthetic workloads (one per sphere count) and the headless scenario workloads on every backend.
+    The synthetic workloads of more spheres than the cuda backend supports (engine.MAX_SPHERES) only run on the cpu
+    backend, they are reported with a "skipped" entry on cuda. Workloads failing are reported with an "error" entry
+    Args:
+        sphere_counts:
+            the number of spheres of each synthetic workload
+        resolution:
+            the resolution (height, width) of the synthetic workloads
+        reflect:
+            the max reflections of the synthetic workloads
+        planes:
+            the number of flat surfaces of the synthetic workloads
+        frames:
+            the number of timed frames of each synthetic workload
+        scenarios:
+            the scenarios to run (keys of SCENARIOS)
+        stills:
+            the (scenario, max reflections) of the still workloads, each rendering the scene of a scenario (as
+            loaded) frames times at every contribution cutoff
+        contribution_cutoffs:
+            the contribution cutoffs of the still workloads (see scene.set_contribution_cutoff)
+        backends:
+            the backends to run the workloads on
+        seed:
+            the seed of the synthetic scenes
+        timeout:
+            the maximum number of seconds per workload (None for no limit)
+        log:
+            called with a line of progress for each workload (e.g. print)
+    Returns:
+        a json serialisable dict with the keys "meta" (environment details) and "results" (one entry per workload)
+    """
+    unknown = [backend for backend in backends if backend not in BACKENDS]
+    if unknown:
+        raise ValueError(f'Unknown backends {unknown} (expecting some of {list(BACKENDS)})')
+    unknown = [scenario for scenario in scenarios if scenario not in SCENARIOS]
+    unknown += [scenario for scenario, _ in stills if scenario not in SCENARIOS]
+    if unknown:
+        raise ValueError(f'Unknown scenarios {unknown} (expecting some of {list(SCENARIOS)})')
+
+    workloads = [
+        (f'synthetic_{spheres}', _run_synthetic, {
+            'spheres': spheres,
+            'resolution': tuple(resolution),
+            'reflect': reflect,
+            'planes': planes,
+            'frames': frames,
+            'seed': seed,
+        })
+        for spheres in sphere_counts
+    ] + [
+        (f'scenario{scenario}', _run_scenario, {'scenario': scenario})
+        for scenario in scenarios
+    ] + [
+        (f'scenario{scenario}_reflect{reflect}_cutoff{cutoff:.3g}', _run_still, {
+            'scenario': scenario,
+            'reflect': reflect,
+            'contribution_cutoff': cutoff,
+            'frames': frames,
+        })
+        for scenario, reflect in stills
+        for cutoff in contribution_cutoffs
+    ]
+    from engine import MAX_SPHERES
+    results = []
+    for backend in backends:
+        for name, target, params in workloads:
+            if backend == 'cuda' and params.get('spheres', 0) + params.get('planes', 0) > MAX_SPHERES:
+                result = {'skipped': f'The cuda backend renders up to {MAX_SPHERES} spheres'}
+            else:
+                result = _run_isolated(target, backend, params, timeout)
+            results.append({'workload': name, 'backend': backend, 'params': params, **result})
+            if log is not None:
+                summary = result.get('skipped') or result.get('error') or \
+                    f"{result['rays_per_sec']:.4g} rays/s, p50 {result['latency_ms']['p50']:.2f} ms"
+                log(f'{backend:>6} {name:<20} {summary}')
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'numba': importlib.import_module('numba').__version__,
+        },
+        'results': results,
+    }
@@ -0,0 +1,124 @@
+import numpy as np
+from typing import Tuple
+from Objects.MetaObjects import Camera, Light
+from Objects.SolidObjects import Sphere
+from SceneInterface import scene
+
+# The (north, east) directions of the flat surfaces added by build_synthetic_scene, in order: floor, back wall,
+# left wall, right wall, ceiling, front wall
+_PLANES: Tuple[Tuple[Tuple[float, float, float], Tuple[float, float, float]], ...] = (
+    ((0, 1, 0), (1, 0, 0)),
+    ((0, 0, 1), (1, 0, 0)),
+    ((0, 0, 1), (0, 1, 0)),
+    ((0, 0, 1), (0, -1, 0)),
+    ((0, 1, 0), (-1, 0, 0)),
+    ((0, 0, 1), (-1, 0, 0)),
+)
+_ROOM_SIZE = 12.
+_CAMERA_DISTANCE = _ROOM_SIZE * 0.95
+
+
+def _random_colour(rng: np.random.Generator) -> dict:
+    """
+    Returns random (but valid) ambient, diffuse and specular vectors
+    """
+    diffuse = rng.uniform(0.1, 1, size=3).astype('float32')
+    return {
+        'ambient': (diffuse * 0.1).astype('float32'),
+        'diffuse': diffuse,
+        'specular': rng.uniform(0.6, 1, size=3).astype('float32'),
+    }
+
+
+def build_synthetic_scene(
+        spheres: int,
+        resolution: Tuple[int, int] = (540, 960),
+        reflect: int = 3,
+        planes: int = 1,
+        seed: int = 0
+) -> None:
+    """
+    Populates scene with a deterministic synthetic scene: a camera, a light, spheres randomly placed inside a room
+    of size 2 * _ROOM_SIZE, and up to 6 of the room's surfaces (as large spheres, see Sphere.create_flat_surface).
+    The camera is placed inside the room (see orbit_camera).
+    The scene is cleared first (see scene.clear)
+    Args:
+        spheres:
+            the number of (small) spheres
+        resolution:
+            the camera resolution (height, width)
+        reflect:
+            the max reflections value (see scene.set_reflect)
+        planes:
+            the number of flat surfaces (between 0 and 6)
+        seed:
+            the seed of the random generator. The same arguments always produce the same scene
+    """
+    if not 0 <= planes <= len(_PLANES):
+        raise ValueError(f'planes must be between 0 and {len(_PLANES)} (incl.)')
+    rng = np.random.default_rng(seed)
+    scene.clear()
+    scene.set_reflect(reflect)
+
+    Camera(
+        name='_camera',
+        coordinates=np.array([0, -_CAMERA_DISTANCE, 0], dtype='float32'),
+        resolution=tuple(resolution),
+        screen_vectors=(
+            np.array([0, 1, 0], dtype='float32'),
+            np.array([0, 0, 1], dtype='float32'),
+        ),
+        background_colour=np.array([0, 0, 0], dtype='float32')
+    )
+    Light(
+        name='_light',
+        coordinates=np.array([_ROOM_SIZE * 0.3, -_ROOM_SIZE * 0.5, _ROOM_SIZE * 0.8], dtype='float32'),
+        ambient=np.array([1, 1, 1], dtype='float32'),
+        diffuse=np.array([1, 1, 1], dtype='float32'),
+        specular=np.array([1, 1, 1], dtype='float32'),
+        intensity=_ROOM_SIZE * 2
+    )
+
+    # Radii shrink as the number of spheres grows, so that the spheres fill (rather than overflow) the room
+    radius_scale = _ROOM_SIZE / max(spheres, 1) ** (1 / 3)
+    centres = rng.uniform(-_ROOM_SIZE * 0.5, _ROOM_SIZE * 0.5, size=(spheres, 3)).astype('float32')
+    radii = rng.uniform(0.1, 0.35, size=spheres) * radius_scale
+    shines = rng.uniform(10, 100, size=spheres)
+    reflects = rng.choice([0., 0.2, 0.5, 0.85, 1.], size=spheres)
+    for i in range(spheres):
+        Sphere(
+            name=f'sphere{i}',
+            coordinates=centres[i],
+            radius=float(radii[i]),
+            shine=float(shines[i]),
+            reflect=float(reflects[i]),
+            **_random_colour(rng)
+        )
+
+    for i, (north, east) in enumerate(_PLANES[:planes]):
+        north = np.array(north, dtype='float32')
+        east = np.array(east, dtype='float32')
+        # The centre of the plane's sphere lies in the (north x east) direction, i.e. outside the room
+        Sphere.create_flat_surface(
+            name=f'plane{i}',
+            north=north,
+            east=east,
+            point_on_surface=(np.cross(north, east) * _ROOM_SIZE).astype('float32'),
+            shine=45,
+            reflect=0.1,
+            **_random_colour(rng)
+        )
+
+
+def orbit_camera(angle: float) -> None:
+    """
+    Moves the camera of a synthetic scene to the given angle (radians) around the vertical axis, still facing the
+    centre of the room. Used to render a different frame each time
+    """
+    camera = scene['_camera']
+    position = np.array([_CAMERA_DISTANCE * np.sin(angle), -_CAMERA_DISTANCE * np.cos(angle), 0], dtype='float32')
+    camera.coordinates = position
+    camera.screen_vectors = (
+        np.array([-position[0], -position[1], 0], dtype='float32'),
+        np.array([0, 0, 1], dtype='float32'),
+    )
@@ -1,10 +1,15 @@
-# from Scenarios.Scenario3 import render_scene_images
-from Scenarios.Scenario7 import render_scene_images
-# from Scenarios.Scenario8 import render_scene_images
+import argparse
+from Scenarios import render_scenario, scenarios
 
 
 if __name__ == '__main__':
-    render_scene_images(
-        show=True,
-        save=False
+    parser = argparse.ArgumentParser(description='Renders a scenario (only the chosen scenario is loaded)')
+    parser.add_argument('scenario', nargs='?', default='scenario7', choices=scenarios())
+    parser.add_argument('--save', action='store_true', help='save the frames to output_media/<scenario>')
+    parser.add_argument('--no-show', dest='show', action='store_false', help='do not display the frames')
+    args = parser.parse_args()
+    render_scenario(
+        args.scenario,
+        show=args.show,
+        save=args.save
     )
@@ -1 +1,6 @@
-from .engine import render_image
+from .engine import render_image, quantize_frame_uint8, quantize_blocks, \
+    invalidate_occluders, MAX_LIGHTS, MAX_SPHERES, \
+    TILE_SIZE, MAX_SHADOW_SAMPLES
+from .rasterize import clear_raster, rasterize_depth, rasterize_first_hits, raster_blocks, raster_tests, NO_HIT
+from .cpu import render_image_cpu, rasterize_spheres_cpu, warmup_cpu, PACKET_SHAPE, PARALLEL_LOCK
+from .lazy_kernel import LazyKernel, compile_kernels
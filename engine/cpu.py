@@ -0,0 +1,672 @@
+import math
+import os
+import threading
+import numba
+import numpy as np
+
+# numba picks its threading layer on the first parallel launch (or cache load), TBB first. A TBB pool started from a
+# thread other than the main one (e.g. the executor of RenderService) hangs the interpreter at exit, so OpenMP is
+# preferred, then the workqueue, unless a layer was chosen through the environment
+if numba.config.THREADING_LAYER == 'default' and 'NUMBA_THREADING_LAYER_PRIORITY' not in os.environ:
+    numba.config.THREADING_LAYER_PRIORITY = ['omp', 'workqueue', 'tbb']
+# Held by the callers of the parallel functions: the workqueue layer does not support concurrent launches from
+# several threads (e.g. two scenes rendering on the cpu)
+PARALLEL_LOCK = threading.Lock()
+
+# The rows and columns of pixels of a ray packet (the primary rays traced together, see render_image_cpu)
+PACKET_SHAPE = (2, 8)
+_PACKET_SIZE = PACKET_SHAPE[0] * PACKET_SHAPE[1]
+
+# float32 constants, so that the packet arithmetic is not promoted to float64 (and vectorizes twice as wide)
+_ZERO = np.float32(0)
+_HALF = np.float32(0.5)
+_TWO = np.float32(2)
+_FOUR = np.float32(4)
+_MIN_DISTANCE = np.float32(0.01)  # Closer intersections are ignored (see spherical.sphere_intersection)
+_NO_HIT = np.float32(np.inf)
+# Cosine margin absorbing the rounding of the packet and sphere cones
+_CONE_MARGIN = 1e-4
+# See engine.device_functions.area_light
+_RING_RADIUS_STEP = 0.6180339887
+_RING_ANGLE_STEP = 0.7548776662
+
+
+@numba.njit(cache=True)
+def _sphere_intersection(origin, direction, centre, radius):
+    """
+    The host version of engine.device_functions.spherical.sphere_intersection: returns the distance along the ray
+    to the sphere (-1 if missed, tangential or closer than 0.01) and the normal multiplier (1 if the ray hits the
+    sphere externally, -1 if internally)
+    """
+    ox = origin[0] - centre[0]
+    oy = origin[1] - centre[1]
+    oz = origin[2] - centre[2]
+    b = 2 * (direction[0] * ox + direction[1] * oy + direction[2] * oz)
+    c = ox ** 2 + oy ** 2 + oz ** 2 - radius ** 2
+    discriminant = b ** 2 - 4 * c
+    if discriminant <= 0:
+        return -1., 1.
+    d_sqrt = math.sqrt(discriminant)
+    t1 = (-b - d_sqrt) / 2
+    t2 = (-b + d_sqrt) / 2
+    t = t1 * (t1 > 0) + t2 * (t1 < 0)
+    if t <= 0.01:
+        return -1., 1.
+    # Not ox + direction[0] * t / 2: the origin relative to a large sphere (e.g. a radius 1e5 floor) is rounded to
+    # float32, which flips the side of the grazing rays. The order of the kernel keeps the halfway point exact
+    hx = origin[0] + direction[0] * t / 2 - centre[0]
+    hy = origin[1] + direction[1] * t / 2 - centre[1]
+    hz = origin[2] + direction[2] * t / 2 - centre[2]
+    return t, -1. if hx ** 2 + hy ** 2 + hz ** 2 < radius ** 2 else 1.
+
+
+@numba.njit(cache=True)
+def _closest_sphere(origin, direction, geometry, number_of_spheres):
+    """
+    Returns the index of the closest sphere hit by a ray (-1 if none), the distance to it and the normal multiplier
+    """
+    index = -1
+    closest = -1.
+    multiplier = 1.
+    for sphere in range(number_of_spheres):
+        distance, normal_multiplier = _sphere_intersection(
+            origin, direction, geometry[sphere], geometry[sphere, 3]
+        )
+        if distance > 0 and (index == -1 or distance < closest):
+            index = sphere
+            closest = distance
+            multiplier = normal_multiplier
+    return index, closest, multiplier
+
+
+@numba.njit(cache=True)
+def _blocked(origin, direction, distance_to_light, geometry, number_of_spheres, occluder):
+    """
+    Returns whether a sphere lies between the origin and the light along a shadow ray, the number of spheres tested
+    (the test stops at the first sphere in the way) and the sphere in the way (-1 if none). The last occluder of
+    the pixel (see render_image_cpu, -1 if none) is tested first
+    """
+    tests = 0
+    if 0 <= occluder < number_of_spheres:
+        tests += 1
+        distance, _ = _sphere_intersection(origin, direction, geometry[occluder], geometry[occluder, 3])
+        if 0 < distance < distance_to_light:
+            return True, tests, occluder
+    for sphere in range(number_of_spheres):
+        if sphere == occluder:
+            continue
+        tests += 1
+        distance, _ = _sphere_intersection(origin, direction, geometry[sphere], geometry[sphere, 3])
+        if 0 < distance < distance_to_light:
+            return True, tests, sphere
+    return False, tests, -1
+
+
+@numba.njit(cache=True)
+def _sample_rotation(pixel_x, pixel_y, bounce):
+    """
+    The host version of engine.device_functions.area_light.sample_rotation
+    """
+    hashed = (pixel_x * 73856093) ^ (pixel_y * 19349663) ^ (bounce * 83492791)
+    return (hashed % 4096) / 4096
+
+
+@numba.njit(cache=True)
+def _area_light_sample(origin, light_centre, light_radius, sample, strata, rotation, direction):
+    """
+    The host version of engine.device_functions.area_light.area_light_sample: writes the unit direction from the
+    origin to the sample point of the light into direction and returns the distance to it
+    """
+    wx = light_centre[0] - origin[0]
+    wy = light_centre[1] - origin[1]
+    wz = light_centre[2] - origin[2]
+    w_norm = math.sqrt(wx ** 2 + wy ** 2 + wz ** 2)
+    wx /= w_norm
+    wy /= w_norm
+    wz /= w_norm
+    if abs(wx) < 0.9:
+        ax, ay, az = 0., wz, -wy
+    else:
+        ax, ay, az = -wz, 0., wx
+    a_norm = math.sqrt(ax ** 2 + ay ** 2 + az ** 2)
+    ax /= a_norm
+    ay /= a_norm
+    az /= a_norm
+    bx = wy * az - wz * ay
+    by = wz * ax - wx * az
+    bz = wx * ay - wy * ax
+
+    ring = sample // strata
+    radius = light_radius * math.sqrt((0.5 + ring * _RING_RADIUS_STEP) % 1)
+    angle = 2 * math.pi * (sample % strata + (ring * _RING_ANGLE_STEP + rotation) % 1) / strata
+    offset_a = radius * math.cos(angle)
+    offset_b = radius * math.sin(angle)
+    dx = wx * w_norm + ax * offset_a + bx * offset_b
+    dy = wy * w_norm + ay * offset_a + by * offset_b
+    dz = wz * w_norm + az * offset_a + bz * offset_b
+    distance = math.sqrt(dx ** 2 + dy ** 2 + dz ** 2)
+    direction[0] = dx / distance
+    direction[1] = dy / distance
+    direction[2] = dz / distance
+    return np.float32(distance)
+
+
+@numba.njit(cache=True)
+def _dot(vector_1, vector_2):
+    """
+    The host version of engine.device_functions.lin_alg.dot: the products of the float32 components are summed as
+    float64
+    """
+    output = 0.
+    for axis in range(3):
+        output += vector_1[axis] * vector_2[axis]
+    return output
+
+
+@numba.njit(cache=True)
+def _normalise(vector):
+    """
+    Normalises a float32 vector in place the way engine.device_functions.lin_alg.normalise does (the zero vector is
+    left as is)
+    """
+    magnitude = _dot(vector, vector) ** 0.5
+    if magnitude > 0:
+        for axis in range(3):
+            vector[axis] = vector[axis] * (1 / magnitude)
+
+
+@numba.njit(cache=True)
+def _blinn_phong(pixel, current_reflectivity, material, light, distance_to_light, light_unit, camera_unit, normal,
+                 half):
+    """
+    Adds the contribution of a light to the pixel and clamps it between 0 and 1 (see
+    engine.device_functions.blinn_phong.blinn_phong_sphere). material is the (4, 3) material of the sphere hit, and
+    half a float32 scratch vector. The terms are rounded to float32 where the kernel stores them
+    """
+    normal_dot_light = _dot(normal, light_unit)
+    for axis in range(3):
+        half[axis] = light_unit[axis] + camera_unit[axis]
+    _normalise(half)
+    normal_dot_half = _dot(normal, half)
+    sign = -1 if normal_dot_half < 0 else 1
+    shined = sign * abs(normal_dot_half) ** (material[3, 0] / 4)
+    distance_sq = distance_to_light ** 2
+    factor = current_reflectivity * (min(distance_sq, light[4, 0]) / distance_sq)
+    for axis in range(3):
+        value = np.float32(material[1, axis] * light[2, axis] * normal_dot_light) + material[0, axis] * light[1, axis]
+        value += np.float32(material[2, axis] * light[3, axis] * shined)
+        pixel[axis] = min(max(0., pixel[axis] + value * factor), 1.)
+
+
+@numba.njit(cache=True)
+def _trace_pixel(
+        pixel,
+        pixel_x,
+        pixel_y,
+        ray,
+        first_hit,
+        camera_location,
+        lights,
+        geometry,
+        material_ids,
+        materials,
+        number_of_spheres,
+        other_data,
+        tests,
+        vectors,
+        occluders,
+):
+    """
+    Traces the path of a pixel whose primary ray first hits sphere first_hit (-1 if none, see _packet_first_hits),
+    accumulating its colour into pixel (holding the background colour). The reflected and shadow rays are traced
+    one at a time. tests (shape (4,)) receives the rays traced, shadow rays traced, sphere tests of the reflected
+    rays and shadow tests. vectors is an (8, 3) float32 scratch array (so that no array is allocated per pixel). Area
+    lights are sampled the way render_image samples them (the same pattern, rotated per pixel (pixel_x, pixel_y)).
+    occluders (shape (l,)) holds the last occluder of the primary hit of the pixel for each light - read and written.
+    The vectors and distances are rounded to float32 wherever render_image stores them (in float32 shared memory), as
+    the hits on large spheres (e.g. the radius 1e5 floors) depend on that rounding
+    """
+    eps = other_data[0]
+    contribution_cutoff = other_data[4]
+    initial_samples = int(other_data[5])
+    total_samples = int(other_data[6])
+    origin = vectors[0]
+    direction = vectors[1]
+    point = vectors[2]
+    normal = vectors[3]
+    camera_unit = vectors[4]
+    light_unit = vectors[5]
+    sample_unit = vectors[6]
+    half = vectors[7]
+    for axis in range(3):
+        direction[axis] = ray[axis]
+        origin[axis] = camera_location[axis] + ray[axis] * eps
+    current_reflectivity = 1.
+    for i in range(int(other_data[1])):
+        tests[0] += 1
+        if i == 0:
+            index = first_hit
+            distance, multiplier = -1., 1.
+            if index != -1:
+                distance, multiplier = _sphere_intersection(
+                    origin, direction, geometry[index], geometry[index, 3]
+                )
+        else:
+            for axis in range(3):
+                origin[axis] += direction[axis] * eps
+            index, distance, multiplier = _closest_sphere(origin, direction, geometry, number_of_spheres)
+            tests[2] += number_of_spheres
+        if index == -1 or distance <= 0:
+            break
+
+        material = materials[material_ids[index]]  # Only the material of the sphere hit is read
+        # The point is moved back by eps / 10 of the (float32) distance, as in render_image
+        stored_distance = np.float32(distance)
+        for axis in range(3):
+            point[axis] = origin[axis] + direction[axis] * distance
+            point[axis] -= direction[axis] * stored_distance * (eps / 10)
+            normal[axis] = point[axis] - geometry[index, axis]
+            camera_unit[axis] = camera_location[axis] - point[axis]
+        _normalise(normal)
+        _normalise(camera_unit)
+        for axis in range(3):
+            normal[axis] *= multiplier
+        dotted = _dot(direction, normal)
+        for axis in range(3):
+            direction[axis] += np.float32(normal[axis] * (dotted * -2))
+            origin[axis] = point[axis] + normal[axis] * eps  # the origin of the shadow rays
+
+        for light in range(lights.shape[0]):
+            for axis in range(3):
+                light_unit[axis] = lights[light, 0, axis] - point[axis]
+            distance_sq = _dot(light_unit, light_unit)
+            if distance_sq > lights[light, 4, 1] * current_reflectivity:
+                continue  # culled (see render_image)
+            distance_to_light = np.float32(math.sqrt(distance_sq))
+            _normalise(light_unit)
+            facing = _dot(normal, light_unit)
+            visibility = 1.
+            # Only the shadows of the primary hits are cached (the hits of the reflected rays are less coherent)
+            occluder = occluders[light] if i == 0 else -1
+            if lights[light, 4, 2] > 0:
+                # Area light: the remaining samples are only cast if the initial ones disagree (see render_image)
+                rotation = _sample_rotation(pixel_x, pixel_y, i)
+                samples = initial_samples
+                samples_blocked = 0
+                for sample in range(total_samples):
+                    if sample == initial_samples and (samples_blocked == 0 or samples_blocked == initial_samples):
+                        break
+                    sample_distance = _area_light_sample(
+                        origin, lights[light, 0], lights[light, 4, 2], sample, initial_samples, rotation,
+                        sample_unit
+                    )
+                    blocked, shadow_tests, sample_occluder = _blocked(origin, sample_unit, sample_distance,
+                                                                      geometry, number_of_spheres, occluder)
+                    if blocked:
+                        occluder = sample_occluder
+                    samples = sample + 1
+                    samples_blocked += blocked
+                    tests[1] += 1
+                    tests[3] += shadow_tests
+                visibility = np.float32(1 - samples_blocked / samples)
+                if samples_blocked == 0:
+                    occluder = -1
+            else:
+                if facing <= 0:
+                    occluder = index  # behind the surface: the sphere hit is tested first (see render_image)
+                blocked, shadow_tests, occluder = _blocked(origin, light_unit, distance_to_light, geometry,
+                                                           number_of_spheres, occluder)
+                tests[1] += 1
+                tests[3] += shadow_tests
+                visibility = 0. if blocked else 1.
+            if i == 0:
+                occluders[light] = occluder
+            if visibility > 0:
+                _blinn_phong(
+                    pixel, current_reflectivity * visibility, material, lights[light], distance_to_light, light_unit,
+                    camera_unit, normal, half
+                )
+
+        for axis in range(3):
+            origin[axis] -= normal[axis] * eps
+        current_reflectivity *= material[3, 1]
+        if current_reflectivity <= contribution_cutoff:
+            break
+
+
+@numba.njit(cache=True)
+def _sphere_cones(camera_location, geometry, number_of_spheres):
+    """
+    Returns the cone of every sphere seen from the camera: its unit axis (shape (n, 3)) and the cosine and sine of
+    its half angle (shape (n, 2)). Spheres containing the camera get a cosine of -2 (they overlap every packet)
+    """
+    axes = np.zeros((number_of_spheres, 3), dtype=np.float64)
+    angles = np.zeros((number_of_spheres, 2), dtype=np.float64)
+    for sphere in range(number_of_spheres):
+        distance_sq = 0.
+        for axis in range(3):
+            axes[sphere, axis] = geometry[sphere, axis] - camera_location[axis]
+            distance_sq += axes[sphere, axis] ** 2
+        distance = math.sqrt(distance_sq)
+        radius = geometry[sphere, 3]
+        if distance <= radius:
+            angles[sphere, 0] = -2.
+            continue
+        for axis in range(3):
+            axes[sphere, axis] /= distance
+        sine = radius / distance
+        angles[sphere, 0] = math.sqrt(1 - sine ** 2)
+        angles[sphere, 1] = sine
+    return axes, angles
+
+
+@numba.njit(cache=True)
+def _packet_candidates(dx, dy, dz, sphere_axes, sphere_angles, candidates):
+    """
+    Bounds a packet by the cone of its rays and writes the spheres whose cone overlaps it (the only spheres its rays
+    may hit) to candidates. Returns the number of candidates
+    """
+    ax = 0.
+    ay = 0.
+    az = 0.
+    for k in range(_PACKET_SIZE):
+        ax += dx[k]
+        ay += dy[k]
+        az += dz[k]
+    magnitude = math.sqrt(ax ** 2 + ay ** 2 + az ** 2)
+    cosine = 1.
+    if magnitude > 0:
+        ax /= magnitude
+        ay /= magnitude
+        az /= magnitude
+        for k in range(_PACKET_SIZE):
+            cosine = min(cosine, ax * dx[k] + ay * dy[k] + az * dz[k])
+    else:
+        cosine = -1.
+    sine = math.sqrt(max(0., 1 - cosine ** 2))
+    count = 0
+    for sphere in range(sphere_axes.shape[0]):
+        # angle(packet, sphere) <= packet half angle + sphere half angle. Both half angles are below pi / 2 (the
+        # sphere does not contain the camera and the packet is narrow), so their sum is below pi
+        overlaps = sphere_angles[sphere, 0] < -1 or cosine <= 0 or (
+            ax * sphere_axes[sphere, 0] + ay * sphere_axes[sphere, 1] + az * sphere_axes[sphere, 2] >=
+            cosine * sphere_angles[sphere, 0] - sine * sphere_angles[sphere, 1] - _CONE_MARGIN
+        )
+        if overlaps:
+            candidates[count] = sphere
+            count += 1
+    return count
+
+
+@numba.njit(cache=True)
+def _packet_first_hits(ox, oy, oz, dx, dy, dz, geometry, candidates, number_of_candidates, closest, first_hits):
+    """
+    Finds the closest candidate sphere hit by each ray of a packet (first_hits, -1 if none). The rays are held as
+    structures of arrays of float32 and every candidate is tested against all the rays of the packet in one
+    branchless loop, which numba vectorizes
+    """
+    for k in range(_PACKET_SIZE):
+        closest[k] = _NO_HIT
+        first_hits[k] = -1
+    for candidate in range(number_of_candidates):
+        sphere = candidates[candidate]
+        cx = geometry[sphere, 0]
+        cy = geometry[sphere, 1]
+        cz = geometry[sphere, 2]
+        radius_sq = geometry[sphere, 3] * geometry[sphere, 3]
+        for k in range(_PACKET_SIZE):
+            px = ox[k] - cx
+            py = oy[k] - cy
+            pz = oz[k] - cz
+            b = _TWO * (dx[k] * px + dy[k] * py + dz[k] * pz)
+            c = px * px + py * py + pz * pz - radius_sq
+            discriminant = b * b - _FOUR * c
+            d_sqrt = np.sqrt(max(discriminant, _ZERO))
+            t1 = (-b - d_sqrt) * _HALF
+            t2 = (-b + d_sqrt) * _HALF
+            t = t1 if t1 > _ZERO else t2
+            hit = (discriminant > _ZERO) & (t > _MIN_DISTANCE) & (t < closest[k])
+            closest[k] = t if hit else closest[k]
+            first_hits[k] = sphere if hit else first_hits[k]
+
+
+@numba.njit(cache=True, parallel=True)
+def rasterize_spheres_cpu(camera_location, rays_soa, sphere_geometry, sphere_bounds, other_data, first_hits):
+    """
+    The cpu version of the rasterization of the primary visibility (see engine.rasterize_depth): every sphere is
+    splatted onto the pixels of its screen bounds (see Camera._project_spheres), keeping the closest sphere hit by
+    each primary ray (the lowest index on ties). The distances are computed with the float32 arithmetic of
+    _packet_first_hits, so the first hits are those of the packets. The rows of pixels run in parallel, each
+    going over the spheres whose bounds cover it
+
+    Args:
+        camera_location:
+            an array of three coordinates x, y, z
+        rays_soa:
+            the unit vectors of the primary rays as a structure of arrays, shape (3, h, w)
+        sphere_geometry:
+            the [x, y, z, radius] of the spheres, shape (>= n, 4)
+        sphere_bounds:
+            the [row_start, row_stop, column_start, column_stop] pixels of each of the n spheres, shape (n, 4)
+        other_data:
+            see render_image_cpu (only the epsilon is read)
+        first_hits:
+            the index of the first sphere hit by the primary ray of each pixel, shape (h, w) - written to (-1 if
+            none)
+    """
+    height = rays_soa.shape[1]
+    width = rays_soa.shape[2]
+    eps = np.float32(other_data[0])
+    for x in numba.prange(height):
+        closest = np.full(width, _NO_HIT, dtype=np.float32)
+        for y in range(width):
+            first_hits[x, y] = -1
+        for sphere in range(sphere_bounds.shape[0]):
+            if not sphere_bounds[sphere, 0] <= x < sphere_bounds[sphere, 1]:
+                continue
+            cx = sphere_geometry[sphere, 0]
+            cy = sphere_geometry[sphere, 1]
+            cz = sphere_geometry[sphere, 2]
+            radius_sq = sphere_geometry[sphere, 3] * sphere_geometry[sphere, 3]
+            for y in range(sphere_bounds[sphere, 2], sphere_bounds[sphere, 3]):
+                dx = rays_soa[0, x, y]
+                dy = rays_soa[1, x, y]
+                dz = rays_soa[2, x, y]
+                px = camera_location[0] + dx * eps - cx
+                py = camera_location[1] + dy * eps - cy
+                pz = camera_location[2] + dz * eps - cz
+                b = _TWO * (dx * px + dy * py + dz * pz)
+                c = px * px + py * py + pz * pz - radius_sq
+                discriminant = b * b - _FOUR * c
+                if discriminant <= _ZERO:
+                    continue
+                d_sqrt = np.sqrt(discriminant)
+                t1 = (-b - d_sqrt) * _HALF
+                t2 = (-b + d_sqrt) * _HALF
+                t = t1 if t1 > _ZERO else t2
+                if _MIN_DISTANCE < t < closest[y]:
+                    closest[y] = t
+                    first_hits[x, y] = sphere
+
+
+@numba.njit(cache=True, parallel=True)
+def render_image_cpu(
+        background_colour,
+        camera_location,
+        rays_soa,
+        lights_encoded,
+        sphere_geometry,
+        sphere_materials,
+        materials,
+        number_of_spheres,
+        other_data,
+        output_frame,
+        counters,
+        diagnostics,
+        occluders,
+        first_hits,
+        packets=True,
+):
+    """
+    Renders a frame on the cpu, with the same inputs and outputs as engine.render_image (the cpu backend, see
+    scene.set_backend). The screen is cut into packets of PACKET_SHAPE pixels whose primary rays are traced together:
+    each packet is bounded by the cone of its rays and tested once against the cone of every sphere, and the
+    remaining candidates are tested against the rays of the packet as a vectorized loop. The paths diverge after the
+    first hit, so the reflected and shadow rays are traced one at a time. The rows of packets run in parallel
+
+    Args:
+        background_colour:
+            An array of shape (3,) indicating the initial pixel value
+        camera_location:
+            an array of three coordinates x, y, z
+        rays_soa:
+            the unit vectors of the primary rays as a structure of arrays, shape (3, h, w)
+        lights_encoded:
+            the lights encoded, shape (l, 5, 3) (see engine.render_image)
+        sphere_geometry:
+            the [x, y, z, radius] of the spheres, shape (>= number_of_spheres, 4)
+        sphere_materials:
+            the index of the material of each sphere in materials, shape (>= number_of_spheres,)
+        materials:
+            the deduplicated materials, shape (m, 4, 3) (see engine.render_image)
+        number_of_spheres:
+            the number of spheres in use (the other rows are padding)
+        other_data:
+            the epsilon, number of iterations, counters flag, diagnostics flag, contribution cutoff, initial and
+            total soft shadow samples and rasterization flag, shape (8,)
+        output_frame:
+            the output screen of shape (h, w, 3) - to be written to
+        counters:
+            the number of rays traced, shadow rays traced and ray-sphere intersection tests. Shape is (3,) - added to
+        diagnostics:
+            the per-pixel counters of shape (h, w, 4) (see engine.render_image) - to be written to if enabled
+        occluders:
+            the last occluder cache of shape (h, w, l) (see engine.render_image) - read and written. The last
+            occluder of the pixel is tested first by every shadow ray (of point and area lights)
+        first_hits:
+            if the rasterization flag is set, the first sphere hit by the primary ray of each pixel (-1 if none),
+            shape (h, w), see rasterize_spheres_cpu. The packets then skip their candidates and first hit tests.
+            Else a placeholder that is not read
+        packets:
+            if False, each primary ray is tested against every sphere on its own, the way the reflected rays are (the
+            scalar reference the packets are measured against)
+    """
+    height = rays_soa.shape[1]
+    width = rays_soa.shape[2]
+    packet_rows = (height + PACKET_SHAPE[0] - 1) // PACKET_SHAPE[0]
+    packet_columns = (width + PACKET_SHAPE[1] - 1) // PACKET_SHAPE[1]
+    eps = np.float32(other_data[0])
+    rasterized = other_data[7] > 0
+    sphere_axes, sphere_angles = _sphere_cones(camera_location, sphere_geometry, number_of_spheres)
+    row_counters = np.zeros((packet_rows, 3), dtype=np.float64)
+    for packet_row in numba.prange(packet_rows):
+        ox = np.empty(_PACKET_SIZE, dtype=np.float32)
+        oy = np.empty(_PACKET_SIZE, dtype=np.float32)
+        oz = np.empty(_PACKET_SIZE, dtype=np.float32)
+        dx = np.empty(_PACKET_SIZE, dtype=np.float32)
+        dy = np.empty(_PACKET_SIZE, dtype=np.float32)
+        dz = np.empty(_PACKET_SIZE, dtype=np.float32)
+        closest = np.empty(_PACKET_SIZE, dtype=np.float32)
+        first_hits_packet = np.empty(_PACKET_SIZE, dtype=np.int64)
+        candidates = np.empty(max(number_of_spheres, 1), dtype=np.int64)
+        pixel = np.empty(3, dtype=np.float32)
+        origin = np.empty(3, dtype=np.float32)
+        ray = np.empty(3, dtype=np.float32)
+        tests = np.zeros(4)
+        vectors = np.empty((8, 3), dtype=np.float32)
+        for packet_column in range(packet_columns):
+            # Gather the rays of the packet (the pixels beyond the edges of the screen repeat the last pixel)
+            for k in range(_PACKET_SIZE):
+                x = min(packet_row * PACKET_SHAPE[0] + k // PACKET_SHAPE[1], height - 1)
+                y = min(packet_column * PACKET_SHAPE[1] + k % PACKET_SHAPE[1], width - 1)
+                dx[k] = rays_soa[0, x, y]
+                dy[k] = rays_soa[1, x, y]
+                dz[k] = rays_soa[2, x, y]
+                ox[k] = camera_location[0] + dx[k] * eps
+                oy[k] = camera_location[1] + dy[k] * eps
+                oz[k] = camera_location[2] + dz[k] * eps
+            if rasterized:
+                number_of_candidates = 1  # Only the first hit is tested again (for the point hit)
+                for k in range(_PACKET_SIZE):
+                    x = min(packet_row * PACKET_SHAPE[0] + k // PACKET_SHAPE[1], height - 1)
+                    y = min(packet_column * PACKET_SHAPE[1] + k % PACKET_SHAPE[1], width - 1)
+                    first_hits_packet[k] = first_hits[x, y]
+            elif packets:
+                number_of_candidates = _packet_candidates(dx, dy, dz, sphere_axes, sphere_angles, candidates)
+                _packet_first_hits(ox, oy, oz, dx, dy, dz, sphere_geometry, candidates, number_of_candidates,
+                                   closest, first_hits_packet)
+            else:
+                number_of_candidates = number_of_spheres
+                for k in range(_PACKET_SIZE):
+                    origin[0], origin[1], origin[2] = ox[k], oy[k], oz[k]
+                    ray[0], ray[1], ray[2] = dx[k], dy[k], dz[k]
+                    first_hits_packet[k] = _closest_sphere(origin, ray, sphere_geometry, number_of_spheres)[0]
+
+            for k in range(_PACKET_SIZE):
+                x = packet_row * PACKET_SHAPE[0] + k // PACKET_SHAPE[1]
+                y = packet_column * PACKET_SHAPE[1] + k % PACKET_SHAPE[1]
+                if x >= height or y >= width:
+                    continue
+                for axis in range(3):
+                    pixel[axis] = background_colour[axis]
+                    ray[axis] = rays_soa[axis, x, y]
+                tests[:] = 0
+                if first_hits_packet[k] == -1 or other_data[1] < 1:
+                    tests[0] = min(other_data[1], 1)  # The pixel is the background
+                else:
+                    _trace_pixel(pixel, x, y, ray, first_hits_packet[k], camera_location, lights_encoded,
+                                 sphere_geometry, sphere_materials, materials, number_of_spheres, other_data, tests,
+                                 vectors, occluders[x, y])
+                for axis in range(3):
+                    output_frame[x, y, axis] = pixel[axis]
+                traced = tests[0] > 0  # No ray is traced with 0 iterations
+                first_hit = first_hits_packet[k] if traced else -1
+                if rasterized and first_hit == -1:
+                    sphere_tests = tests[2]  # Nothing to test again
+                else:
+                    sphere_tests = (number_of_candidates if traced else 0) + tests[2]
+                row_counters[packet_row, 0] += tests[0]
+                row_counters[packet_row, 1] += tests[1]
+                row_counters[packet_row, 2] += sphere_tests + tests[3]
+                if other_data[3] > 0:
+                    diagnostics[x, y, 0] = int(tests[0])
+                    diagnostics[x, y, 1] = int(sphere_tests)
+                    diagnostics[x, y, 2] = int(tests[3])
+                    diagnostics[x, y, 3] = first_hit
+    if other_data[2] > 0:
+        for packet_row in range(packet_rows):
+            for counter in range(3):
+                counters[counter] += row_counters[packet_row, counter]
+
+
+def warmup_cpu():
+    """
+    Compiles render_image_cpu and rasterize_spheres_cpu (or loads them from the cache), which otherwise happens on
+    the first frame rendered on the cpu
+    """
+    with PARALLEL_LOCK:
+        geometry = np.array([[0, 0, 0, 1]], dtype='float32')
+        render_image_cpu(
+            np.zeros(3, dtype='float32'),
+            np.array([0, -2, 0], dtype='float32'),
+            np.array([0, 1, 0], dtype='float32').reshape(3, 1, 1),
+            np.zeros((1, 5, 3), dtype='float32'),
+            geometry,
+            np.zeros(1, dtype='int32'),
+            np.zeros((1, 4, 3), dtype='float32'),
+            1,
+            np.array([0.02, 1, 0, 0, 0, 4, 16, 0], dtype='float32'),
+            np.zeros((1, 1, 3), dtype='float32'),
+            np.zeros(3, dtype='float64'),
+            np.zeros((1, 1, 4), dtype='int32'),
+            np.full((1, 1, 1), -1, dtype='int32'),
+            np.full((1, 1), -1, dtype='int32'),
+        )
+        rasterize_spheres_cpu(
+            np.array([0, -2, 0], dtype='float32'),
+            np.array([0, 1, 0], dtype='float32').reshape(3, 1, 1),
+            geometry,
+            np.array([[0, 1, 0, 1]], dtype='int32'),
+            np.array([0.02, 1, 0, 0, 0, 4, 16, 1], dtype='float32'),
+            np.empty((1, 1), dtype='int32'),
+        )
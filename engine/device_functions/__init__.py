@@ -2,4 +2,6 @@ import engine.device_functions.lin_alg
 import engine.device_functions.spherical
 import engine.device_functions.blinn_phong
 import engine.device_functions.numerical_utils
+import engine.device_functions.cube_map
+import engine.device_functions.area_light
 # import engine.device_functions.memory
@@ -0,0 +1,76 @@
+# shadow ray samples of area (spherical) lights
+import math
+from numba import cuda
+
+# The fractional parts of multiples of these (the golden ratio and its square) spread the rings of samples
+_RING_RADIUS_STEP = 0.6180339887
+_RING_ANGLE_STEP = 0.7548776662
+
+
+@cuda.jit(
+    device=True
+)
+def sample_rotation(pixel_x, pixel_y, bounce):
+    """
+    Returns a pseudo-random rotation in [0, 1) of the sample pattern of a pixel and bounce, so the pattern does not
+    repeat across neighbouring pixels (the soft shadow edges turn into fine noise rather than bands). Deterministic,
+    so the same frame is rendered twice identically
+    """
+    hashed = (pixel_x * 73856093) ^ (pixel_y * 19349663) ^ (bounce * 83492791)
+    return (hashed % 4096) / 4096
+
+
+@cuda.jit(
+    device=True
+)
+def area_light_sample(origin, light_centre, light_radius, sample, strata, rotation):
+    """
+    Returns the unit direction (x, y, z) and the distance from the origin to a sample point of an area light: the disk
+    of the light seen from the origin (perpendicular to the direction of its centre) is cut into strata angular
+    sectors, and every consecutive strata samples hold one point per sector, on a ring of its own. The first strata
+    samples are therefore stratified over the whole disk, and further rings fill it in
+    Immutable and referentially transparent
+    Args:
+        origin:
+            the origin of the shadow ray, shape (3,)
+        light_centre:
+            the centre of the light, shape (3,)
+        light_radius:
+            the radius of the light
+        sample:
+            the index of the sample
+        strata:
+            the number of sectors of the disk (the samples of the first ring)
+        rotation:
+            the rotation of the pattern, in [0, 1) (see sample_rotation)
+    """
+    wx = light_centre[0] - origin[0]
+    wy = light_centre[1] - origin[1]
+    wz = light_centre[2] - origin[2]
+    w_norm = math.sqrt(wx ** 2 + wy ** 2 + wz ** 2)
+    wx /= w_norm
+    wy /= w_norm
+    wz /= w_norm
+    # a = w x e (e is the axis least aligned with w), b = w x a
+    if abs(wx) < 0.9:
+        ax, ay, az = 0., wz, -wy
+    else:
+        ax, ay, az = -wz, 0., wx
+    a_norm = math.sqrt(ax ** 2 + ay ** 2 + az ** 2)
+    ax /= a_norm
+    ay /= a_norm
+    az /= a_norm
+    bx = wy * az - wz * ay
+    by = wz * ax - wx * az
+    bz = wx * ay - wy * ax
+
+    ring = sample // strata
+    radius = light_radius * math.sqrt((0.5 + ring * _RING_RADIUS_STEP) % 1)
+    angle = 2 * math.pi * (sample % strata + (ring * _RING_ANGLE_STEP + rotation) % 1) / strata
+    offset_a = radius * math.cos(angle)
+    offset_b = radius * math.sin(angle)
+    dx = wx * w_norm + ax * offset_a + bx * offset_b
+    dy = wy * w_norm + ay * offset_a + by * offset_b
+    dz = wz * w_norm + az * offset_a + bz * offset_b
+    distance = math.sqrt(dx ** 2 + dy ** 2 + dz ** 2)
+    return dx / distance, dy / distance, dz / distance, distance
@@ -2,25 +2,7 @@ from numba import cuda
 from .lin_alg import dot, add, mult, mult_fac, normalise
 
 
-_blinn_phong_sphere_signature = ', '.join([
-    'float32',  # current_reflectivity
-    'float32',  # light_intensity
-    'float32',  # distance_to_light
-    'float32[:]',  # sphere_ambient
-    'float32[:]',  # sphere_diffuse
-    'float32[:]',  # sphere_specular
-    'float32',  # sphere_shine
-    'float32[:]',  # light_ambient
-    'float32[:]',  # light_diffuse
-    'float32[:]',  # light_specular
-    'float32[:]',  # light_unit_vector
-    'float32[:]',  # camera_unit_vector
-    'float32[:]'  # camera_unit_vector
-])
-
-
 @cuda.jit(
-    func_or_sig=_blinn_phong_sphere_signature,
     device=True
 )
 def blinn_phong_sphere(
@@ -112,3 +94,85 @@ def blinn_phong_sphere(
     intensity_factor = min(distance_sq, light_intensity) / distance_sq
 
     return mult_fac(buffer_variables[0], current_reflectivity * intensity_factor)
+
+
+@cuda.jit(
+    device=True
+)
+def light_culled(distance_sq, culling_distance_sq):
+    """
+    Returns True if a light is too far from a point to light it visibly. The intensity falloff
+    min(distance_sq, light_intensity) / distance_sq of a light is below the cutoff c exactly when distance_sq is
+    greater than light_intensity / c, the culling distance squared precomputed on the host, so culling costs a
+    single comparison (no square root)
+    Args:
+        distance_sq:
+            the squared distance from the point to the light
+        culling_distance_sq:
+            the culling distance squared of the light (infinite if lights are never culled). The kernel scales it by
+            the reflectivity of the path, as the falloff of the reflected rays is weighted by it
+    """
+    return distance_sq > culling_distance_sq
+
+
+@cuda.jit(
+    device=True
+)
+def blinn_phong_lights(
+        pixel,
+        current_reflectivity,
+        sphere_material,
+        lights_encoded,
+        number_of_lights,
+        light_unit_vectors,
+        light_data,
+        camera_unit_vector,
+        surface_normal_vec,
+):
+    """
+    Adds the contribution (see blinn_phong_sphere) of every light seeing the point hit to the pixel, clamping the
+    pixel values between 0 and 1 after each light. Lights that are culled (distance -1) or obstructed (at least one
+    sphere in the way) do not contribute, and the contribution of an area light is scaled by the fraction of it seen
+    Args:
+        pixel:
+            the pixel value of shape (3,) - added to
+        current_reflectivity:
+            the current reflectivity rate of the pixel (see blinn_phong_sphere)
+        sphere_material:
+            the material of the sphere hit (ambient, diffuse and specular vectors and [shine, reflect, 0]),
+            shape (4, 3)
+        lights_encoded:
+            the encoded lights, shape (l, 5, 3) (only the first number_of_lights are read)
+        number_of_lights:
+            the number of lights
+        light_unit_vectors:
+            the unit vectors from the point hit to each light, shape (l, 3)
+        light_data:
+            the distance to each light (-1 if culled), the number of spheres obstructing it and (column 5) the
+            fraction of the light seen, shape (l, 6)
+        camera_unit_vector:
+            the unit vector of shape (3,) from the point hit to the camera
+        surface_normal_vec:
+            the unit normal of shape (3,) at the point hit
+    """
+    for light in range(number_of_lights):
+        if light_data[light][0] < 0 or light_data[light][1] != 0 or light_data[light][5] <= 0:
+            continue
+        x, y, z = blinn_phong_sphere(
+            current_reflectivity * light_data[light][5],  # current_reflectivity
+            lights_encoded[light][4][0],  # light_intensity
+            light_data[light][0],  # distance_to_light
+            sphere_material[0],  # sphere_ambient
+            sphere_material[1],  # sphere_diffuse
+            sphere_material[2],  # sphere_specular
+            sphere_material[3][0],  # sphere_shine
+            lights_encoded[light][1],  # light_ambient
+            lights_encoded[light][2],  # light_diffuse
+            lights_encoded[light][3],  # light_specular
+            light_unit_vectors[light],  # light_unit_vector
+            camera_unit_vector,  # camera_unit_vector
+            surface_normal_vec  # surface_normal_vec
+        )
+        pixel[0] = min(max(0, pixel[0] + x), 1)
+        pixel[1] = min(max(0, pixel[1] + y), 1)
+        pixel[2] = min(max(0, pixel[2] + z), 1)
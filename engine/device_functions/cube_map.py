@@ -0,0 +1,29 @@
+# cube-map lookups (see SceneInterface._ShadowCasters)
+from numba import cuda
+
+
+@cuda.jit(
+    device=True
+)
+def cube_map_cell(direction, resolution):
+    """
+    Returns the (face, i, j) cube-map cell of a direction. Face 2 * a + (0 if positive else 1) holds the directions
+    whose largest component (in absolute value) is along axis a, and (i, j) is the cell of
+    (direction[(a + 1) % 3], direction[(a + 2) % 3]) / |direction[a]| when [-1, 1] is cut into resolution slices
+    Immutable and referentially transparent
+    Args:
+        direction:
+            a (non zero) vector of shape (3,)
+        resolution:
+            the number of cells along each side of a face
+    """
+    axis = 0
+    if abs(direction[1]) > abs(direction[axis]):
+        axis = 1
+    if abs(direction[2]) > abs(direction[axis]):
+        axis = 2
+    major = abs(direction[axis])
+    face = 2 * axis + (1 if direction[axis] < 0 else 0)
+    i = int((direction[(axis + 1) % 3] / major + 1) * 0.5 * resolution)
+    j = int((direction[(axis + 2) % 3] / major + 1) * 0.5 * resolution)
+    return face, min(max(i, 0), resolution - 1), min(max(j, 0), resolution - 1)
@@ -3,7 +3,6 @@ from numba import cuda
 
 
 @cuda.jit(
-    func_or_sig='float32[:], float32[:]',
     device=True,
 )
 def add(vec1, vec2):
@@ -22,7 +21,6 @@ def add(vec1, vec2):
 
 
 @cuda.jit(
-    func_or_sig='float32[:], float32[:]',
     device=True,
 )
 def mult(vec1, vec2):
@@ -41,7 +39,6 @@ def mult(vec1, vec2):
 
 
 @cuda.jit(
-    func_or_sig='float32[:], float32',
     device=True,
 )
 def mult_fac(vec, fac) -> object:
@@ -60,7 +57,6 @@ def mult_fac(vec, fac) -> object:
 
 
 @cuda.jit(
-    func_or_sig='float32[:], float32[:]',
     device=True
 )
 def dot(vec1, vec2):
@@ -82,7 +78,6 @@ def dot(vec1, vec2):
 
 
 @cuda.jit(
-    func_or_sig='float32[:],',
     device=True,
 )
 def magnitude(vec):
@@ -99,7 +94,6 @@ def magnitude(vec):
 
 
 @cuda.jit(
-    func_or_sig='float32[:],',
     device=True
 )
 def normalise(vec):
@@ -119,7 +113,6 @@ def normalise(vec):
 
 
 @cuda.jit(
-    func_or_sig='float32[:], float32[:]',
     device=True
 )
 def direction(vec1, vec2):
@@ -143,7 +136,6 @@ def direction(vec1, vec2):
 
 
 @cuda.jit(
-    func_or_sig='float32[:], float32[:]',
     device=True
 )
 def normalised_direction(vec1, vec2):
@@ -163,7 +155,6 @@ def normalised_direction(vec1, vec2):
 
 
 @cuda.jit(
-    func_or_sig='float32[:], float32[:]',
     device=True
 )
 def cross(vec1, vec2):
@@ -185,7 +176,6 @@ def cross(vec1, vec2):
 
 
 @cuda.jit(
-    func_or_sig='float32[:], float32[:]',
     device=True
 )
 def reflection_flat(ray_unit_vector, normal_unit_vector):
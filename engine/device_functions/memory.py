@@ -3,7 +3,6 @@ from numba import cuda
 
 
 @cuda.jit(
-    func_or_sig='float32[:], float32[:], float32[:, :, :], float32[:, :], float32[:, :, :], float32[:]',
     device=True
 )
 def create_shared_memory(
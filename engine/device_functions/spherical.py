@@ -1,10 +1,10 @@
 # calculations involving spheres
+import numba
 from numba import cuda
 from engine.device_functions import lin_alg
 
 
 @cuda.jit(
-    func_or_sig='float32[:], float32[:], float32[:], float32',
     device=True
 )
 def sphere_intersection(ray_origin, ray_unit_vector, sphere_centre, sphere_radius):
@@ -69,3 +69,37 @@ def sphere_intersection(ray_origin, ray_unit_vector, sphere_centre, sphere_radiu
     normal_reverse = -1 * (halfway_distance2 < radius2) + 1 * (halfway_distance2 >= radius2)
 
     return distance, (x, y, z), normal_reverse
+
+
+@cuda.jit(
+    device=True
+)
+def primary_distance(camera_location, ray_unit_vector, sphere_centre, sphere_radius, eps):
+    """
+    Returns the distance from the camera to the sphere along a primary ray, the way engine.render_image compares the
+    distances of the first bounce: the ray starts eps along its direction, and the distance is stored as float32 and
+    shortened by eps / 10 (as a fraction). Non-positive if the ray misses the sphere
+
+    Immutable and referentially transparent
+    Args:
+        camera_location:
+            a vector representing the location of the camera. shape = (3,)
+        ray_unit_vector:
+            a vector representing the unit direction of the primary ray. shape = (3,)
+        sphere_centre:
+            a vector representing the location of centre of sphere. shape = (3,)
+        sphere_radius:
+            a scalar representing the radius of the sphere
+        eps:
+            the epsilon of the scene (float32)
+    """
+    ray_origin = cuda.local.array(3, dtype=numba.float32)
+    for axis in range(3):
+        ray_origin[axis] = camera_location[axis] + ray_unit_vector[axis] * eps
+    distance, coordinates, normal_reverse = sphere_intersection(
+        ray_origin, ray_unit_vector, sphere_centre, sphere_radius
+    )
+    stored_distance = cuda.local.array(1, dtype=numba.float32)
+    stored_distance[0] = distance
+    stored_distance[0] *= (1 - eps / 10)
+    return stored_distance[0]
@@ -1,30 +1,54 @@
+import math
 from numba import cuda
+import numba
 import engine.device_functions as device_functions
+from .lazy_kernel import lazy_kernel
 
+# The maximum number of lights (the lights are loaded into shared memory)
+MAX_LIGHTS = 32
+# The maximum number of spheres (one thread per sphere in a block)
+MAX_SPHERES = 512
+# The side (in pixels) of the screen tiles the candidate spheres of primary rays are binned by
+TILE_SIZE = 16
+# The maximum number of shadow rays cast towards an area light from a point (see scene.set_soft_shadow_samples)
+MAX_SHADOW_SAMPLES = 64
 
 _render_image_signature = ', '.join([
     'float32[:]',  # background_colour
     'float32[:]',  # camera_location
     'float32[:, :, :]',  # unit_rays
-    'float32[:, :]',  # light_encoded
-    'float32[:, :, :]',  # spheres_encoded
+    'float32[:, :, :]',  # lights_encoded
+    'float32[:, :]',  # sphere_geometry
+    'int32[:]',  # sphere_materials
+    'float32[:, :, :]',  # materials
+    'uint32[:, :, :, :, :]',  # shadow_casters
+    'uint32[:, :, :]',  # tile_masks
     'float32[:]',  # other_data
     'float32[:, :, :]',  # output_frame
+    'float64[:]',  # counters
+    'int32[:, :, :]',  # diagnostics
+    'int32[:, :, :]',  # occluders
+    'int32[:, :]',  # first_hits
 ])
 
 
-@cuda.jit(
-    func_or_sig=_render_image_signature,
-    device=False
-)
+@lazy_kernel(_render_image_signature)
 def render_image(
         background_colour,
         camera_location,
         unit_rays,
-        light_encoded,
-        spheres_encoded,
+        lights_encoded,
+        sphere_geometry,
+        sphere_materials,
+        materials,
+        shadow_casters,
+        tile_masks,
         other_data,
         output_frame,
+        counters,
+        diagnostics,
+        occluders,
+        first_hits,
 ):
     """
     Main processing kernel. Intended to be used with h by w blocks (where h and w is the resolution)
@@ -37,75 +61,159 @@ def render_image(
             an array of three coordinates x, y, z
         unit_rays:
             The unit vectors of the rays at start. Shape is (h, w, 3)
-        light_encoded:
-            the light value encoded. Shape is (4, 3)
-        spheres_encoded:
-            the spheres objects encoded. Shape is (512, 5, 3)
+        lights_encoded:
+            the lights encoded. Shape is (l, 5, 3) for l lights (up to MAX_LIGHTS), each holding the coordinates,
+            ambient, diffuse and specular vectors and [intensity, culling distance squared, radius] (see
+            _SceneInterface._encoded_lights). Lights of radius 0 are point lights, the others are area lights
+        sphere_geometry:
+            the [x, y, z, radius] of the spheres (the only sphere data the intersection tests read). Shape is (512, 4)
+        sphere_materials:
+            the index of the material of each sphere in materials. Shape is (512,)
+        materials:
+            the deduplicated materials, each holding the ambient, diffuse and specular vectors and [shine, reflect, 0]
+            (see SceneInterface._MaterialTable). Shape is (m, 4, 3). Only the material of the sphere hit is read
+        shadow_casters:
+            for each light, a cube-map of the directions from the light, each cell holding the bit mask of the spheres
+            that may block a shadow ray whose origin lies in that direction. Shape is (l, 6, r, r, 16) (see
+            SceneInterface._ShadowCasters)
+        tile_masks:
+            for each TILE_SIZE by TILE_SIZE tile of the screen, the bit mask of the spheres that may be the first hit
+            of its primary rays. Shape is (ceil(h / TILE_SIZE), ceil(w / TILE_SIZE), 16) (see
+            SceneInterface._ScreenTiles)
         other_data:
-            the epsilon and number of iterations. Shape is (2,)
+            the epsilon, number of iterations, the counters flag (counters are only updated if positive), the
+            diagnostics flag (diagnostics are only written if positive), the contribution cutoff (the weight of
+            the reflected rays below which a path is not traced any further), the initial and total numbers of
+            shadow samples of area lights (see _SceneInterface.set_soft_shadow_samples) and the rasterization flag
+            (the first hits are read from first_hits if positive). Shape is (8,)
         output_frame:
             the output screen of size (height, width, 3) - to be written to
+        counters:
+            the number of rays traced, shadow rays traced and ray-sphere intersection tests. Shape is (3,) - added to
+        diagnostics:
+            the per-pixel counters of size (height, width, 4) - to be written to. For each pixel: the number of
+            bounces (rays traced), sphere intersection tests, shadow intersection tests and the index of the first
+            sphere hit (-1 if none)
+        occluders:
+            the last occluder cache, shape (height, width, l) - read and written. For each pixel and point light, the
+            index of the sphere that blocked the shadow ray of the primary hit of the pixel towards the light in an
+            earlier frame, -1 if none. That sphere is tested first, by a single thread, and the shadow ray
+            stops there if it still blocks it (see SceneInterface.scene._invalidate_occluders)
+        first_hits:
+            if the rasterization flag is set, the index of the first sphere hit by the primary ray of each pixel
+            (any index beyond the spheres if none), shape (height, width), see rasterize.rasterize_first_hits. The
+            primary ray then only tests that sphere (for the point hit), and the tile masks are not read. Else a
+            placeholder that is not read
     """
 
     pixel_x = cuda.blockIdx.x
     pixel_y = cuda.blockIdx.y
     thread_pos = cuda.threadIdx.x
+    word = thread_pos // 32  # The word and bit of this thread's sphere in the tile and shadow caster masks
+    bit = thread_pos % 32
+
+    # Primary rays only test the spheres that project onto the tile of the pixel, or only the first hit found by the
+    # rasterization pass
+    tile_mask = tile_masks[pixel_x // TILE_SIZE, pixel_y // TILE_SIZE]
+    rasterized = other_data[7] > 0
+    known_hit = -1
+    primary_tests = 0
+    if rasterized:
+        known_hit = first_hits[pixel_x, pixel_y]
+        if 0 <= known_hit < cuda.blockDim.x:
+            primary_tests = 1
+    else:
+        for tile_word in range(tile_mask.shape[0]):
+            primary_tests += cuda.popc(tile_mask[tile_word])
+    if primary_tests == 0:
+        # No sphere projects onto the tile (or the pixel): the pixel is the background, nothing needs loading nor
+        # tracing
+        if thread_pos == 0:
+            for axis in range(3):
+                output_frame[pixel_x, pixel_y][axis] = background_colour[axis]
+            if other_data[2] > 0:
+                cuda.atomic.add(counters, 0, 1)
+            if other_data[3] > 0:
+                diagnostics[pixel_x, pixel_y, 0] = 1
+                diagnostics[pixel_x, pixel_y, 1] = 0
+                diagnostics[pixel_x, pixel_y, 2] = 0
+                diagnostics[pixel_x, pixel_y, 3] = -1
+        return
     """
     Creates shared memory. The following items are defined
         shared_spheres:
-            The (512, 5, 3) array of spheres
+            The (512, 4) array of sphere geometries
+        shared_material:
+            The (4, 3) material of the sphere hit
+        shared_lights:
+            The (MAX_LIGHTS, 5, 3) array of lights (only the first l rows are populated)
         shared_sphere_intersections:
             The array of intersection data (shape (512, 4)). Each row will have distance,
             hit_x, hit_y and hit_z data (all -1 if not hit)
         shared_intersection_data:
-            An array of shape (3,). It contains the index of sphere hit, the distance from the ray to the light, and
-            the number of spheres that block the ray from seeing the light
+            An array of shape (1,). It contains the index of sphere hit
+        shared_light_vectors:
+            An array of shape (MAX_LIGHTS, 3) holding the unit vector from the point hit to each light
+        shared_light_data:
+            An array of shape (MAX_LIGHTS, 7). For each light: the distance from the point hit to the light (-1 if
+            the light is culled), the number of spheres that block the ray from seeing the light, the (face, i, j)
+            cube-map cell of the direction from the light to the point hit (see shadow_casters), the fraction of the
+            light seen (the shadow samples not blocked, for area lights) and (column 6) the index of one of the
+            spheres blocking a point light, kept in occluders for the next frames (only meaningful if the number of
+            blocking spheres is positive)
+        shared_shadow_samples:
+            An array of shape (MAX_SHADOW_SAMPLES, 5). For each shadow sample of the current area light: the unit
+            direction to the sample point, the distance to it and the number of spheres blocking it
         shared_scene_data:
-            An array of shape (9, 3).
+            An array of shape (5, 3).
                 - array[0] is the screen pixel value
                 - array[1] is the camera location
                 - array[2] is the unit ray
                 - array[3] is the ray origin
-                - array[4:8] is the encoded light data:
-                    array[4] is the coordinate vector of light
-                    array[5] is the ambient vector
-                    array[6] is the diffuse vector
-                    array[7] is the specular vector
-                - array[8] contains 3 separate data points:
+                - array[4] contains 3 separate data points:
                     1. epsilon
                     2. number of reflections
-                    3. the light intensity
-                
+                    3. the number of lights
+
         shared_calculation_data:
-            An array of shape (3,3) keeping track of the unit normal of the sphere, the unit vector of
-            ray to camera, and the unit vector of ray to light in that order
+            An array of shape (2,3) keeping track of the unit normal of the sphere and the unit vector of
+            ray to camera in that order
     """
-    # Load the spheres data into memory
+    # Load the spheres geometry into memory (the materials are only fetched for the spheres hit)
     shared_spheres = cuda.shared.array(
-        (512, 5, 3),
+        (512, 4),
+        dtype='float32'
+    )
+    for width in range(4):
+        shared_spheres[thread_pos][width] = sphere_geometry[thread_pos][width]
+    shared_material = cuda.shared.array(
+        (4, 3),
         dtype='float32'
     )
-    for height in range(5):
-        for width in range(3):
-            shared_spheres[thread_pos][height][width] = spheres_encoded[thread_pos][height][width]
 
-    # Load the screen_pixel, camera_location, unit_ray, and light data into shared
+    # Load the lights data into memory (the threads share the lights out, there may be more lights than threads)
+    shared_lights = cuda.shared.array(
+        (MAX_LIGHTS, 5, 3),
+        dtype='float32'
+    )
+    number_of_lights = lights_encoded.shape[0]
+    for light in range(thread_pos, number_of_lights, cuda.blockDim.x):
+        for height in range(5):
+            for width in range(3):
+                shared_lights[light][height][width] = lights_encoded[light][height][width]
+
+    # Load the screen_pixel, camera_location, unit_ray into shared
     # Schema:
     # array[0] is screen pixel
     # array[1] is camera location
     # array[2] is unit ray
     # array[3] is the ray origin
-    # array[4:8] is the encoded light data:
-    #   array[4] is the coordinate vector of light
-    #   array[5] is the ambient vector
-    #   array[6] is the diffuse vector
-    #   array[7] is the specular vector
-    # array[8] contains 3 separate data points:
+    # array[4] contains 3 separate data points:
     #   1. epsilon
     #   2. number of reflections
-    #   3. the light intensity
+    #   3. the number of lights
     shared_scene_data = cuda.shared.array(
-        (9, 3),
+        (5, 3),
         dtype='float32'
     )
 
@@ -116,25 +224,38 @@ def render_image(
             shared_scene_data[1][axis] = camera_location[axis]
             shared_scene_data[2][axis] = unit_rays[pixel_x, pixel_y][axis]
             shared_scene_data[3][axis] = camera_location[axis]
-            for k in range(4):
-                shared_scene_data[4 + k][axis] = light_encoded[k][axis]
 
-        shared_scene_data[8][0] = other_data[0]
-        shared_scene_data[8][1] = other_data[1]
-        shared_scene_data[8][2] = light_encoded[4][0]
+        shared_scene_data[4][0] = other_data[0]
+        shared_scene_data[4][1] = other_data[1]
+        shared_scene_data[4][2] = number_of_lights
+    cuda.syncthreads()  # Every thread reads the number of reflections below
 
     # Initialise shared memory to aid calculations
     shared_intersection_data = cuda.shared.array(
-        (3,),
+        (1,),
         dtype='float32'
-    )  # The first element is the index of the sphere that the ray hits. The second index is the distance
-    # from ray to light.should be the number of. The third index is the number of spheres that block the light from
-    # seeing the ray
+    )  # The index of the sphere that the ray hits
 
     shared_calculation_data = cuda.shared.array(
-        (3, 3),
+        (2, 3),
+        dtype='float32'
+    )  # An array keeping track of sphere normal and vector to camera (all units) in that order
+
+    shared_light_vectors = cuda.shared.array(
+        (MAX_LIGHTS, 3),
+        dtype='float32'
+    )  # The unit vector from the point hit to each light
+
+    shared_light_data = cuda.shared.array(
+        (MAX_LIGHTS, 7),
+        dtype='float32'
+    )  # For each light: the distance to the light (-1 if culled), the number of spheres that block the light, the
+    # cube-map cell (face, i, j) of the direction from the light, the fraction of the light seen and a blocker
+
+    shared_shadow_samples = cuda.shared.array(
+        (MAX_SHADOW_SAMPLES, 5),
         dtype='float32'
-    )  # An array keeping track of sphere normal, vector to camera, vector to light (all units) in that order
+    )  # For each shadow sample of an area light: the unit direction and distance to the sample and the blockers
 
     shared_sphere_intersections = cuda.shared.array(
         (512, 5),
@@ -145,47 +266,75 @@ def render_image(
     # 1: normal inverse indicator (1 means intersection occurred externally, -1 means internally)
     # 2, 3, 4: the coordinates of the point on surface of intersection
 
-    current_reflectivity = 1.
+    current_reflectivity = 1.  # The weight of the contribution of the current ray (tracked by every thread)
+    contribution_cutoff = other_data[4]
+    initial_samples = int(other_data[5])  # The shadow samples of area lights (more in the penumbra)
+    total_samples = int(other_data[6])
+    traced_rays = 0  # Only counted by thread 0
+    shadow_rays = 0
+    sphere_tests = 0  # The ray-sphere tests of the traced rays (only the candidates of the tile for primary rays)
+    shadow_tests = 0  # The ray-sphere tests of the shadow rays (only the potential shadow casters are tested)
+    first_hit = -1
 
-    for i in range(int(shared_scene_data[8][1])):
+    for i in range(int(shared_scene_data[4][1])):
         cuda.syncthreads()
+        traced_rays += 1
+        sphere_tests += primary_tests if i == 0 else cuda.blockDim.x
 
         # Determine the distances to each sphere
         # Adjust origin by eps * direction
         if thread_pos == 0:
             for axis in range(3):
                 shared_scene_data[3][axis] = shared_scene_data[3][axis] +\
-                                              shared_scene_data[2][axis] * shared_scene_data[8][0]
+                                              shared_scene_data[2][axis] * shared_scene_data[4][0]
         cuda.syncthreads()
-        distance, hit_coordinates, normal_multiplier = device_functions.spherical.sphere_intersection(
-            shared_scene_data[3],  # ray_origin
-            shared_scene_data[2],  # ray_unit_vector
-            shared_spheres[thread_pos][0],  # sphere_centre
-            shared_spheres[thread_pos][4][-1],  # sphere_radius
-        )
+        if i > 0:
+            candidate = True
+        elif rasterized:
+            candidate = thread_pos == known_hit
+        else:
+            candidate = (tile_mask[word] >> bit) & 1 == 1
+        if candidate:
+            distance, hit_coordinates, normal_multiplier = device_functions.spherical.sphere_intersection(
+                shared_scene_data[3],  # ray_origin
+                shared_scene_data[2],  # ray_unit_vector
+                shared_spheres[thread_pos][:3],  # sphere_centre
+                shared_spheres[thread_pos][3],  # sphere_radius
+            )
 
-        shared_sphere_intersections[thread_pos][0] = distance
-        shared_sphere_intersections[thread_pos][1] = normal_multiplier
-        shared_sphere_intersections[thread_pos][2:] = hit_coordinates
+            shared_sphere_intersections[thread_pos][0] = distance
+            shared_sphere_intersections[thread_pos][1] = normal_multiplier
+            shared_sphere_intersections[thread_pos][2:] = hit_coordinates
+        else:
+            # The sphere does not project onto the tile of the pixel (or is not its first hit): the primary ray
+            # misses it (or hits it further)
+            shared_sphere_intersections[thread_pos][0] = -1
 
         # Given distance, we reduce the distance by epsilon as a percentage divided by 10
         for axis in range(3):  # adjust by epsilon
             shared_sphere_intersections[thread_pos][axis + 2] -= shared_scene_data[2][axis] *\
                                                                  shared_sphere_intersections[thread_pos][0] *\
-                                                                 (shared_scene_data[8][0] / 10)
-        shared_sphere_intersections[thread_pos][0] *= (1 - shared_scene_data[8][0] / 10)
+                                                                 (shared_scene_data[4][0] / 10)
+        shared_sphere_intersections[thread_pos][0] *= (1 - shared_scene_data[4][0] / 10)
 
         cuda.syncthreads()  # Wait for all threads to finish in the block to calculate which sphere was hit
 
         if thread_pos == 0:
             # Only one thread finds the minimum distance
-            index, min_dist = device_functions.numerical_utils.get_min_positive(shared_sphere_intersections)
+            index, min_dist = device_functions.numerical_utils.get_min_positive(
+                shared_sphere_intersections,
+                cuda.blockDim.x  # only the rows of the spheres (threads) in use are populated
+            )
             shared_intersection_data[0] = index
             if int(shared_intersection_data[0]) != -1:
-                # Calculate unit normal, unit vector to light, unit vector to camera, distance to light,
-                # and unit vector of reflected rays
+                # Fetch the material of the sphere hit
+                material = materials[sphere_materials[index]]
+                for height in range(4):
+                    for width in range(3):
+                        shared_material[height][width] = material[height][width]
+                # Calculate unit normal, unit vector to camera and unit vector of reflected rays
                 shared_calculation_data[0] = device_functions.lin_alg.normalised_direction(  # unit normal
-                    shared_spheres[index][0],  # centre of sphere
+                    shared_spheres[index][:3],  # centre of sphere
                     shared_sphere_intersections[index][2:5]  # point on surface of sphere
                 )
                 shared_calculation_data[0] = device_functions.lin_alg.mult_fac(
@@ -197,85 +346,250 @@ def render_image(
                     shared_scene_data[1]  # camera location
                 )
 
-                shared_calculation_data[2] = device_functions.lin_alg.direction(  # vector from ray to light
-                    shared_sphere_intersections[index][2:5],  # point on surface of sphere
-                    shared_scene_data[4]  # light location
-                )  # note we save the output of this "lin_alg.direction" function into shared_calculation_data[2]
-                # since we need it to be converted to an array.
-
-                shared_intersection_data[1] = device_functions.lin_alg.magnitude(shared_calculation_data[2])  # the
-                # distance to light
-
-                shared_calculation_data[2] = device_functions.lin_alg.normalise(shared_calculation_data[2])  # unit
-                # direction to light
-
                 shared_scene_data[2] = device_functions.lin_alg.reflection_flat(  # Reflected ray
                     shared_scene_data[2],  # original ray vector
                     shared_calculation_data[0]  # the unit normal of surface
                 )
                 for axis in range(3):
                     shared_scene_data[3][axis] = shared_sphere_intersections[index][axis + 2] +\
-                                                  shared_calculation_data[0][axis] * shared_scene_data[8][0]
+                                                  shared_calculation_data[0][axis] * shared_scene_data[4][0]
                     # this is the new origin plus an epsilon amount * surface normal
 
-            # Set number of obstructions to 0
-            shared_intersection_data[2] = 0
-
         cuda.syncthreads()
         index = int(shared_intersection_data[0])
 
         if index == -1:
             # No sphere got intersected, no more interaction available
             break
+        if traced_rays == 1:
+            first_hit = index
+
+        # Cull the lights whose intensity falloff at the point hit, weighted by the reflectivity of the path, is below
+        # the cutoff (see _SceneInterface.set_light_cutoff), before casting any shadow ray. Each thread handles its own
+        # lights
+        for light in range(thread_pos, number_of_lights, cuda.blockDim.x):
+            shared_light_vectors[light] = device_functions.lin_alg.direction(  # vector from ray to light
+                shared_sphere_intersections[index][2:5],  # point on surface of sphere
+                shared_lights[light][0]  # light location
+            )
+            shared_light_data[light][1] = 0  # Set number of obstructions to 0
+            shared_light_data[light][5] = 1  # The whole light is seen
+            distance_sq = device_functions.lin_alg.dot(shared_light_vectors[light], shared_light_vectors[light])
+            if device_functions.blinn_phong.light_culled(
+                    distance_sq,
+                    shared_lights[light][4][1] * current_reflectivity
+            ):
+                shared_light_data[light][0] = -1
+            else:
+                shared_light_data[light][0] = math.sqrt(distance_sq)  # the distance to light
+                shared_light_vectors[light] = device_functions.lin_alg.normalise(shared_light_vectors[light])
+                face, cell_i, cell_j = device_functions.cube_map.cube_map_cell(
+                    device_functions.lin_alg.mult_fac(shared_light_vectors[light], -1),  # from the light to the point
+                    shadow_casters.shape[2]
+                )
+                shared_light_data[light][2] = face
+                shared_light_data[light][3] = cell_i
+                shared_light_data[light][4] = cell_j
+        cuda.syncthreads()
 
-        # Determine how many spheres are in the way between the ray and the light
-        distance, intersection_coordinates, normal_multiplier = device_functions.spherical.sphere_intersection(
-            shared_scene_data[3],  # The new ray origin (keyword is ray_origin)
-            shared_calculation_data[2],  # The unit direction of ray to light (keyword is ray_unit_vector)
-            shared_spheres[thread_pos][0],  # sphere_centre
-            shared_spheres[thread_pos][4][-1],  # sphere_radius
-        )
-        if 0 < distance < shared_intersection_data[1]:
-            # Distance to object is shorter than distance to light.
-            cuda.atomic.add(shared_intersection_data, 2, 1)
+        # Determine how many spheres are in the way between the ray and each light that is not culled. Only the
+        # spheres of the shadow caster mask of the cell the ray lies in are tested
+        for light in range(number_of_lights):
+            if shared_light_data[light][0] < 0:
+                continue
+            casters = shadow_casters[
+                light,
+                int(shared_light_data[light][2]),
+                int(shared_light_data[light][3]),
+                int(shared_light_data[light][4])
+            ]
+            caster_count = 0
+            if thread_pos == 0:
+                for caster_word in range(casters.shape[0]):
+                    caster_count += cuda.popc(casters[caster_word])
+            is_caster = (casters[word] >> bit) & 1
+            if shared_lights[light][4][2] > 0:
+                # Area light: a few stratified shadow samples first, the rest only if they disagree (the point is
+                # in the penumbra). The samples and their blockers are shared, so the whole block takes each stage
+                samples_blocked = 0
+                samples = 0
+                for stage in range(2):
+                    start = 0 if stage == 0 else initial_samples
+                    samples = initial_samples if stage == 0 else total_samples
+                    if stage == 1 and (samples_blocked == 0 or samples_blocked == initial_samples):
+                        samples = initial_samples
+                        break
+                    if thread_pos == 0:
+                        rotation = device_functions.area_light.sample_rotation(pixel_x, pixel_y, i)
+                        for sample in range(start, samples):
+                            x, y, z, sample_distance = device_functions.area_light.area_light_sample(
+                                shared_scene_data[3],  # origin
+                                shared_lights[light][0],  # light_centre
+                                shared_lights[light][4][2],  # light_radius
+                                sample,  # sample
+                                initial_samples,  # strata
+                                rotation  # rotation
+                            )
+                            shared_shadow_samples[sample][0] = x
+                            shared_shadow_samples[sample][1] = y
+                            shared_shadow_samples[sample][2] = z
+                            shared_shadow_samples[sample][3] = sample_distance
+                            shared_shadow_samples[sample][4] = 0
+                        shadow_rays += samples - start
+                        shadow_tests += caster_count * (samples - start)
+                    cuda.syncthreads()
+                    if is_caster:
+                        for sample in range(start, samples):
+                            distance, intersection_coordinates, normal_multiplier = \
+                                device_functions.spherical.sphere_intersection(
+                                    shared_scene_data[3],  # ray_origin
+                                    shared_shadow_samples[sample][:3],  # ray_unit_vector
+                                    shared_spheres[thread_pos][:3],  # sphere_centre
+                                    shared_spheres[thread_pos][3],  # sphere_radius
+                                )
+                            if 0 < distance < shared_shadow_samples[sample][3]:
+                                cuda.atomic.add(shared_shadow_samples, (sample, 4), 1)
+                    cuda.syncthreads()
+                    for sample in range(start, samples):
+                        samples_blocked += 1 if shared_shadow_samples[sample][4] > 0 else 0
+                    cuda.syncthreads()  # The samples are read before the next stage/light writes them
+                if thread_pos == 0:
+                    shared_light_data[light][5] = 1 - samples_blocked / samples
+                continue
+            if thread_pos == 0:
+                shadow_rays += 1
+                # Only the shadows of the primary hits are cached (the hits of the reflected rays are less coherent)
+                occluder = occluders[pixel_x, pixel_y, light] if i == 0 else -1
+                if device_functions.lin_alg.dot(shared_calculation_data[0], shared_light_vectors[light]) <= 0:
+                    # The light is behind the surface: the sphere hit itself is in the way (unless the ray grazes it)
+                    occluder = index
+                if 0 <= occluder < cuda.blockDim.x:
+                    # The sphere that blocked the last shadow ray of the pixel towards the light usually still does:
+                    # if so, the other casters are not tested
+                    shadow_tests += 1
+                    distance, intersection_coordinates, normal_multiplier = \
+                        device_functions.spherical.sphere_intersection(
+                            shared_scene_data[3],  # ray_origin
+                            shared_light_vectors[light],  # ray_unit_vector
+                            shared_spheres[occluder][:3],  # sphere_centre
+                            shared_spheres[occluder][3],  # sphere_radius
+                        )
+                    if 0 < distance < shared_light_data[light][0]:
+                        shared_light_data[light][1] = 1
+                        shared_light_data[light][6] = occluder
+            cuda.syncthreads()
+            if shared_light_data[light][1] > 0:
+                continue
+            if thread_pos == 0:
+                shadow_tests += caster_count
+            if not is_caster:
+                continue
+            distance, intersection_coordinates, normal_multiplier = device_functions.spherical.sphere_intersection(
+                shared_scene_data[3],  # The new ray origin (keyword is ray_origin)
+                shared_light_vectors[light],  # The unit direction of ray to light (keyword is ray_unit_vector)
+                shared_spheres[thread_pos][:3],  # sphere_centre
+                shared_spheres[thread_pos][3],  # sphere_radius
+            )
+            if 0 < distance < shared_light_data[light][0]:
+                # Distance to object is shorter than distance to light.
+                cuda.atomic.add(shared_light_data, (light, 1), 1)
+                shared_light_data[light][6] = thread_pos  # Any of the blockers is kept
         cuda.syncthreads()
 
+        if thread_pos == 0 and i == 0:
+            # Keep the blocker of the point lights seen from the primary hit for the next frames
+            for light in range(number_of_lights):
+                if shared_light_data[light][0] >= 0 and shared_lights[light][4][2] <= 0:
+                    occluders[pixel_x, pixel_y, light] = int(shared_light_data[light][6]) \
+                        if shared_light_data[light][1] > 0 else -1
         if thread_pos == 0:
             for axis in range(3):
                 # Reset new origin to true origin (state before we added an epsilon * surface normal)
                 shared_scene_data[3][axis] = shared_scene_data[3][axis] - \
-                                              shared_calculation_data[0][axis] * shared_scene_data[8][0]
-            if shared_intersection_data[2] == 0:
-                # Ray sees light
-                pixel_delta = device_functions.blinn_phong.blinn_phong_sphere(
-                    current_reflectivity,  # current_reflectivity
-                    shared_scene_data[8][2],  # light_intensity
-                    shared_intersection_data[1],  # distance_to_light
-                    shared_spheres[index][1],  # sphere_ambient
-                    shared_spheres[index][2],  # sphere_diffuse
-                    shared_spheres[index][3],  # sphere_specular
-                    shared_spheres[index][4][0],  # sphere_shine
-                    shared_scene_data[5],  # light_ambient
-                    shared_scene_data[6],  # light_diffuse
-                    shared_scene_data[7],  # light_specular
-                    shared_calculation_data[2],  # light_unit_vector
-                    shared_calculation_data[1],  # camera_unit_vector
-                    shared_calculation_data[0]  # surface_normal_vec
-                )
-                for axis in range(3):
-                    shared_calculation_data[0][axis] = pixel_delta[axis]
-                # Note we save the results to shared_calculation_data as we must convert output to array
-                x, y, z = device_functions.lin_alg.add(
-                    shared_scene_data[0],
-                    shared_calculation_data[0]
-                )
-                shared_scene_data[0][0] = min(max(0, x), 1)
-                shared_scene_data[0][1] = min(max(0, y), 1)
-                shared_scene_data[0][2] = min(max(0, z), 1)
+                                              shared_calculation_data[0][axis] * shared_scene_data[4][0]
+            # Accumulate the contributions of the lights the ray sees
+            device_functions.blinn_phong.blinn_phong_lights(
+                shared_scene_data[0],  # pixel
+                current_reflectivity,  # current_reflectivity
+                shared_material,  # sphere_material
+                shared_lights,  # lights_encoded
+                number_of_lights,  # number_of_lights
+                shared_light_vectors,  # light_unit_vectors
+                shared_light_data,  # light_data
+                shared_calculation_data[1],  # camera_unit_vector
+                shared_calculation_data[0]  # surface_normal_vec
+            )
 
-            current_reflectivity *= shared_spheres[index][4][1]
+        # Stop tracing once the reflected rays can no longer contribute visibly to the pixel (every thread holds the
+        # same reflectivity, so the whole block leaves the loop)
+        current_reflectivity *= shared_material[3][1]
+        if current_reflectivity <= contribution_cutoff:
+            break
 
     # Write results to a new pixel
     if thread_pos == 0:
         for axis in range(3):
             output_frame[pixel_x, pixel_y][axis] = shared_scene_data[0][axis]
+        if other_data[2] > 0:
+            # Every thread tests its own sphere against the rays it may be hit by
+            cuda.atomic.add(counters, 0, traced_rays)
+            cuda.atomic.add(counters, 1, shadow_rays)
+            cuda.atomic.add(counters, 2, sphere_tests + shadow_tests)
+        if other_data[3] > 0:
+            diagnostics[pixel_x, pixel_y, 0] = traced_rays
+            diagnostics[pixel_x, pixel_y, 1] = sphere_tests
+            diagnostics[pixel_x, pixel_y, 2] = shadow_tests
+            diagnostics[pixel_x, pixel_y, 3] = first_hit
+
+
+_QUANTIZE_BLOCK = (16, 16)
+
+
+@lazy_kernel('int32[:, :, :], uint8[:]')
+def invalidate_occluders(occluders, dirty_slots):
+    """
+    Clears (sets to -1) the entries of the last occluder cache (see render_image) holding a sphere slot written since
+    the last frame. Intended to be used with 16 by 16 threads per block (see quantize_blocks)
+
+    Args:
+        occluders:
+            the last occluder cache, shape (height, width, l) - written to
+        dirty_slots:
+            1 for the slots written since the last frame, else 0. Shape is (n,) for the n sphere slots (at least 512)
+    """
+    pixel_x, pixel_y = cuda.grid(2)
+    if pixel_x < occluders.shape[0] and pixel_y < occluders.shape[1]:
+        for light in range(occluders.shape[2]):
+            occluder = occluders[pixel_x, pixel_y, light]
+            if occluder >= 0 and dirty_slots[occluder]:
+                occluders[pixel_x, pixel_y, light] = -1
+
+
+@lazy_kernel('float32[:, :, :], uint8[:, :, :]')
+def quantize_frame_uint8(frame, output_frame):
+    """
+    Converts a rendered frame (values between 0 and 1) to 8-bit rgb values (value * 255, truncated - the same
+    mapping used when saving images), so that a 4x smaller buffer is copied back to the host.
+    Intended to be used with 16 by 16 threads per block (see quantize_blocks)
+
+    Args:
+        frame:
+            the rendered frame of shape (height, width, 3)
+        output_frame:
+            the uint8 array of shape (height, width, 3) - to be written to
+    """
+    pixel_x, pixel_y = cuda.grid(2)
+    if pixel_x < frame.shape[0] and pixel_y < frame.shape[1]:
+        for axis in range(3):
+            output_frame[pixel_x, pixel_y, axis] = numba.uint8(frame[pixel_x, pixel_y, axis] * 255)
+
+
+def quantize_blocks(resolution):
+    """
+    Returns the (blocks_per_grid, threads_per_block) launch configuration of the quantize_frame (and
+    invalidate_occluders) kernels for a resolution (height, width)
+    """
+    blocks_per_grid = tuple(
+        (size + block - 1) // block for size, block in zip(resolution, _QUANTIZE_BLOCK)
+    )
+    return blocks_per_grid, _QUANTIZE_BLOCK
@@ -0,0 +1,52 @@
+import functools
+import threading
+from typing import Callable
+from numba import cuda
+
+
+class LazyKernel:
+    """
+    A cuda kernel compiled (for its signature) on first launch rather than when its module is imported, so that
+    importing the engine is cheap and does not need a cuda device. Launched like a numba kernel:
+    kernel[blocks_per_grid, threads_per_block](*args)
+    """
+    def __init__(self, func: Callable, signature: str):
+        functools.update_wrapper(self, func)
+        self._func = func
+        self._signature = signature
+        self._kernel = None
+        self._lock = threading.Lock()
+
+    @property
+    def compiled(self) -> bool:
+        return self._kernel is not None
+
+    def compile(self):
+        """
+        Compiles the kernel (once, thread-safe) and returns the numba kernel
+        """
+        if self._kernel is None:
+            with self._lock:
+                if self._kernel is None:
+                    self._kernel = cuda.jit(func_or_sig=self._signature, device=False)(self._func)
+        return self._kernel
+
+    def __getitem__(self, launch_configuration):
+        return self.compile()[launch_configuration]
+
+
+def lazy_kernel(signature: str) -> Callable[[Callable], LazyKernel]:
+    """
+    Decorator replacing @cuda.jit(func_or_sig=signature, device=False) with a LazyKernel
+    """
+    def decorator(func: Callable) -> LazyKernel:
+        return LazyKernel(func, signature)
+    return decorator
+
+
+def compile_kernels(*kernels: LazyKernel) -> None:
+    """
+    Compiles the given kernels (see scene.warmup)
+    """
+    for kernel in kernels:
+        kernel.compile()
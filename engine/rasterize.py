@@ -0,0 +1,129 @@
+import math
+import numpy as np
+from numba import cuda
+import engine.device_functions as device_functions
+from .lazy_kernel import lazy_kernel
+
+# The first hit of the pixels whose primary ray misses every sphere (any index beyond the spheres, see render_image)
+NO_HIT = 2 ** 31 - 1
+# The threads per block of the rasterization kernels, and the maximum number of blocks a sphere is split into
+_RASTER_THREADS = 256
+_MAX_RASTER_CHUNKS = 1024
+
+_rasterize_signature = ', '.join([
+    'float32[:]',  # camera_location
+    'float32[:, :, :]',  # unit_rays
+    'float32[:, :]',  # sphere_geometry
+    'int32[:, :]',  # sphere_bounds
+    'float32[:]',  # other_data
+    'float32[:, :]',  # depth
+    'int32[:, :]',  # first_hits
+])
+
+
+@lazy_kernel('float32[:, :], int32[:, :]')
+def clear_raster(depth, first_hits):
+    """
+    Resets the depth (to infinity) and the first hits (to NO_HIT) before the spheres are rasterized. Intended to be
+    used with 16 by 16 threads per block (see engine.quantize_blocks)
+    """
+    pixel_x, pixel_y = cuda.grid(2)
+    if pixel_x < depth.shape[0] and pixel_y < depth.shape[1]:
+        depth[pixel_x, pixel_y] = math.inf
+        first_hits[pixel_x, pixel_y] = NO_HIT
+
+
+@lazy_kernel(_rasterize_signature)
+def rasterize_depth(camera_location, unit_rays, sphere_geometry, sphere_bounds, other_data, depth, first_hits):
+    """
+    The first of the two passes of the rasterization of the primary visibility (see scene.set_primary_visibility):
+    every sphere is splatted onto the pixels of its screen bounds (see Camera._project_spheres), keeping the
+    shortest distance of each pixel. Intended to be used with one row of blocks per sphere (see raster_blocks)
+
+    Args:
+        camera_location:
+            an array of three coordinates x, y, z
+        unit_rays:
+            the unit primary rays, shape (h, w, 3)
+        sphere_geometry:
+            the [x, y, z, radius] of the spheres, shape (>= n, 4)
+        sphere_bounds:
+            the [row_start, row_stop, column_start, column_stop] pixels of each of the n spheres, shape (n, 4)
+        other_data:
+            see render_image (only the epsilon is read)
+        depth:
+            the distance to the first hit of each pixel (see device_functions.spherical.primary_distance), shape
+            (h, w) - written to (infinity if none)
+        first_hits:
+            unused (see rasterize_first_hits)
+    """
+    sphere = cuda.blockIdx.x
+    rows = sphere_bounds[sphere, 1] - sphere_bounds[sphere, 0]
+    columns = sphere_bounds[sphere, 3] - sphere_bounds[sphere, 2]
+    for pixel in range(
+            cuda.blockIdx.y * cuda.blockDim.x + cuda.threadIdx.x,
+            rows * columns,
+            cuda.gridDim.y * cuda.blockDim.x
+    ):
+        pixel_x = sphere_bounds[sphere, 0] + pixel // columns
+        pixel_y = sphere_bounds[sphere, 2] + pixel % columns
+        distance = device_functions.spherical.primary_distance(
+            camera_location,  # camera_location
+            unit_rays[pixel_x, pixel_y],  # ray_unit_vector
+            sphere_geometry[sphere][:3],  # sphere_centre
+            sphere_geometry[sphere][3],  # sphere_radius
+            other_data[0]  # eps
+        )
+        if distance > 0:
+            cuda.atomic.min(depth, (pixel_x, pixel_y), distance)
+
+
+@lazy_kernel(_rasterize_signature)
+def rasterize_first_hits(camera_location, unit_rays, sphere_geometry, sphere_bounds, other_data, depth, first_hits):
+    """
+    The second pass of the rasterization (see rasterize_depth, same launch): the first hit of each pixel is the
+    sphere at the depth of the pixel, the lowest index on ties (the sphere render_image picks)
+
+    Args:
+        first_hits:
+            the index of the first sphere hit by the primary ray of each pixel, shape (h, w) - written to (NO_HIT if
+            none)
+    """
+    sphere = cuda.blockIdx.x
+    rows = sphere_bounds[sphere, 1] - sphere_bounds[sphere, 0]
+    columns = sphere_bounds[sphere, 3] - sphere_bounds[sphere, 2]
+    for pixel in range(
+            cuda.blockIdx.y * cuda.blockDim.x + cuda.threadIdx.x,
+            rows * columns,
+            cuda.gridDim.y * cuda.blockDim.x
+    ):
+        pixel_x = sphere_bounds[sphere, 0] + pixel // columns
+        pixel_y = sphere_bounds[sphere, 2] + pixel % columns
+        distance = device_functions.spherical.primary_distance(
+            camera_location,  # camera_location
+            unit_rays[pixel_x, pixel_y],  # ray_unit_vector
+            sphere_geometry[sphere][:3],  # sphere_centre
+            sphere_geometry[sphere][3],  # sphere_radius
+            other_data[0]  # eps
+        )
+        if distance > 0 and distance == depth[pixel_x, pixel_y]:
+            cuda.atomic.min(first_hits, (pixel_x, pixel_y), sphere)
+
+
+def raster_blocks(sphere_bounds):
+    """
+    Returns the (blocks_per_grid, threads_per_block) launch configuration of the rasterization kernels for the
+    screen bounds of the spheres (see Camera._project_spheres): a row of blocks per sphere, enough for the largest
+    bounds to give a pixel to every thread (up to _MAX_RASTER_CHUNKS blocks, the threads then loop over the pixels)
+    """
+    areas = (sphere_bounds[:, 1] - sphere_bounds[:, 0]) * (sphere_bounds[:, 3] - sphere_bounds[:, 2])
+    largest = int(areas.max()) if len(areas) else 0
+    chunks = min(max(-(-largest // _RASTER_THREADS), 1), _MAX_RASTER_CHUNKS)
+    return (len(sphere_bounds), chunks), _RASTER_THREADS
+
+
+def raster_tests(sphere_bounds: np.ndarray) -> int:
+    """
+    Returns the number of ray-sphere tests of each rasterization pass (a test per pixel of the bounds of a sphere)
+    """
+    return int(((sphere_bounds[:, 1] - sphere_bounds[:, 0]) * (sphere_bounds[:, 3] - sphere_bounds[:, 2])).sum())
@@ -0,0 +1,26 @@
+import unittest
+import numpy as np
+from SceneInterface._MaterialTable import MaterialTable
+
+
+def _material(value: float) -> np.ndarray:
+    return np.full(shape=(4, 3), fill_value=value, dtype='float32')
+
+
+class MaterialTableTest(unittest.TestCase):
+    def test_grows_past_the_initial_capacity(self):
+        table = MaterialTable()
+        capacity = len(table.encoded)
+        ids = [table.acquire(_material(i)) for i in range(capacity * 2 + 1)]
+        self.assertEqual(ids, list(range(capacity * 2 + 1)))
+        for material_id in ids:
+            np.testing.assert_array_equal(table.encoded[material_id], _material(material_id))
+
+    def test_shares_and_reuses_rows(self):
+        table = MaterialTable()
+        first = table.acquire(_material(1))
+        self.assertEqual(table.acquire(_material(1)), first)
+        table.release(first)
+        table.release(first)
+        self.assertEqual(len(table), 0)
+        self.assertEqual(table.acquire(_material(2)), first)
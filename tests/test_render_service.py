@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+import unittest
+import numpy as np
+from SceneInterface import Scene
+from RenderService import RenderServer, RenderClient
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The deltas building the scene served (a small frame, so the cpu backend renders it quickly)
+_SCENE_DELTAS = [
+    {'op': 'add', 'type': 'Camera', 'values': {
+        'coordinates': [0, -10, 2],
+        'resolution': [12, 16],
+        'screen_vectors': [[0, 1, 0], [0, 0, 1]],
+        'background_colour': [0.1, 0.2, 0.3],
+    }},
+    {'op': 'add', 'type': 'Light', 'values': {
+        'coordinates': [0, 0, 8], 'ambient': [.1, .1, .1], 'diffuse': [.8, .8, .8], 'specular': [1, 1, 1],
+    }},
+    {'op': 'add', 'type': 'Sphere', 'values': {
+        'name': 'sphere', 'coordinates': [0, 0, 1], 'ambient': [1, 0, 0], 'diffuse': [1, 0, 0],
+        'specular': [1, 1, 1], 'shine': 50, 'reflect': .3, 'radius': 1.5,
+    }},
+]
+_MOVE_DELTAS = [{'op': 'update', 'name': 'sphere', 'values': {'coordinates': [1, 0, 1]}}]
+# Loads a scenario (which clears the scene) and swaps its camera for the small one of _SCENE_DELTAS
+_SCENARIO_DELTAS = [
+    {'op': 'scenario', 'name': 'scenario3'},
+    {'op': 'remove', 'name': '_camera'},
+    _SCENE_DELTAS[0],
+]
+# Seconds a server process is given to render and exit
+_TIMEOUT = 600
+
+
+def _round_trip():
+    """
+    Starts a cpu server on localhost, builds the scene through a delta, renders it, moves the sphere, renders it
+    again, loads a scenario, renders it and stops the server. Returns the three frames and the counts of the server
+    """
+    scene = Scene()
+    scene.set_backend('cpu')
+    server = RenderServer(scene=scene)
+    host, port = server.start_thread()
+    try:
+        with RenderClient(host, port, timeout=_TIMEOUT) as client:
+            frame = client.render(deltas=_SCENE_DELTAS)
+            client.apply(_MOVE_DELTAS)
+            moved_frame = client.render(reflect=1)
+            scenario_frame = client.render(deltas=_SCENARIO_DELTAS)
+    finally:
+        server.stop_thread()
+    return frame, moved_frame, scenario_frame, server.counts
+
+
+class RenderServiceTest(unittest.TestCase):
+    def test_round_trip(self):
+        frame, moved_frame, scenario_frame, counts = _round_trip()
+        self.assertEqual(frame.dtype, np.uint8)
+        self.assertEqual(frame.shape, (12, 16, 3))
+        self.assertEqual(moved_frame.shape, (12, 16, 3))
+        self.assertFalse(np.array_equal(frame, moved_frame))
+        # The background is quantized like any other pixel (value * 255, truncated)
+        self.assertEqual(tuple(frame[0, 0]), (25, 51, 76))
+        # Loading a scenario clears the scene, frames are still sent as uint8
+        self.assertEqual(scenario_frame.dtype, np.uint8)
+        self.assertEqual(scenario_frame.shape, (12, 16, 3))
+        self.assertEqual(counts, {'captures': 3, 'renders': 3, 'deltas': 3, 'delta_batches': 3})
+
+    def test_server_process_exits(self):
+        # The parallel cpu renderer runs on the executor thread of the server: the process must still exit
+        completed = subprocess.run(
+            [sys.executable, '-m', 'tests.test_render_service'],
+            cwd=_ROOT,
+            timeout=_TIMEOUT,
+            capture_output=True
+        )
+        self.assertEqual(completed.returncode, 0, completed.stderr.decode())
+
+
+if __name__ == '__main__':
+    _round_trip()
@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+from SceneInterface import Scene
+from Objects.SolidObjects import Sphere
+
+
+def _vector(*values):
+    return np.array(values, dtype='float32')
+
+
+def _sphere(scene: Scene, name: str, z: float = 0.) -> Sphere:
+    return Sphere(
+        scene=scene,
+        name=name,
+        coordinates=_vector(0, 0, z),
+        ambient=_vector(1, 0, 0),
+        diffuse=_vector(1, 0, 0),
+        specular=_vector(1, 1, 1),
+        shine=10,
+        reflect=0,
+        radius=0.5
+    )
+
+
+class SceneBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.scene = Scene()
+        self.sphere = _sphere(self.scene, 'sphere')
+
+    def test_registered_in_batch_is_encoded(self):
+        with self.scene.batch():
+            _sphere(self.scene, 'added', z=2)
+        self.assertIn('added', self.scene)
+        self.assertEqual(self.scene.sphere_names, ['sphere', 'added'])
+
+    def test_rollback_de_registers_objects_registered_in_batch(self):
+        with self.assertRaises(RuntimeError):
+            with self.scene.batch():
+                self.sphere.coordinates[2] += 1
+                added = _sphere(self.scene, 'added', z=2)
+                raise RuntimeError
+        self.assertNotIn('added', self.scene)
+        self.assertEqual(self.scene.sphere_names, ['sphere'])
+        self.assertIsNone(added._scene)
+        np.testing.assert_array_equal(self.sphere.coordinates, _vector(0, 0, 0))
+        # The name is free again, and the object can be registered once more
+        self.scene.register_object(added)
+        self.assertEqual(self.scene.sphere_names, ['sphere', 'added'])
+
+    def test_rollback_keeps_de_registrations(self):
+        with self.assertRaises(RuntimeError):
+            with self.scene.batch():
+                self.scene.de_register_object('sphere')
+                raise RuntimeError
+        self.assertNotIn('sphere', self.scene)
+        self.assertEqual(self.scene.sphere_names, [])